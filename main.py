@@ -6,13 +6,20 @@ from pathlib import Path
 from urllib.parse import quote_plus
 
 import psutil
-from pymongo import MongoClient
 
 from src import constants
 from src.azure_types.instances import SkuTypes
+from src.catalogue.bundle import CatalogueBundle, get_bundle_store
+from src.catalogue.search import InvertedIndex, series_sections
+from src.documents import DocumentFile, FamilyResolver
+from src.mixins import MongoClientRegistry
 from src.parsers.series import SeriesMarkdownDocumentParser
 from src.parsers.utility import document_to_parser
 from src.repository import DocsSourceRepository
+from src.snapshot import WarmStartSnapshot
+from src.storage.aggregates import AggregatesStorageBackend
+from src.storage.journal import JournalStorageBackend
+from src.storage.utility import get_storage_backend
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +29,7 @@ def get_mongo_collection(name: str):
     password = "root"
     host = "localhost"
     uri = "mongodb://%s:%s@%s" % (quote_plus(user), quote_plus(password), host)
-    client = MongoClient(uri)
+    client = MongoClientRegistry.get_client(uri)
     database_name = "ms_instance_family_scraper"
     logger.warning(f"Connecting to MongoDB Database '{database_name}'")
     database = client[database_name]
@@ -40,29 +47,92 @@ if __name__ == "__main__":
         clone_path = Path(repository.repo_temp_directory.name) / Path(
             repository.repo_name
         )
-        repository_workdir = repository.clone_repository()
-        repository.generate_last_commit_index()
-        documents = repository.get_documents()
-        _, families = repository.get_families()
-        for i, document in enumerate(documents):
-            family_document = document.get_associated_family(families)
-            parser = document_to_parser(document, family_document)
-            parser = t.cast(SeriesMarkdownDocumentParser, parser)
-            print(f"Start Files Nr. '{len(psutil.Process().open_files())}'")
-            with parser as parser:
-                dto = parser.to_type
-                if dto:
-                    dto.set_last_updated_azure(repository)
-                    __import__("pprint").pprint(dto.serialize())
-                    dto.write_to_database()
-                sku_types = SkuTypes(parser)
-                for sku_type in sku_types:
-                    sku_type.set_last_updated_azure(repository)
-                    __import__("pprint").pprint(sku_type.serialize())
-                    sku_type.write_to_database()
-            print(f"End Files Nr. '{len(psutil.Process().open_files())}'")
+        snapshot = WarmStartSnapshot.load(constants.SNAPSHOT_PATH)
+        remote_head = repository.remote_head_commit() if snapshot else None
+        # Parsed Azure Types are journaled locally first, so database outages do not cost the run
+        target = AggregatesStorageBackend(get_storage_backend())
+        if snapshot and snapshot.matches(remote_head):
+            logger.warning(
+                f"Source and code are unchanged since commit '{snapshot.head}', "
+                "publishing the warm start snapshot"
+            )
+            with JournalStorageBackend(target) as backend:
+                snapshot.publish(backend)
+        else:
+            repository_workdir = repository.clone_repository()
+            repository_root = Path(repository.repo.working_dir)
+            if snapshot is None:
+                repository.generate_last_commit_index()
+            else:
+                # Only the commits since the previous run are walked
+                try:
+                    repository.update_last_commit_index(
+                        snapshot.head, snapshot.restore_commit_index(repository_root)
+                    )
+                except Exception as e:
+                    logger.warning(
+                        f"Commit '{snapshot.head}' is unknown, indexing all commits: {e!r}"
+                    )
+                    repository.generate_last_commit_index()
+            documents: t.Iterable[t.Tuple[DocumentFile, DocumentFile]]
+            if snapshot and snapshot.discovery_matches(repository.head_commit):
+                # Only the code changed, the source tree is the one discovered before
+                logger.warning(
+                    f"Source is unchanged since commit '{snapshot.head}', "
+                    "reusing the discovered documents of the warm start snapshot"
+                )
+                documents, families = snapshot.restore_discovery(repository_root)
+            else:
+                _, families = repository.get_families()
+                documents = repository.iter_documents(FamilyResolver(families))
+            # Families without any series are part of the catalogue as well
+            bundle = CatalogueBundle(repository.head_commit, families)
+            text_index = InvertedIndex()
+            snapshot = WarmStartSnapshot(repository.head_commit)
+            discovered: t.List[t.Tuple[DocumentFile, DocumentFile]] = []
+            with JournalStorageBackend(target) as backend:
+                for document, family_document in documents:
+                    discovered.append((document, family_document))
+                    parser = document_to_parser(document, family_document)
+                    parser = t.cast(SeriesMarkdownDocumentParser, parser)
+                    logger.debug(
+                        f"Start Files Nr. '{len(psutil.Process().open_files())}'"
+                    )
+                    with parser as parser:
+                        dto = parser.to_type
+                        if dto:
+                            dto.set_last_updated_azure(repository)
+                            backend.add(dto)
+                            serialized = dto.serialize()
+                            bundle.add_series(family_document, serialized)
+                            snapshot.add(dto.mongodb_collection_name, serialized)
+                            try:
+                                text_index.add_series(
+                                    parser.name, series_sections(parser)
+                                )
+                            except Exception as e:
+                                logger.error(
+                                    f"Indexing the text of series '{parser.name}' failed: {e!r}"
+                                )
+                        sku_types = SkuTypes(parser)
+                        for sku_type in sku_types:
+                            sku_type.set_last_updated_azure(repository)
+                            backend.add(sku_type)
+                            serialized = sku_type.serialize()
+                            bundle.add_sku(family_document, parser.name, serialized)
+                            snapshot.add(sku_type.mongodb_collection_name, serialized)
+                    logger.debug(
+                        f"End Files Nr. '{len(psutil.Process().open_files())}'"
+                    )
+            get_bundle_store().save(bundle)
+            text_index.save(constants.CATALOGUE_TEXT_INDEX_PATH)
+            snapshot.set_discovery(repository_root, discovered, families)
+            snapshot.set_commit_index(repository_root, repository.commit_index)
+            snapshot.save(constants.SNAPSHOT_PATH)
     except Exception as e:
         repository.cleanup()
         signal.alarm(1)
         time.sleep(1)
         raise e
+    finally:
+        MongoClientRegistry.close()
@@ -0,0 +1,135 @@
+import logging
+import re
+import typing as t
+
+import numpy as np
+
+from src import constants
+
+from .instances import SkuType
+
+logger = logging.getLogger(__name__)
+
+# Fixed bit layouts for the letter-coded SKU features, shared by every columnar representation
+SUBFAMILY_BITS: t.Dict[str, int] = {
+    code: 1 << i for i, code in enumerate(constants.SUBFAMILIES)
+}
+ADDON_BITS: t.Dict[str, int] = {
+    code: 1 << i for i, code in enumerate(constants.ADDONS_MAPPING)
+}
+TIERS: t.Tuple[str, ...] = ("",) + tuple(constants.TIER_MAPPING)
+FAMILIES: t.Tuple[str, ...] = ("",) + tuple(constants.FAMILIES)
+ACCELERATORS: t.Tuple[str, ...] = ("",) + tuple(
+    constants.SKU_ACCELERATOR_EXPLANATIONS
+)
+
+SKU_NAMES_DTYPE = np.dtype(
+    [
+        ("valid", np.bool_),
+        ("tier", np.uint8),
+        ("family", np.uint8),
+        ("subfamilies", np.uint16),
+        ("vcpus", np.uint32),
+        ("constrained_vcpus", np.uint32),
+        ("addons", np.uint16),
+        ("accelerator", np.uint8),
+        ("version", np.uint8),
+        ("iversion", np.int8),
+    ]
+)
+
+
+def decode_mask(mask: int, bits: t.Dict[str, int]) -> t.List[str]:
+    """Return the codes of all bits set in 'mask', in layout order"""
+    return [code for code, bit in bits.items() if mask & bit]
+
+
+class SkuNameDecoder:
+    """
+    Decodes SKU instance names (e.g. 'Standard_D16ads_v5') in bulk into a NumPy structured array.
+    Strings are stored as indexes into the module level code tables ('TIERS', 'FAMILIES', 'ACCELERATORS', 0 means unset),
+    letter-coded features as bitmasks ('SUBFAMILY_BITS', 'ADDON_BITS'), a missing 'iversion' as -1.
+    Names that 'SkuType' could not decode have 'valid' set to False and all other columns zeroed.
+    Decoded rows are memoized, so repeated names are only matched once per decoder.
+    """
+
+    regex: t.ClassVar[re.Pattern] = SkuType.regex
+    dtype: t.ClassVar[np.dtype] = SKU_NAMES_DTYPE
+    _invalid: t.ClassVar[t.Tuple] = (False, 0, 0, 0, 0, 0, 0, 0, 0, -1)
+
+    def __init__(self, max_cache_size: int = 1_000_000) -> None:
+        self.max_cache_size = max_cache_size
+        self._cache: t.Dict[str, t.Tuple] = {}
+        self._tiers = {tier: i for i, tier in enumerate(TIERS)}
+        self._families = {family: i for i, family in enumerate(FAMILIES)}
+        self._accelerators = {accel: i for i, accel in enumerate(ACCELERATORS)}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def decode_one(self, name: str) -> t.Tuple:
+        """Return the row tuple (in 'dtype' field order) for a single SKU name"""
+        row = self._cache.get(name, None)
+        if row is None:
+            row = self._decode(name)
+            if len(self._cache) >= self.max_cache_size:
+                logger.debug("SKU name cache is full, clearing")
+                self._cache.clear()
+            self._cache[name] = row
+        return row
+
+    def decode(self, names: t.Iterable[str]) -> np.ndarray:
+        """Decode a sequence of SKU names into a structured array with one row per name"""
+        decode_one = self.decode_one
+        positions: t.Dict[str, int] = {}
+        indexes = np.fromiter(
+            (positions.setdefault(name, len(positions)) for name in names),
+            dtype=np.intp,
+        )
+        unique_rows = np.array(
+            [decode_one(name) for name in positions], dtype=self.dtype
+        )
+        if not len(unique_rows):
+            return unique_rows
+        return unique_rows[indexes]
+
+    @staticmethod
+    def to_columns(decoded: np.ndarray) -> t.Dict[str, np.ndarray]:
+        """Return the columns of a decoded structured array as a dict of arrays"""
+        return {field: decoded[field] for field in decoded.dtype.names}
+
+    def _decode(self, name: str) -> t.Tuple:
+        match = self.regex.search(name)
+        if not match:
+            return self._invalid
+        attributes = match.groupdict()
+        try:
+            tier = self._tiers[(attributes["tier"] or "").lower()]
+            family = self._families[attributes["fam"]]
+            subfamilies = 0
+            for subfam_id in attributes["subfam"]:
+                subfamilies |= SUBFAMILY_BITS[subfam_id]
+            addons = 0
+            for addon_id in attributes["addons"]:
+                addons |= ADDON_BITS[addon_id]
+            accelerator = self._accelerators[(attributes["accel"] or "").rstrip("_")]
+        except KeyError:
+            return self._invalid
+        constrained_vcpus = attributes["constr"]
+        version = attributes["version"]
+        iversion = attributes["iversion"]
+        return (
+            True,
+            tier,
+            family,
+            subfamilies,
+            int(attributes["vcpus"]),
+            int(constrained_vcpus[1:]) if constrained_vcpus else 0,
+            addons,
+            accelerator,
+            int(version[1:]) if version else 1,
+            int(iversion) if iversion else -1,
+        )
@@ -0,0 +1,80 @@
+import typing as t
+from collections import OrderedDict
+
+
+class DescriptionDictionary:
+    """
+    Texts repeated across serialized Azure Types, stored once and referenced by code.
+
+    'normalize' replaces the description mappings of a document by the list of their keys,
+    and drops the family description as well as the field explanations ('<field>__str').
+    The texts are collected in 'entries' under the codes
+        '<field>:<key>'                 e.g. 'subfamilies:s' for descriptions
+        'family_description:<family>'   e.g. 'family_description:D'
+        '<collection>:<field>__str'     e.g. 'sku_types:tier__str' for explanations
+    'hydrate' reverts this, given the same entries
+    """
+
+    description_fields: t.ClassVar[t.Tuple[str, ...]] = (
+        "tier",
+        "subfamilies",
+        "addons",
+        "accelerator",
+    )
+    family_description_field: t.ClassVar[str] = "family_description"
+    explanation_suffix: t.ClassVar[str] = "__str"
+
+    def __init__(self, entries: t.Optional[t.Mapping[str, t.Any]] = None) -> None:
+        self.entries: t.Dict[str, t.Any] = dict(entries or {})
+        # Codes added since the last call to 'pop_new_entries'
+        self.new_codes: t.Set[str] = set()
+
+    def _add(self, code: str, value: t.Any) -> None:
+        if code in self.entries:
+            return
+        self.entries[code] = value
+        self.new_codes.add(code)
+
+    def pop_new_entries(self) -> t.Dict[str, t.Any]:
+        new_entries = {code: self.entries[code] for code in sorted(self.new_codes)}
+        self.new_codes = set()
+        return new_entries
+
+    def normalize(
+        self, collection_name: str, document: t.Mapping[str, t.Any]
+    ) -> t.Dict[str, t.Any]:
+        normalized: t.Dict[str, t.Any] = {}
+        for field, value in document.items():
+            if field in self.description_fields and isinstance(value, t.Mapping):
+                for key, description in value.items():
+                    self._add(f"{field}:{key}", description)
+                normalized[field] = list(value.keys())
+            elif field == self.family_description_field and "family_id" in document:
+                self._add(f"{field}:{document['family_id']}", value)
+            elif field.endswith(self.explanation_suffix):
+                self._add(f"{collection_name}:{field}", value)
+            else:
+                normalized[field] = value
+        return normalized
+
+    def hydrate(
+        self, collection_name: str, document: t.Mapping[str, t.Any]
+    ) -> t.Dict[str, t.Any]:
+        hydrated: t.Dict[str, t.Any] = {}
+        for field, value in document.items():
+            if field in self.description_fields and isinstance(value, list):
+                hydrated[field] = OrderedDict(
+                    (key, self.entries[f"{field}:{key}"]) for key in value
+                )
+            else:
+                hydrated[field] = value
+        family_description = self.entries.get(
+            f"{self.family_description_field}:{document.get('family_id', None)}", None
+        )
+        if family_description is not None:
+            hydrated[self.family_description_field] = family_description
+        prefix = f"{collection_name}:"
+        for code, value in self.entries.items():
+            if code.startswith(prefix) and code.endswith(self.explanation_suffix):
+                hydrated[code[len(prefix) :]] = value
+        return hydrated
@@ -1,15 +1,21 @@
-import datetime
 import logging
 import re
 import typing as t
-from collections import OrderedDict
-from copy import deepcopy
+
+from pymongo import IndexModel
 
 from src import constants
 from src.mixins import FileHashingMixin, MongoDBMixin
 from src.parsers.series import SeriesMarkdownDocumentParser
 
-from .shared import AzureType, DescriptionObject
+from .shared import (
+    AzureType,
+    DescriptionsMapping,
+    accelerator_descriptions,
+    addon_descriptions,
+    subfamily_descriptions,
+    tier_descriptions,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +30,16 @@ class SkuType(AzureType, FileHashingMixin, MongoDBMixin):
         r"^(?P<tier>[sS]tandard|[bB]asic)?_?(?P<fam>[A-Z])(?P<subfam>[A-Z]{0,2})(?P<vcpus>\d+)(?P<constr>-\d+)?(?P<addons>[a-z]*)_?(?P<accel>[a-zA-Z\d]+_)?(?P<version>v\d)?(?P<iversion>\d)?$"
     )
     mongodb_collection_name = "sku_types"
+    mongodb_indexes = (
+        IndexModel("name", unique=True),
+        IndexModel("family_id"),
+        IndexModel("vcpus"),
+        IndexModel("_accelerator"),
+    )
     __attrs = (
         "name",
         "name__str",
+        "series_name",
         "_tier",
         "tier",
         "tier__str",
@@ -54,11 +67,58 @@ class SkuType(AzureType, FileHashingMixin, MongoDBMixin):
         "last_updated_azure",
     )
 
+    serialized_fields = __attrs
+
+    __slots__ = (
+        "parser",
+        "_id",
+        "is_confidential",
+        "instance",
+        "instance_attributes",
+        "name",
+        "series_name",
+        "_tier",
+        "tier",
+        "family_id",
+        "family_description",
+        "_subfamilies",
+        "subfamilies",
+        "vcpus",
+        "constrained_vcpus",
+        "_addons",
+        "addons",
+        "_accelerator",
+        "accelerator",
+        "version",
+        "iversion",
+        "last_updated_azure",
+    )
+    # The field explanations are identical for every instance, so they live on the class
+    name__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["name"]
+    tier__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["tier"]
+    family_id__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["family_id"]
+    family_description__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS[
+        "family_description"
+    ]
+    subfamilies__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS[
+        "subfamilies"
+    ]
+    vcpus__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["vcpus"]
+    constrained_vcpus__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS[
+        "constrained_vcpus"
+    ]
+    addons__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["addons"]
+    accelerator__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS[
+        "accelerator"
+    ]
+    version__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["version"]
+    iversion__str: t.ClassVar[str] = constants.SKU_FIELDS_EXPLANATIONS["iversion"]
+
     def __init__(
         self, series_parser: SeriesMarkdownDocumentParser, instance_name: str
     ) -> None:
         self.parser = series_parser
-        self._id = None
+        self._id: t.Optional[str] = None
 
         self.is_confidential = self.parser.is_confidential
         self.instance = instance_name
@@ -67,37 +127,28 @@ class SkuType(AzureType, FileHashingMixin, MongoDBMixin):
         self.instance_attributes = instance_attributes.groupdict()
 
         self.name: t.Optional[str] = None
-        self.name__str: t.Optional[str] = None
+        # The series the SKU was parsed from, links it to its 'AzureSkuSeriesType' by name
+        self.series_name: t.Optional[str] = self.parser.name
         self._tier: t.Optional[str] = None
-        self.tier: t.Dict[str, str] = {}
-        self.tier__str: t.Optional[str] = None
+        self.tier: DescriptionsMapping = {}
         self.family_id: t.Optional[str] = None
-        self.family_id__str: t.Optional[str] = None
         self.family_description: t.Optional[str] = None
-        self.family_description__str: t.Optional[str] = None
         self._subfamilies: t.Optional[str] = None
-        self.subfamilies: t.Dict[str, t.Dict[str, str]] = {}
-        self.subfamilies__str: t.Optional[str] = None
+        self.subfamilies: DescriptionsMapping = {}
         self.vcpus: t.Optional[int] = None
-        self.vcpus__str: t.Optional[str] = None
         self.constrained_vcpus: t.Optional[int] = None
-        self.constrained_vcpus__str: t.Optional[str] = None
         self._addons: t.Optional[str] = None
-        self.addons: t.Dict[str, t.Dict[str, str]] = {}
-        self.addons__str: t.Optional[str] = None
+        self.addons: DescriptionsMapping = {}
         self._accelerator: t.Optional[str] = None
-        self.accelerator: t.Dict[str, t.Dict[str, str]] = {}
-        self.accelerator__str: t.Optional[str] = None
-        self.version: t.Optional[int] = None
-        self.version__str: t.Optional[str] = None
+        self.accelerator: DescriptionsMapping = {}
+        self.version: t.Optional[str] = None
         self.iversion: t.Optional[str] = None
-        self.iversion__str: t.Optional[str] = None
-        self.last_updated_azure: t.Optional[datetime.datetime] = None
+        self.last_updated_azure: t.Optional[str] = None
         self._get_instance_attributes()
         print()
 
     def serialize(self) -> t.Dict[str, t.Union[int, str, bool, None]]:
-        return {k: getattr(self, k) for k in self.__attrs}
+        return {k: self._to_serializable(getattr(self, k)) for k in self.__attrs}
 
     def write_to_database(self) -> bool:
         assert self.name
@@ -107,84 +158,45 @@ class SkuType(AzureType, FileHashingMixin, MongoDBMixin):
         self.last_updated_azure = self.parser.last_updated_timestamp(repo).isoformat()
 
     def _get_instance_attributes(self) -> None:
-        attrs: t.OrderedDict[str, t.Union[str, int, None, t.Dict[str, dict]]] = (
-            OrderedDict()
-        )
-        attrs["name"] = self.instance
+        self.name = self.instance
 
         tier = self.instance_attributes["tier"]
         assert tier
-        attrs["_tier"] = tier
-        tier = {
-            tier.capitalize(): DescriptionObject(
-                tier.lower(), constants.TIER_MAPPING
-            ).serialize()
-        }
-        attrs["tier"] = tier
+        self._tier = tier
+        self.tier = tier_descriptions(tier)
 
         family_id = self.instance_attributes["fam"]
         assert family_id
-        attrs["family_id"] = family_id
-        family_description = constants.FAMILIES[family_id]
-        attrs["family_description"] = family_description
-
-        _subfamilies = self.instance_attributes["subfam"] or None
-        subfamilies = OrderedDict()
-        if _subfamilies:
-            for subfam_id in list(_subfamilies):
-                if subfam_id == "C" and self.is_confidential:
-                    subfam_id = "_C"
-                subfamilies[subfam_id] = DescriptionObject(
-                    subfam_id, constants.SUBFAMILIES
-                ).serialize()
-        attrs["_subfamilies"] = _subfamilies
-        attrs["subfamilies"] = subfamilies
+        self.family_id = family_id
+        self.family_description = constants.FAMILIES[family_id]
+
+        self._subfamilies = self.instance_attributes["subfam"] or None
+        self.subfamilies = subfamily_descriptions(
+            self._subfamilies, "C" in (self._subfamilies or "") and self.is_confidential
+        )
 
         vcpus = self._cast_to_int(self.instance_attributes["vcpus"])
         assert vcpus
-        attrs["vcpus"] = vcpus
+        self.vcpus = vcpus
 
         constrained_vcpus = self.instance_attributes["constr"]
         if constrained_vcpus:
             constrained_vcpus = re.sub(r"\s|-|_", "", constrained_vcpus)
             constrained_vcpus = self._cast_to_int(constrained_vcpus)
-        constrained_vcpus = t.cast(t.Optional[int], constrained_vcpus)
-        attrs["constrained_vcpus"] = constrained_vcpus
+        self.constrained_vcpus = t.cast(t.Optional[int], constrained_vcpus)
 
         _addons = self.instance_attributes["addons"]
-        addons = OrderedDict()
         if _addons:
             _addons = re.sub(r"\s|-|_", "", _addons)
-            for addon_id in list(_addons):
-                addons[addon_id] = DescriptionObject(
-                    addon_id, constants.ADDONS_MAPPING
-                ).serialize()
-        attrs["_addons"] = _addons
-        attrs["addons"] = addons
+        self._addons = _addons
+        self.addons = addon_descriptions(_addons)
 
         _accelerator = self.instance_attributes["accel"]
-        accelerator = {}
         if _accelerator:
             _accelerator = re.sub(r"\s|-|_", "", _accelerator)
-            accelerator = {
-                _accelerator: DescriptionObject(
-                    _accelerator, constants.SKU_ACCELERATOR_EXPLANATIONS
-                ).serialize()
-            }
-        attrs["_accelerator"] = _accelerator
-        attrs["accelerator"] = accelerator
+        self._accelerator = _accelerator
+        self.accelerator = accelerator_descriptions(_accelerator)
 
         version = self.instance_attributes["version"] or "v1"
-        version = version.replace("v", "")
-        attrs["version"] = version
-        iversion = self.instance_attributes["iversion"]
-        attrs["iversion"] = iversion
-
-        _attrs = deepcopy(attrs)
-        for key, value in attrs.items():
-            if key.startswith("_"):
-                continue
-            _attrs[key] = value
-            _attrs[f"{key}__str"] = constants.SKU_FIELDS_EXPLANATIONS[key]
-        for key, value in _attrs.items():
-            setattr(self, key, value)
+        self.version = version.replace("v", "")
+        self.iversion = self.instance_attributes["iversion"]
@@ -2,16 +2,31 @@ import re
 import typing as t
 from collections import OrderedDict
 
+from pymongo import IndexModel
+
 from src import constants
 from src.mixins import FileHashingMixin, MongoDBMixin
 from src.parsers.families import FamilyMarkdownDocumentParser
 from src.parsers.series import SeriesMarkdownDocumentParser
 
-from .shared import AzureType, DescriptionObject
+from .shared import (
+    AzureType,
+    DescriptionsMapping,
+    accelerator_descriptions,
+    addon_descriptions,
+    subfamily_descriptions,
+)
 
 
 class AzureSkuSeriesType(AzureType, FileHashingMixin, MongoDBMixin):
     mongodb_collection_name: t.ClassVar[str] = "sku_series"
+    mongodb_indexes = (
+        IndexModel("name", unique=True),
+        IndexModel("family_id"),
+        IndexModel([("vcpus_min", 1), ("vcpus_max", 1)]),
+        IndexModel([("memory_gb_min", 1), ("memory_gb_max", 1)]),
+        IndexModel("_accelerator"),
+    )
     regex = re.compile(
         r"^(?P<fam>[A-Z])(?P<subfam>[A-Z]{0,2})(?P<addons>[a-u,w-z]*)_?(?P<accel>[a-uw-zA-Z\d]+_?)?(?P<version>v\d)?(?P<iversion>\d)?$"
     )
@@ -73,6 +88,17 @@ class AzureSkuSeriesType(AzureType, FileHashingMixin, MongoDBMixin):
         "last_updated_azure",
     )
 
+    serialized_fields = __attrs
+
+    __slots__ = (
+        "parser",
+        "family_parser",
+        "_id",
+        "_series_attributes",
+        "cap_confidential_compute_capable",
+        "cap_trusted_launch_capable",
+    ) + __attrs
+
     def __init__(
         self,
         series_parser: SeriesMarkdownDocumentParser,
@@ -91,22 +117,17 @@ class AzureSkuSeriesType(AzureType, FileHashingMixin, MongoDBMixin):
         self.family_description = constants.FAMILIES[self.family_id]
 
         self._subfamilies: t.Optional[str] = None
-        self.subfamilies: t.OrderedDict[str, t.Dict[str, str]] = OrderedDict()
+        self.subfamilies: DescriptionsMapping = {}
         self._get_subfamilies()
 
         self._addons: t.Optional[str] = None
-        self.addons: t.OrderedDict[str, t.Dict[str, str]] = OrderedDict()
+        self.addons: DescriptionsMapping = {}
         self._get_addons()
 
         self._accelerator = self._series_attributes["accel"]
-        self.accelerator: t.Dict[str, t.Dict[str, str]] = {}
-        if self._accelerator:
-            accelerator = self._accelerator.rstrip("_")
-            self.accelerator = {
-                accelerator: DescriptionObject(
-                    accelerator, constants.SKU_ACCELERATOR_EXPLANATIONS
-                ).serialize()
-            }
+        self.accelerator: DescriptionsMapping = accelerator_descriptions(
+            self._accelerator.rstrip("_") if self._accelerator else None
+        )
 
         self.version = self._series_attributes["version"] or "v1"
         self.version = self._cast_to_int(self.version[-1])
@@ -155,23 +176,18 @@ class AzureSkuSeriesType(AzureType, FileHashingMixin, MongoDBMixin):
         self.last_updated_azure: t.Optional[str] = None
 
     def serialize(self):
-        return {k: getattr(self, k) for k in self.__attrs}
+        return {k: self._to_serializable(getattr(self, k)) for k in self.__attrs}
 
     def write_to_database(self) -> bool:
         return self._write_to_database({"name": self.name})
 
     def _get_subfamilies(self) -> None:
         _subfamilies = self._series_attributes["subfam"]
-        subfamilies = OrderedDict()
-        if _subfamilies:
-            for subfam_id in list(_subfamilies):
-                if subfam_id == "C" and self.parser.is_confidential:
-                    subfam_id = "_C"
-                subfamilies[subfam_id] = DescriptionObject(
-                    subfam_id, constants.SUBFAMILIES
-                ).serialize()
         self._subfamilies = _subfamilies
-        self.subfamilies = subfamilies
+        self.subfamilies = subfamily_descriptions(
+            _subfamilies,
+            "C" in (_subfamilies or "") and self.parser.is_confidential,
+        )
 
     def set_last_updated_azure(self, repo) -> None:
         self.last_updated_azure = repo.last_commit_for_document(
@@ -180,12 +196,7 @@ class AzureSkuSeriesType(AzureType, FileHashingMixin, MongoDBMixin):
 
     def _get_addons(self) -> None:
         self._addons = self._series_attributes["addons"]
-        if not self._addons:
-            return
-        for addon in list(self._addons):
-            self.addons[addon] = DescriptionObject(
-                addon, constants.ADDONS_MAPPING
-            ).serialize()
+        self.addons = addon_descriptions(self._addons)
 
     def _get_vcpu_stats(self) -> None:
         cpus = self.parser.host_specs_table["Processor"]
@@ -1,12 +1,20 @@
 # pyright: reportAttributeAccessIssue=false
 # mypy: disable-error-code="attr-defined"
 import abc
+import hashlib
 import logging
 import math
 import re
 import typing as t
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+
+from bson import ObjectId
+from pymongo import IndexModel
 
 from src import constants
+from src.mixins import FileHashingMixin
 
 
 class DescriptionObject:
@@ -23,14 +31,84 @@ class DescriptionObject:
         return {self.keys[i]: v for i, v in enumerate(self.description)}
 
 
+class DescriptionTable:
+    """
+    Serialized descriptions for every code of a mapping from 'constants'.
+    Entries are created once and shared read-only between all Azure Types (flyweights)
+    """
+
+    def __init__(
+        self, choices: t.Union[t.Dict[str, str], t.Dict[str, t.List[str]]]
+    ) -> None:
+        self.entries: t.Dict[str, t.Mapping[str, str]] = {
+            code: MappingProxyType(DescriptionObject(code, choices).serialize())
+            for code in choices
+        }
+
+    def __getitem__(self, code: str) -> t.Mapping[str, str]:
+        return self.entries[code]
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.entries
+
+
+TIER_DESCRIPTIONS = DescriptionTable(constants.TIER_MAPPING)
+SUBFAMILY_DESCRIPTIONS = DescriptionTable(constants.SUBFAMILIES)
+ADDON_DESCRIPTIONS = DescriptionTable(constants.ADDONS_MAPPING)
+ACCELERATOR_DESCRIPTIONS = DescriptionTable(constants.SKU_ACCELERATOR_EXPLANATIONS)
+
+DescriptionsMapping = t.Mapping[str, t.Mapping[str, str]]
+
+
+@lru_cache(maxsize=None)
+def tier_descriptions(tier: str) -> DescriptionsMapping:
+    return MappingProxyType({tier.capitalize(): TIER_DESCRIPTIONS[tier.lower()]})
+
+
+@lru_cache(maxsize=None)
+def subfamily_descriptions(
+    subfamilies: t.Optional[str], is_confidential: bool
+) -> DescriptionsMapping:
+    descriptions = OrderedDict()
+    for subfam_id in subfamilies or "":
+        if subfam_id == "C" and is_confidential:
+            subfam_id = "_C"
+        descriptions[subfam_id] = SUBFAMILY_DESCRIPTIONS[subfam_id]
+    return MappingProxyType(descriptions)
+
+
+@lru_cache(maxsize=None)
+def addon_descriptions(addons: t.Optional[str]) -> DescriptionsMapping:
+    return MappingProxyType(
+        OrderedDict(
+            (addon_id, ADDON_DESCRIPTIONS[addon_id]) for addon_id in addons or ""
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def accelerator_descriptions(accelerator: t.Optional[str]) -> DescriptionsMapping:
+    if not accelerator:
+        return MappingProxyType({})
+    return MappingProxyType({accelerator: ACCELERATOR_DESCRIPTIONS[accelerator]})
+
+
 class AzureType(abc.ABC):
+    __slots__ = ()
     __attrs: t.ClassVar[t.Sequence[str]]
+    # The fields returned by 'serialize', in order
+    serialized_fields: t.ClassVar[t.Tuple[str, ...]]
     regex: t.ClassVar[re.Pattern]
     logger: t.ClassVar[logging.Logger] = logging.getLogger(__name__)
 
     _id: t.Optional[str]
+    name: t.Optional[str]
+    fingerprint_field: t.ClassVar[str] = "_fingerprint"
+    field_fingerprints_field: t.ClassVar[str] = "_fingerprints"
     mongodb_database_name: t.ClassVar[str] = constants.MONGODB_DATABASE_NAME
     mongodb_collection_name: t.ClassVar[str]
+    # Indexes the collection of this Azure Type is expected to have, ensured by 'database.IndexManager'
+    mongodb_indexes: t.ClassVar[t.Sequence[IndexModel]] = ()
     mongodb_hostname: t.ClassVar[str] = constants.MONGODB_HOSTNAME
     mongodb_username: t.ClassVar[str] = constants.MONGODB_USERNAME
     mongodb_password: t.ClassVar[str] = constants.MONGODB_PASSWORD
@@ -40,29 +118,123 @@ class AzureType(abc.ABC):
         """Convert the internal data of this Azure Type into a JSON serializable representation"""
         raise NotImplementedError
 
+    @classmethod
+    def _to_serializable(cls, value: t.Any) -> t.Any:
+        """Copy shared read-only mappings into plain dicts, so they can be dumped to JSON"""
+        if isinstance(value, t.Mapping):
+            return {k: cls._to_serializable(v) for k, v in value.items()}
+        return value
+
+    @staticmethod
+    def document_id(name: str) -> ObjectId:
+        """Return the deterministic document ID for the Azure Type called 'name'"""
+        return ObjectId(hashlib.sha256(name.encode()).digest()[:12])
+
+    @staticmethod
+    def document_fingerprint(document: t.Mapping[str, t.Any]) -> str:
+        """Return the canonical content fingerprint of a serialized Azure Type"""
+        canonical_document = FileHashingMixin.canonical_json(document)
+        return hashlib.sha256(canonical_document.encode()).hexdigest()
+
+    def fingerprint(self, document: t.Optional[t.Mapping[str, t.Any]] = None) -> str:
+        """Return the canonical content fingerprint of the serialized data of this Azure Type"""
+        return self.document_fingerprint(
+            document if document is not None else self.serialize()
+        )
+
+    @staticmethod
+    def field_fingerprints(document: t.Mapping[str, t.Any]) -> t.Dict[str, str]:
+        """Return a short content fingerprint for every top level field of a serialized Azure Type"""
+        return {
+            field: hashlib.sha256(
+                FileHashingMixin.canonical_json({field: value}).encode()
+            ).hexdigest()[:16]
+            for field, value in document.items()
+        }
+
+    @classmethod
+    def to_stored_document(cls, document: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+        """Add the deterministic '_id' and the content fingerprints to a serialized Azure Type"""
+        return {
+            "_id": cls.document_id(document["name"]),
+            **document,
+            cls.fingerprint_field: cls.document_fingerprint(document),
+            cls.field_fingerprints_field: cls.field_fingerprints(document),
+        }
+
+    @classmethod
+    def to_field_update(
+        cls,
+        stored_document: t.Mapping[str, t.Any],
+        field_fingerprints: t.Mapping[str, str],
+    ) -> t.Dict[str, t.Dict[str, t.Any]]:
+        """
+        Return the update operators turning a stored document with the per field fingerprints 'field_fingerprints'
+        into 'stored_document': only changed fields are set and removed fields are unset.
+        Unchanged fields are only written if the update ends up inserting the document
+        """
+        fingerprints: t.Mapping[str, str] = stored_document[cls.field_fingerprints_field]
+        set_fields: t.Dict[str, t.Any] = {
+            cls.fingerprint_field: stored_document[cls.fingerprint_field]
+        }
+        set_on_insert_fields: t.Dict[str, t.Any] = {}
+        for field, fingerprint in fingerprints.items():
+            fields = (
+                set_fields
+                if field_fingerprints.get(field, None) != fingerprint
+                else set_on_insert_fields
+            )
+            fields[field] = stored_document[field]
+            fields[f"{cls.field_fingerprints_field}.{field}"] = fingerprint
+        unset_fields: t.Dict[str, str] = {}
+        for field in field_fingerprints.keys():
+            if field not in fingerprints:
+                unset_fields[field] = ""
+                unset_fields[f"{cls.field_fingerprints_field}.{field}"] = ""
+        update = {"$set": set_fields}
+        if set_on_insert_fields:
+            update["$setOnInsert"] = set_on_insert_fields
+        if unset_fields:
+            update["$unset"] = unset_fields
+        return update
+
+    def to_document(self) -> t.Dict[str, t.Any]:
+        """Return the serialized data together with its deterministic '_id' and content fingerprint"""
+        return self.to_stored_document(self.serialize())
+
     def _write_to_database(self, filter: t.Dict[str, str]) -> bool:
-        changed = False
-        document = self.serialize()
-        documents_count = self.collection.count_documents(filter)
+        document = self.to_document()
+        # Only the fingerprints are fetched, existing documents are never transferred just to compare them
+        existing_documents = list(
+            self.collection.find(
+                filter, {self.fingerprint_field: 1, self.field_fingerprints_field: 1}
+            ).limit(2)
+        )
         assert (
-            documents_count <= 1
+            len(existing_documents) <= 1
         ), f"Duplicate documents for name '{self.name}' found, exiting"
-        if not documents_count:
+        if not existing_documents:
             # If no documents were found, insert a new one
             changed = True
-            _id = self.collection.insert_one(self.serialize()).inserted_id
+            _id = self.collection.insert_one(document).inserted_id
         else:
-            # If a document was found, check if it is different from the current state
-            existing_document = self.collection.find_one(filter)
-            assert existing_document
-            # Remove the _id key because it is not present in the serialized document and would otherwise always return a change
-            _id = existing_document.pop("_id")
+            # Documents written before fingerprints existed have none and are always replaced once
+            _id = existing_documents[0]["_id"]
             changed = (
-                self.generate_hash(existing_document).hexdigest()
-                != self.generate_hash(document).hexdigest()
+                existing_documents[0].get(self.fingerprint_field, None)
+                != document[self.fingerprint_field]
+            )
+            field_fingerprints = existing_documents[0].get(
+                self.field_fingerprints_field, None
             )
-            if changed:
-                # If the existing document and the state of this instance differ, replace the current document
+            if changed and field_fingerprints:
+                # Only the fields that differ from the existing document are written
+                self.collection.update_one(
+                    {"_id": _id}, self.to_field_update(document, field_fingerprints)
+                )
+            elif changed:
+                # Documents without per field fingerprints are replaced as a whole
+                document.pop("_id")
                 self.collection.replace_one({"_id": _id}, document)
         _id = str(_id)
         self._id = _id
@@ -0,0 +1,175 @@
+import json
+import logging
+import typing as t
+from collections import Counter
+from pathlib import Path
+
+from .features import decode_features, encode_features
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+# Groups and (field, value) pairs a single document adds to the aggregates
+Contribution = t.Tuple[t.Tuple[str, ...], t.Tuple[t.Tuple[str, t.Any], ...]]
+
+STATE_VERSION = 1
+# Fields whose distinct values are collected, mappings and lists contribute each of their keys
+DISTINCT_FIELDS: t.Tuple[str, ...] = (
+    "family_id",
+    "accelerator",
+    "version",
+    "cpu_processor_models",
+)
+# Numeric fields whose minimum and maximum are tracked
+RANGE_FIELDS: t.Tuple[str, ...] = (
+    "vcpus",
+    "constrained_vcpus",
+    "vcpus_min",
+    "vcpus_max",
+    "memory_gb_min",
+    "memory_gb_max",
+    "cap_acus_min",
+    "cap_acus_max",
+)
+
+
+def contribution(document: Document) -> Contribution:
+    """Return the groups of a serialized (or normalized) Azure Type and the values it aggregates"""
+    groups = ["all"]
+    if document.get("family_id", None) is not None:
+        groups.append(f"family:{document['family_id']}")
+    groups.extend(decode_features(encode_features(document)))
+    values: t.List[t.Tuple[str, t.Any]] = []
+    for field in DISTINCT_FIELDS:
+        value = document.get(field, None)
+        if isinstance(value, (t.Mapping, list, tuple)):
+            values.extend((field, item) for item in value)
+        elif value is not None:
+            values.append((field, value))
+    for field in RANGE_FIELDS:
+        value = document.get(field, None)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            values.append((field, value))
+    return tuple(groups), tuple(values)
+
+
+class CatalogueAggregates:
+    """
+    Counts, distinct values and value ranges of the stored Azure Types per collection and group,
+    maintained incrementally while documents are written or removed.
+    Groups are 'all', 'family:<family_id>' and every feature of 'FEATURES', e.g. 'subfamily:C'.
+    The contribution of every document is remembered by name, so replacing or removing a document
+    subtracts exactly what it added, and values are counted, so ranges shrink when their last
+    document goes away. 'to_document' renders the small summary dashboards read
+    """
+
+    def __init__(self) -> None:
+        self.contributions: t.Dict[str, t.Dict[str, Contribution]] = {}
+        # Per collection, the number of documents in every group
+        self.counts: t.Dict[str, t.Counter[str]] = {}
+        # Per collection, the number of documents having each (group, field, value)
+        self.values: t.Dict[str, t.Counter[t.Tuple[str, str, t.Any]]] = {}
+
+    def _apply(
+        self, collection_name: str, contribution: Contribution, sign: int
+    ) -> None:
+        groups, values = contribution
+        counts = self.counts.setdefault(collection_name, Counter())
+        collection_values = self.values.setdefault(collection_name, Counter())
+        for group in groups:
+            counts[group] += sign
+            if not counts[group]:
+                del counts[group]
+            for field, value in values:
+                key = (group, field, value)
+                collection_values[key] += sign
+                if not collection_values[key]:
+                    del collection_values[key]
+
+    def add(self, collection_name: str, document: Document) -> bool:
+        """Add or replace the document called 'document["name"]', return whether the aggregates changed"""
+        new = contribution(document)
+        contributions = self.contributions.setdefault(collection_name, {})
+        old = contributions.get(document["name"], None)
+        if old == new:
+            return False
+        if old is not None:
+            self._apply(collection_name, old, -1)
+        self._apply(collection_name, new, 1)
+        contributions[document["name"]] = new
+        return True
+
+    def remove(self, collection_name: str, name: str) -> bool:
+        """Remove the document called 'name', return whether it was aggregated"""
+        old = self.contributions.get(collection_name, {}).pop(name, None)
+        if old is None:
+            return False
+        self._apply(collection_name, old, -1)
+        return True
+
+    def to_document(self) -> t.Dict[str, t.Any]:
+        document: t.Dict[str, t.Any] = {}
+        for collection_name, counts in sorted(self.counts.items()):
+            groups: t.Dict[str, t.Dict[str, t.Any]] = {
+                group: {"count": count, "distinct": {}, "ranges": {}}
+                for group, count in sorted(counts.items())
+            }
+            distinct: t.Dict[t.Tuple[str, str], t.Set[t.Any]] = {}
+            for group, field, value in self.values.get(collection_name, {}):
+                distinct.setdefault((group, field), set()).add(value)
+            for (group, field), values in sorted(distinct.items()):
+                if field in RANGE_FIELDS:
+                    groups[group]["ranges"][field] = {
+                        "min": min(values),
+                        "max": max(values),
+                    }
+                else:
+                    groups[group]["distinct"][field] = sorted(values, key=str)
+            document[collection_name] = groups
+        return document
+
+    def to_state(self) -> t.Dict[str, t.Any]:
+        return {
+            "version": STATE_VERSION,
+            "contributions": {
+                collection_name: {
+                    name: [list(groups), [list(value) for value in values]]
+                    for name, (groups, values) in contributions.items()
+                }
+                for collection_name, contributions in self.contributions.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: t.Mapping[str, t.Any]) -> "CatalogueAggregates":
+        aggregates = cls()
+        if state.get("version", None) != STATE_VERSION:
+            logger.warning("Discarding aggregates state of an unknown version")
+            return aggregates
+        for collection_name, contributions in state["contributions"].items():
+            collection_contributions = aggregates.contributions.setdefault(
+                collection_name, {}
+            )
+            for name, (groups, values) in contributions.items():
+                contribution = (
+                    tuple(groups),
+                    tuple((field, value) for field, value in values),
+                )
+                collection_contributions[name] = contribution
+                aggregates._apply(collection_name, contribution, 1)
+        return aggregates
+
+    @classmethod
+    def load(cls, path: t.Union[str, Path]) -> "CatalogueAggregates":
+        """Load the state saved by 'save', or start empty if there is none"""
+        try:
+            with open(path, "r") as fin:
+                return cls.from_state(json.load(fin))
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as fout:
+            json.dump(self.to_state(), fout)
+        Path(temporary_path).replace(path)
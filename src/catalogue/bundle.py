@@ -0,0 +1,251 @@
+import abc
+import datetime
+import gzip
+import json
+import logging
+import os
+import typing as t
+from collections import OrderedDict
+from pathlib import Path
+
+import gridfs
+
+from src import constants
+from src.azure_types.dictionary import DescriptionDictionary
+from src.azure_types.instances import SkuType
+from src.azure_types.series import AzureSkuSeriesType
+from src.database import MongoDB
+from src.documents import DocumentFile
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+FORMAT_VERSION = 1
+
+
+class CatalogueBundle:
+    """
+    The whole catalogue of one run as a single document, keyed by the source commit:
+        {
+            "format_version": 1, "commit": "<HEAD sha>", "created": "<ISO time>",
+            "descriptions": {<DescriptionDictionary entries>},
+            "families": [
+                {"name": "dv5", "document": "dv5-family.md", "directory": "general-purpose",
+                 "series": [{<normalized series>, "skus": [{<normalized SKU>}, ...]}, ...]},
+                ...
+            ]
+        }
+    Families are all family documents the bundle was created with, followed by those series were resolved to,
+    in discovery order, one per document path, so families without series are kept and families of the same
+    name in different directories stay apart.
+    Shared description texts are stored once, see 'DescriptionDictionary', and 'hydrate' restores them
+    """
+
+    def __init__(
+        self,
+        commit: str,
+        families: t.Iterable[DocumentFile] = (),
+        created: t.Optional[datetime.datetime] = None,
+    ) -> None:
+        self.commit = commit
+        self.created = created or datetime.datetime.now(datetime.timezone.utc)
+        self.dictionary = DescriptionDictionary()
+        self.families: t.Dict[Path, t.Dict[str, t.Any]] = OrderedDict()
+        self.series: t.Dict[str, t.Dict[str, t.Any]] = {}
+        for family in families:
+            self.add_family(family)
+
+    def add_family(self, family: DocumentFile) -> t.Dict[str, t.Any]:
+        if family.path not in self.families:
+            self.families[family.path] = {
+                "name": family.family_name,
+                "document": family.name,
+                "directory": family.path.parent.name,
+                "series": [],
+            }
+        return self.families[family.path]
+
+    def _series(self, family: DocumentFile, series_name: str) -> t.Dict[str, t.Any]:
+        if series_name not in self.series:
+            series: t.Dict[str, t.Any] = {"name": series_name, "skus": []}
+            self.series[series_name] = series
+            self.add_family(family)["series"].append(series)
+        return self.series[series_name]
+
+    def add_series(self, family: DocumentFile, document: Document) -> None:
+        """Add a serialized 'AzureSkuSeriesType' to the family document it was resolved to"""
+        series = self._series(family, document["name"])
+        skus = series.pop("skus")
+        series.clear()
+        series.update(
+            self.dictionary.normalize(
+                AzureSkuSeriesType.mongodb_collection_name, document
+            )
+        )
+        series["skus"] = skus
+
+    def add_sku(
+        self, family: DocumentFile, series_name: str, document: Document
+    ) -> None:
+        """Add a serialized 'SkuType' to the series it was parsed from"""
+        self._series(family, series_name)["skus"].append(
+            self.dictionary.normalize(SkuType.mongodb_collection_name, document)
+        )
+
+    def to_document(self) -> t.Dict[str, t.Any]:
+        return {
+            "format_version": FORMAT_VERSION,
+            "commit": self.commit,
+            "created": self.created.isoformat(),
+            "descriptions": self.dictionary.entries,
+            "families": list(self.families.values()),
+        }
+
+    def dumps(self) -> bytes:
+        """Return the gzip compressed JSON of 'to_document'"""
+        data = json.dumps(self.to_document(), default=str, separators=(",", ":"))
+        return gzip.compress(data.encode(), compresslevel=9)
+
+    @staticmethod
+    def loads(data: bytes) -> t.Dict[str, t.Any]:
+        document = json.loads(gzip.decompress(data))
+        if document.get("format_version", None) != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported catalogue bundle version '{document.get('format_version', None)}'"
+            )
+        return document
+
+    @staticmethod
+    def hydrate(document: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+        """Return a copy of a loaded bundle with the description texts restored in every series and SKU"""
+        dictionary = DescriptionDictionary(document["descriptions"])
+        families = []
+        for family in document["families"]:
+            series_list = []
+            for series in family["series"]:
+                hydrated = dictionary.hydrate(
+                    AzureSkuSeriesType.mongodb_collection_name,
+                    {k: v for k, v in series.items() if k != "skus"},
+                )
+                hydrated["skus"] = [
+                    dictionary.hydrate(SkuType.mongodb_collection_name, sku)
+                    for sku in series["skus"]
+                ]
+                series_list.append(hydrated)
+            families.append({**family, "series": series_list})
+        hydrated = {
+            key: value for key, value in document.items() if key != "descriptions"
+        }
+        hydrated["families"] = families
+        return hydrated
+
+
+class CatalogueBundleStore(abc.ABC):
+    """Persists compressed catalogue bundles, at most one per source commit"""
+
+    name: t.ClassVar[str]
+
+    @abc.abstractmethod
+    def save(self, bundle: CatalogueBundle) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def load_data(self, commit: t.Optional[str] = None) -> t.Optional[bytes]:
+        """Return the compressed bundle of 'commit', or of the latest commit saved if None"""
+        raise NotImplementedError
+
+    def load(self, commit: t.Optional[str] = None) -> t.Optional[t.Dict[str, t.Any]]:
+        data = self.load_data(commit)
+        return CatalogueBundle.loads(data) if data is not None else None
+
+    @staticmethod
+    def filename(commit: str) -> str:
+        return f"catalogue-{commit}.json.gz"
+
+
+class FileCatalogueBundleStore(CatalogueBundleStore):
+    """Writes every bundle to '<path>/catalogue-<commit>.json.gz', '<path>/LATEST' names the newest one"""
+
+    name = "file"
+
+    def __init__(self, path: str = constants.CATALOGUE_BUNDLE_PATH) -> None:
+        self.path = Path(path)
+
+    def _replace(self, filename: str, data: bytes) -> None:
+        temporary_path = self.path / f".{filename}.tmp"
+        with open(temporary_path, "wb") as fout:
+            fout.write(data)
+        os.replace(temporary_path, self.path / filename)
+
+    def save(self, bundle: CatalogueBundle) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        data = bundle.dumps()
+        self._replace(self.filename(bundle.commit), data)
+        self._replace("LATEST", bundle.commit.encode())
+        logger.info(
+            f"Wrote catalogue bundle of commit '{bundle.commit}' to '{self.path}' ({len(data)} bytes)"
+        )
+
+    def load_data(self, commit: t.Optional[str] = None) -> t.Optional[bytes]:
+        try:
+            if commit is None:
+                commit = (self.path / "LATEST").read_text().strip()
+            return (self.path / self.filename(commit)).read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+class GridFSCatalogueBundleStore(CatalogueBundleStore):
+    """Stores every bundle as a GridFS file named after its commit, in the bucket 'bucket_name'"""
+
+    name = "gridfs"
+
+    def __init__(self, bucket_name: str = "catalogue") -> None:
+        self.database = MongoDB()
+        self.bucket_name = bucket_name
+
+    @property
+    def bucket(self) -> gridfs.GridFSBucket:
+        client = self.database.client
+        return gridfs.GridFSBucket(
+            client[self.database.mongodb_database_name], bucket_name=self.bucket_name
+        )
+
+    def save(self, bundle: CatalogueBundle) -> None:
+        bucket = self.bucket
+        filename = self.filename(bundle.commit)
+        data = bundle.dumps()
+        file_id = bucket.upload_from_stream(
+            filename,
+            data,
+            metadata={"commit": bundle.commit, "format_version": FORMAT_VERSION},
+        )
+        # Earlier bundles of the same commit are only removed once the new one is complete
+        for previous in bucket.find({"filename": filename, "_id": {"$ne": file_id}}):
+            bucket.delete(previous._id)
+        logger.info(
+            f"Stored catalogue bundle of commit '{bundle.commit}' in GridFS bucket '{self.bucket_name}' "
+            f"({len(data)} bytes)"
+        )
+
+    def load_data(self, commit: t.Optional[str] = None) -> t.Optional[bytes]:
+        bucket = self.bucket
+        query = {"filename": self.filename(commit)} if commit is not None else {}
+        for grid_out in bucket.find(query).sort("uploadDate", -1).limit(1):
+            return grid_out.read()
+        return None
+
+
+def get_bundle_store(name: t.Optional[str] = None, **kwargs) -> CatalogueBundleStore:
+    """Create the bundle store called 'name', defaulting to the one configured in 'CATALOGUE_BUNDLE_STORE'"""
+    stores = {
+        store.name: store
+        for store in (FileCatalogueBundleStore, GridFSCatalogueBundleStore)
+    }
+    name = name or constants.CATALOGUE_BUNDLE_STORE
+    if name not in stores:
+        raise ValueError(
+            f"Unknown catalogue bundle store '{name}', choose one of {list(stores)}"
+        )
+    return stores[name](**kwargs)
@@ -0,0 +1,107 @@
+import logging
+import typing as t
+
+import numpy as np
+
+from src.azure_types.capabilities import AzureSkuCapabilities
+from src.azure_types.decoder import ADDON_BITS, SUBFAMILY_BITS
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+# The boolean capabilities of 'AzureSkuCapabilities', in a fixed order
+CAPABILITY_FIELDS: t.Tuple[str, ...] = tuple(
+    dict.fromkeys(AzureSkuCapabilities.BOOL_KEYS_MAPPING.values())
+) + ("cap_confidential_compute_capable",)
+
+# Fixed bit layout of all feature flags: subfamily letters and addon letters in the order of the
+# bit layouts of 'SkuNameDecoder', followed by the capabilities, e.g. 'subfamily:C', 'addon:s', 'cap:live_migration'
+FEATURES: t.Tuple[str, ...] = (
+    tuple(f"subfamily:{code}" for code in SUBFAMILY_BITS)
+    + tuple(f"addon:{code}" for code in ADDON_BITS)
+    + tuple(
+        f"cap:{field[len('cap_') : -len('_capable')]}" for field in CAPABILITY_FIELDS
+    )
+)
+FEATURE_BITS: t.Dict[str, int] = {feature: 1 << i for i, feature in enumerate(FEATURES)}
+assert len(FEATURES) <= 64
+
+
+def encode_features(document: Document) -> int:
+    """Return the feature bitmask of a serialized (or normalized) Azure Type"""
+    mask = 0
+    for code in document.get("subfamilies", None) or ():
+        mask |= FEATURE_BITS[f"subfamily:{code}"]
+    for code in document.get("addons", None) or ():
+        mask |= FEATURE_BITS[f"addon:{code}"]
+    for feature, field in zip(FEATURES[-len(CAPABILITY_FIELDS) :], CAPABILITY_FIELDS):
+        if document.get(field, None) is True:
+            mask |= FEATURE_BITS[feature]
+    return mask
+
+
+def decode_features(mask: int) -> t.List[str]:
+    """Return the names of all features set in 'mask', in layout order"""
+    return [feature for feature, bit in FEATURE_BITS.items() if mask & bit]
+
+
+class FeatureIndex:
+    """
+    Feature bitmasks of a sequence of documents together with an inverted index,
+    which maps every feature to the bitset (packed NumPy bit array) of the rows that have it.
+    Conjunctive and negated feature queries are answered with one AND (NOT) per feature:
+        index.rows(include=["cap:live_migration", "addon:s"], exclude=["subfamily:C"])
+    """
+
+    def __init__(self, masks: np.ndarray) -> None:
+        self.masks = masks.astype(np.uint64, copy=False)
+        self.size = len(masks)
+        self.bitsets: t.Dict[str, np.ndarray] = {
+            feature: np.packbits((self.masks & np.uint64(bit)) != 0)
+            for feature, bit in FEATURE_BITS.items()
+        }
+        # Padding bits of the last byte are cleared, so negations never select rows that do not exist
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+
+    @classmethod
+    def from_documents(cls, documents: t.Iterable[Document]) -> "FeatureIndex":
+        masks = np.fromiter(
+            (encode_features(document) for document in documents), np.uint64
+        )
+        return cls(masks)
+
+    def _bitset(self, feature: str) -> np.ndarray:
+        if feature not in self.bitsets:
+            raise KeyError(f"Unknown feature '{feature}', choose one of {FEATURES}")
+        return self.bitsets[feature]
+
+    def bitset(
+        self, include: t.Iterable[str] = (), exclude: t.Iterable[str] = ()
+    ) -> np.ndarray:
+        """Return the packed bitset of all rows with every feature of 'include' and none of 'exclude'"""
+        bitset = self._all.copy()
+        for feature in include:
+            bitset &= self._bitset(feature)
+        for feature in exclude:
+            bitset &= ~self._bitset(feature)
+        return bitset
+
+    def mask(
+        self, include: t.Iterable[str] = (), exclude: t.Iterable[str] = ()
+    ) -> np.ndarray:
+        """Like 'bitset', as a boolean array with one entry per row"""
+        return np.unpackbits(self.bitset(include, exclude), count=self.size).astype(
+            bool
+        )
+
+    def rows(
+        self, include: t.Iterable[str] = (), exclude: t.Iterable[str] = ()
+    ) -> np.ndarray:
+        """Like 'bitset', as the indices of the matching rows"""
+        return np.flatnonzero(self.mask(include, exclude))
+
+    def count(
+        self, include: t.Iterable[str] = (), exclude: t.Iterable[str] = ()
+    ) -> int:
+        return int(np.unpackbits(self.bitset(include, exclude)).sum())
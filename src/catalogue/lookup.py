@@ -0,0 +1,361 @@
+import hashlib
+import itertools
+import logging
+import mmap
+import struct
+import typing as t
+from pathlib import Path
+
+import numpy as np
+
+from src.azure_types.decoder import SKU_NAMES_DTYPE, SkuNameDecoder
+
+from .features import encode_features
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+MAGIC = b"SKULKUP1"
+VERSION = 1
+# magic, version, hash seed, number of SKUs, number of buckets, number of series,
+# offsets of the displacements, the SKU records, the series records and the string table
+HEADER = struct.Struct("<8sIIIIIQQQQ")
+# Keys per bucket of the hash-and-displace table
+BUCKET_SIZE = 4
+DISPLACEMENT_CHUNK_SIZE = 1024
+# Displacements tried per bucket before the keys are hashed again with the next seed
+MAX_DISPLACEMENT = 1 << 20
+
+SKU_RECORD_DTYPE = np.dtype(
+    [
+        # The normalized name the record is looked up by and the name as scraped, both of 'name_length' bytes
+        ("key_offset", "<u4"),
+        ("name_offset", "<u4"),
+        ("name_length", "<u2"),
+        # Index of the series record, -1 if the series is unknown
+        ("series", "<i4"),
+        ("decoded", SKU_NAMES_DTYPE.newbyteorder("<")),
+    ]
+)
+# Missing numbers are stored as -1
+SERIES_RECORD_DTYPE = np.dtype(
+    [
+        ("name_offset", "<u4"),
+        ("name_length", "<u2"),
+        ("vcpus_min", "<i4"),
+        ("vcpus_max", "<i4"),
+        ("memory_gb_min", "<i4"),
+        ("memory_gb_max", "<i4"),
+        ("cap_acus_min", "<i4"),
+        ("cap_acus_max", "<i4"),
+        # Feature bitmask, see 'src.catalogue.features'
+        ("features", "<u8"),
+    ]
+)
+
+
+def normalize_name(name: str) -> bytes:
+    """SKU names are matched ignoring case and surrounding whitespace"""
+    return name.strip().lower().encode()
+
+
+def hash_name(key: bytes, seed: int = 0) -> t.Tuple[int, int, int]:
+    """Return the bucket hash and the two slot hashes of a normalized name"""
+    digest = hashlib.blake2b(
+        key, digest_size=12, salt=seed.to_bytes(16, "little")
+    ).digest()
+    return (
+        int.from_bytes(digest[:4], "little"),
+        int.from_bytes(digest[4:8], "little"),
+        int.from_bytes(digest[8:], "little"),
+    )
+
+
+def slot(hashes: t.Tuple[int, int, int], displacement: int, size: int) -> int:
+    d0, d1 = divmod(displacement, size)
+    return (hashes[1] + d0 * hashes[2] + d1) % size
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class SkuLookupFileWriter:
+    """
+    Builds a read-only SKU lookup file, consisting of
+        a header ('HEADER')
+        a minimal perfect hash over the normalized SKU names (hash and displace):
+            every name hashes to a bucket, every bucket has a displacement (uint32)
+            which places all of its names on distinct record slots
+        fixed-width SKU records ('SKU_RECORD_DTYPE'), in slot order, with the decoded SKU name
+        fixed-width series records ('SERIES_RECORD_DTYPE')
+        a string table with all names, referenced by offset and length
+    """
+
+    def __init__(self) -> None:
+        self.series: t.Dict[str, Document] = {}
+        self.skus: t.Dict[str, t.Tuple[str, t.Optional[str]]] = {}
+
+    def add_series(self, document: Document) -> None:
+        self.series[document["name"]] = document
+
+    def add_sku(self, document: Document, series_name: t.Optional[str] = None) -> None:
+        name = document["name"].strip()
+        assert name.isascii(), f"SKU name '{name}' is not ASCII"
+        self.skus[name] = (name, series_name)
+
+    @classmethod
+    def from_azure_types(cls, series_types, sku_types) -> "SkuLookupFileWriter":
+        """Collect the Azure Types of a scrape, SKUs are linked to the series they were parsed from"""
+        writer = cls()
+        for series_type in series_types:
+            writer.add_series(series_type.serialize())
+        for sku_type in sku_types:
+            writer.add_sku(sku_type.serialize(), sku_type.series_name)
+        return writer
+
+    @classmethod
+    def perfect_hash(cls, keys: t.List[bytes]) -> t.Tuple[int, np.ndarray, np.ndarray]:
+        """Return the hash seed, the displacement of every bucket and the slot of every key"""
+        for seed in itertools.count():
+            hashes = [hash_name(key, seed) for key in keys]
+            try:
+                return (seed, *cls.displacements(hashes))
+            except ValueError:
+                logger.debug(f"No perfect hash for seed {seed}, trying the next one")
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def displacements(
+        hashes: t.List[t.Tuple[int, int, int]],
+    ) -> t.Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the displacement of every bucket and the slot of every key,
+        raise a ValueError if the keys of a bucket can not be placed
+        """
+        size = max(len(hashes), 1)
+        n_buckets = max(len(hashes) // BUCKET_SIZE, 1)
+        buckets: t.List[t.List[int]] = [[] for _ in range(n_buckets)]
+        for i, key_hashes in enumerate(hashes):
+            buckets[key_hashes[0] % n_buckets].append(i)
+        displacements = np.zeros(n_buckets, dtype="<u4")
+        slots = np.full(len(hashes), -1, dtype=np.int64)
+        occupied = np.zeros(size, dtype=bool)
+        free_slots: t.Optional[t.List[int]] = None
+        # Large buckets are placed first, while most slots are still free
+        for bucket in sorted(range(n_buckets), key=lambda b: -len(buckets[b])):
+            keys = buckets[bucket]
+            if not keys:
+                continue
+            if len(keys) == 1:
+                # Any free slot can be reached directly, with a displacement below 'size'
+                if free_slots is None:
+                    free_slots = np.flatnonzero(~occupied).tolist()
+                free_slot = free_slots.pop()
+                displacements[bucket] = (free_slot - hashes[keys[0]][1]) % size
+                slots[keys[0]] = free_slot
+                continue
+            # Candidate displacements are tried in chunks, all keys of the bucket at once
+            h1 = np.array([hashes[i][1] for i in keys], dtype=np.int64)[:, None]
+            h2 = np.array([hashes[i][2] for i in keys], dtype=np.int64)[:, None]
+            # Displacements beyond 'size' squared only repeat the slots of smaller ones
+            for start in itertools.count(0, DISPLACEMENT_CHUNK_SIZE):
+                if start >= min(size * size, MAX_DISPLACEMENT):
+                    raise ValueError(f"Could not place the keys of bucket {bucket}")
+                d0, d1 = np.divmod(
+                    np.arange(start, start + DISPLACEMENT_CHUNK_SIZE, dtype=np.int64),
+                    size,
+                )
+                candidates = (h1 + d0 * h2 + d1) % size
+                ordered = np.sort(candidates, axis=0)
+                valid = ~occupied[candidates].any(axis=0) & (
+                    np.diff(ordered, axis=0) != 0
+                ).all(axis=0)
+                if valid.any():
+                    break
+            best = int(np.argmax(valid))
+            displacements[bucket] = start + best
+            slots[keys] = candidates[:, best]
+            occupied[candidates[:, best]] = True
+        return displacements, slots
+
+    def write(self, path: t.Union[str, Path]) -> None:
+        strings = bytearray()
+
+        def add_string(value: str) -> t.Tuple[int, int]:
+            data = value.encode()
+            offset = len(strings)
+            strings.extend(data)
+            return offset, len(data)
+
+        series_names = list(self.series.keys())
+        series_index = {name: i for i, name in enumerate(series_names)}
+        series_records = np.zeros(len(series_names), dtype=SERIES_RECORD_DTYPE)
+        for i, name in enumerate(series_names):
+            document = self.series[name]
+            record = series_records[i]
+            record["name_offset"], record["name_length"] = add_string(name)
+            for field in SERIES_RECORD_DTYPE.names[2:-1]:
+                value = document.get(field, None)
+                record[field] = -1 if value is None else value
+            record["features"] = encode_features(document)
+
+        names = list(self.skus.keys())
+        keys = [normalize_name(name) for name in names]
+        if len(set(keys)) != len(keys):
+            raise ValueError("SKU names are not unique after normalization")
+        seed, displacements, slots = self.perfect_hash(keys)
+        decoded = SkuNameDecoder().decode(names)
+        sku_records = np.zeros(len(names), dtype=SKU_RECORD_DTYPE)
+        for i, name in enumerate(names):
+            record = sku_records[slots[i]]
+            record["key_offset"], _ = add_string(keys[i].decode())
+            record["name_offset"], record["name_length"] = add_string(name)
+            record["series"] = series_index.get(self.skus[name][1], -1)
+            record["decoded"] = decoded[i]
+
+        offset = _align(HEADER.size)
+        sections = []
+        for data in (
+            displacements.tobytes(),
+            sku_records.tobytes(),
+            series_records.tobytes(),
+            bytes(strings),
+        ):
+            sections.append((offset, data))
+            offset = _align(offset + len(data))
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            seed,
+            len(names),
+            len(displacements),
+            len(series_names),
+            *(section_offset for section_offset, _ in sections),
+        )
+        with open(path, "wb") as fout:
+            fout.write(header)
+            for section_offset, data in sections:
+                fout.write(b"\0" * (section_offset - fout.tell()))
+                fout.write(data)
+        logger.info(
+            f"Wrote SKU lookup file '{path}' with {len(names)} SKUs and {len(series_names)} series"
+        )
+
+
+class SkuLookupFile:
+    """
+    Memory mapped reader of a file written by 'SkuLookupFileWriter'.
+    The file is mapped read-only, so all processes opening it share the same pages,
+    and records are NumPy views on the mapping, nothing is loaded into Python objects up front.
+    'find' only hashes the name and compares it against a single record
+    """
+
+    def __init__(self, path: t.Union[str, Path]) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as fin:
+            self._mmap = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.seed,
+            self.n_skus,
+            self.n_buckets,
+            self.n_series,
+            displacements_offset,
+            skus_offset,
+            series_offset,
+            self._strings_offset,
+        ) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(
+                f"'{self.path}' is not a SKU lookup file of version {VERSION}"
+            )
+        self._view = memoryview(self._mmap)
+        self._displacements = self._view[
+            displacements_offset : displacements_offset + 4 * self.n_buckets
+        ].cast("I")
+        self.skus = np.frombuffer(
+            self._mmap, SKU_RECORD_DTYPE, self.n_skus, skus_offset
+        )
+        self.series = np.frombuffer(
+            self._mmap, SERIES_RECORD_DTYPE, self.n_series, series_offset
+        )
+        self._key_offsets = self.skus["key_offset"]
+        self._name_lengths = self.skus["name_length"]
+
+    def __enter__(self) -> "SkuLookupFile":
+        return self
+
+    def __exit__(self, *args, **kwargs) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # Views on the mapping have to be released before it can be closed
+        self._displacements.release()
+        self._view.release()
+        del self.skus, self.series, self._key_offsets, self._name_lengths
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return self.n_skus
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return str(self._mmap[start : start + length], "utf-8")
+
+    def find(self, name: str) -> int:
+        """Return the index of the SKU record for 'name', or -1 if the SKU is unknown"""
+        if not self.n_skus:
+            return -1
+        key = normalize_name(name)
+        hashes = hash_name(key, self.seed)
+        displacement = self._displacements[hashes[0] % self.n_buckets]
+        index = slot(hashes, displacement, self.n_skus)
+        # Unknown names hash to an arbitrary record, which holds a different key
+        length = int(self._name_lengths[index])
+        if length != len(key):
+            return -1
+        start = self._strings_offset + int(self._key_offsets[index])
+        if self._view[start : start + length] != key:
+            return -1
+        return index
+
+    def name(self, index: int) -> str:
+        """Return the name of the SKU record at 'index', as it was scraped"""
+        record = self.skus[index]
+        return self._string(int(record["name_offset"]), int(record["name_length"]))
+
+    def names(self) -> t.Iterator[str]:
+        for index in range(self.n_skus):
+            yield self.name(index)
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) != -1
+
+    def get(self, name: str) -> t.Optional[t.Dict[str, t.Any]]:
+        """Return the decoded attributes of the SKU 'name' and the specs of its series"""
+        index = self.find(name)
+        if index == -1:
+            return None
+        record = self.skus[index]
+        decoded = record["decoded"]
+        result: t.Dict[str, t.Any] = {
+            "name": self.name(index),
+            **{field: decoded[field].item() for field in SKU_NAMES_DTYPE.names},
+            "series": None,
+        }
+        if record["series"] != -1:
+            series = self.series[record["series"]]
+            result["series"] = {
+                "name": self._string(
+                    int(series["name_offset"]), int(series["name_length"])
+                ),
+                **{
+                    field: (None if series[field] == -1 else int(series[field]))
+                    for field in SERIES_RECORD_DTYPE.names[2:-1]
+                },
+                "features": int(series["features"]),
+            }
+        return result
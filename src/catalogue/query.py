@@ -0,0 +1,212 @@
+import logging
+import operator
+import typing as t
+from functools import cached_property
+
+import numpy as np
+
+from src.azure_types.shared import AzureType
+
+from .features import FeatureIndex
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+# Vectorized comparison for every operator of 'Query.where', missing values never match
+OPERATORS: t.Dict[str, t.Callable[[np.ndarray, t.Any], np.ndarray]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda column, values: np.isin(column, list(values)),
+}
+
+
+class CatalogueTable:
+    """
+    Serialized Azure Types of one collection as NumPy columns, one row per document.
+    Columns are typed from their values:
+        numbers (int, float)    float64, missing values are NaN
+        booleans                bool, missing values are False
+        strings                 unicode, missing values are ''
+        anything else           object, e.g. the '*_specs' lists and description mappings
+    A 'nulls' mask is kept for every column, so missing values can be queried with 'isnull'
+    """
+
+    def __init__(self, documents: t.Sequence[Document]) -> None:
+        self.documents = documents
+        self.columns: t.Dict[str, np.ndarray] = {}
+        self.nulls: t.Dict[str, np.ndarray] = {}
+        fields: t.Dict[str, None] = {}
+        for document in documents:
+            fields.update(dict.fromkeys(document.keys()))
+        for field in fields:
+            values = [document.get(field, None) for document in documents]
+            self.columns[field], self.nulls[field] = self._to_column(values)
+        logger.debug(
+            f"Loaded {len(documents)} documents into {len(self.columns)} columns"
+        )
+
+    @staticmethod
+    def _to_column(values: t.List[t.Any]) -> t.Tuple[np.ndarray, np.ndarray]:
+        nulls = np.fromiter((value is None for value in values), bool, len(values))
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, bool) for value in present):
+            column = np.fromiter((bool(value) for value in values), bool, len(values))
+        elif present and all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in present
+        ):
+            column = np.fromiter(
+                (np.nan if value is None else value for value in values),
+                np.float64,
+                len(values),
+            )
+        elif present and all(isinstance(value, str) for value in present):
+            column = np.array(["" if value is None else value for value in values])
+        else:
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+        return column, nulls
+
+    @classmethod
+    def from_documents(cls, documents: t.Iterable[Document]) -> "CatalogueTable":
+        return cls(list(documents))
+
+    @classmethod
+    def from_azure_types(cls, azure_types: t.Iterable[AzureType]) -> "CatalogueTable":
+        """Load the Azure Types of a scrape directly, without a storage round trip"""
+        return cls([azure_type.serialize() for azure_type in azure_types])
+
+    @classmethod
+    def from_backend(cls, backend, collection_name: str) -> "CatalogueTable":
+        """Load all documents of 'collection_name' from a 'src.storage' backend"""
+        return cls(list(backend.iter_documents(collection_name)))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    @cached_property
+    def features(self) -> FeatureIndex:
+        return FeatureIndex.from_documents(self.documents)
+
+    def query(self) -> "Query":
+        return Query(self)
+
+
+class Query:
+    """
+    Lazily combined predicates and sort keys over a 'CatalogueTable', e.g.
+        table.query().filter(memory_gb_min__ge=64, vcpus_max__le=16, cap_premium_storage_capable=True)
+                     .order_by("-memory_gb_max", "name")
+    Predicates are given as '<field>__<operator>', operators are those in 'OPERATORS'
+    as well as 'contains' for object columns and 'isnull', a plain '<field>' compares for equality.
+    Every call returns a new query, so partial queries can be reused
+    """
+
+    def __init__(
+        self,
+        table: CatalogueTable,
+        mask: t.Optional[np.ndarray] = None,
+        ordering: t.Tuple[str, ...] = (),
+        limit: t.Optional[int] = None,
+    ) -> None:
+        self.table = table
+        self.mask = mask if mask is not None else np.ones(len(table), dtype=bool)
+        self.ordering = ordering
+        self._limit = limit
+
+    def _copy(self, **kwargs) -> "Query":
+        arguments = dict(mask=self.mask, ordering=self.ordering, limit=self._limit)
+        arguments.update(kwargs)
+        return Query(self.table, **arguments)
+
+    def predicate(self, field: str, op: str, value: t.Any) -> np.ndarray:
+        """Evaluate a single predicate over all rows"""
+        if field not in self.table.columns:
+            raise KeyError(f"Unknown field '{field}'")
+        column = self.table.columns[field]
+        nulls = self.table.nulls[field]
+        if op == "isnull":
+            return nulls if value else ~nulls
+        if op == "contains":
+            return np.fromiter(
+                (bool(cell) and value in cell for cell in column), bool, len(column)
+            )
+        if op not in OPERATORS:
+            raise ValueError(
+                f"Unknown operator '{op}', choose one of {list(OPERATORS)}"
+            )
+        return OPERATORS[op](column, value) & ~nulls
+
+    def where(self, field: str, op: str, value: t.Any) -> "Query":
+        return self._copy(mask=self.mask & self.predicate(field, op, value))
+
+    def features(
+        self, include: t.Iterable[str] = (), exclude: t.Iterable[str] = ()
+    ) -> "Query":
+        """Keep rows with all features of 'include' and none of 'exclude', see 'FeatureIndex'"""
+        return self._copy(mask=self.mask & self.table.features.mask(include, exclude))
+
+    def filter(self, **predicates: t.Any) -> "Query":
+        mask = self.mask
+        for key, value in predicates.items():
+            field, _, op = key.rpartition("__")
+            if not field or op not in (*OPERATORS, "contains", "isnull"):
+                field, op = key, "eq"
+            mask = mask & self.predicate(field, op, value)
+        return self._copy(mask=mask)
+
+    def order_by(self, *fields: str) -> "Query":
+        """Sort by 'fields' in order of precedence, a leading '-' sorts descending, missing values come last"""
+        return self._copy(ordering=fields)
+
+    def limit(self, limit: int) -> "Query":
+        return self._copy(limit=limit)
+
+    def _sort_key(self, field: str, indices: np.ndarray) -> t.List[np.ndarray]:
+        descending = field.startswith("-")
+        field = field.lstrip("-")
+        column = self.table.columns[field][indices]
+        if column.dtype == object:
+            raise ValueError(f"Field '{field}' can not be sorted")
+        # Ranks make descending order uniform for numbers, booleans and strings
+        _, ranks = np.unique(column, return_inverse=True)
+        ranks = -ranks if descending else ranks
+        # 'np.lexsort' sorts by the last key first, the null flag precedes the ranks
+        return [ranks, self.table.nulls[field][indices]]
+
+    def indices(self) -> np.ndarray:
+        """Return the row indices of all matching documents, in order"""
+        indices = np.flatnonzero(self.mask)
+        if self.ordering and len(indices):
+            keys: t.List[np.ndarray] = []
+            for field in reversed(self.ordering):
+                keys.extend(self._sort_key(field, indices))
+            indices = indices[np.lexsort(keys)]
+        if self._limit is not None:
+            indices = indices[: self._limit]
+        return indices
+
+    def count(self) -> int:
+        if self._limit is None:
+            return int(np.count_nonzero(self.mask))
+        return len(self.indices())
+
+    def names(self) -> t.List[str]:
+        return self.table.columns["name"][self.indices()].tolist()
+
+    def documents(self) -> t.List[Document]:
+        return [self.table.documents[i] for i in self.indices()]
+
+    def __iter__(self) -> t.Iterator[Document]:
+        return iter(self.documents())
+
+    def __len__(self) -> int:
+        return self.count()
@@ -0,0 +1,230 @@
+import bisect
+import gzip
+import json
+import logging
+import re
+import typing as t
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+TOKEN_REGEX = re.compile(r"[^\W_]+(?:\.[^\W_]+)*")
+# Phrases in double quotes, prefixes ending in '*' and plain terms of a search query
+QUERY_REGEX = re.compile(r'"([^"]*)"|(\S+)')
+
+# (series name, section), e.g. ('Dsv5', 'summary')
+Hit = t.Tuple[str, str]
+
+
+def tokenize(text: str) -> t.List[str]:
+    """Split text into lower case words, keeping decimals and versions such as '2.8' together"""
+    return TOKEN_REGEX.findall(text.lower())
+
+
+def series_sections(parser) -> t.Dict[str, str]:
+    """
+    Return the text of a 'SeriesMarkdownDocumentParser' per section, from the parser's cached properties,
+    so nothing the Azure Type already parsed is parsed again:
+        'title'         the first header
+        'summary'       the host summary
+        'specs'         the host specs table, one '<part> <column> <value>' line per cell
+        'capabilities'  the parsed capabilities, one '<name> <value>' line each
+    """
+    sections = {
+        "title": parser.stringify(parser.document.headers[0])
+        if parser.document.headers
+        else parser.name,
+        "summary": parser.host_summary,
+        "specs": "\n".join(
+            f"{part} {column} {value if isinstance(value, str) else ' '.join(value)}"
+            for part, columns in parser.host_specs_table.items()
+            for column, value in columns.items()
+        ),
+        "capabilities": "\n".join(
+            f"{name.replace('_', ' ')} {value}"
+            for name, value in parser.capabilities.items()
+        ),
+    }
+    return sections
+
+
+class InvertedIndex:
+    """
+    Positional inverted index over the text sections of all series, see 'series_sections'.
+    Every (series, section) pair is one indexed document, 'postings' maps each term to the documents
+    containing it and the token positions it occurs at. 'search' understands
+        plain terms             'xeon platinum'     all terms anywhere in the section
+        phrases                 '"premium storage"' the terms next to each other, in order
+        prefixes                'epyc*'             any term starting with 'epyc'
+    Prefixes are looked up in the sorted term list with 'bisect', without scanning the vocabulary
+    """
+
+    def __init__(self) -> None:
+        self.documents: t.List[t.Optional[Hit]] = []
+        self.document_ids: t.Dict[Hit, int] = {}
+        self.postings: t.Dict[str, t.Dict[int, t.List[int]]] = {}
+        self._terms: t.Optional[t.List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    @property
+    def terms(self) -> t.List[str]:
+        if self._terms is None:
+            self._terms = sorted(self.postings)
+        return self._terms
+
+    def add(self, series_name: str, section: str, text: str) -> None:
+        """Index the text of a section, replacing what was indexed for it before"""
+        key = (series_name, section)
+        if key in self.document_ids:
+            self._remove_document(self.document_ids.pop(key))
+        document_id = len(self.documents)
+        self.documents.append(key)
+        self.document_ids[key] = document_id
+        for position, term in enumerate(tokenize(text)):
+            self.postings.setdefault(term, {}).setdefault(document_id, []).append(
+                position
+            )
+        self._terms = None
+
+    def add_series(self, series_name: str, sections: t.Mapping[str, str]) -> None:
+        self.remove(series_name)
+        for section, text in sections.items():
+            self.add(series_name, section, text)
+
+    def _remove_document(self, document_id: int) -> None:
+        self.documents[document_id] = None
+        terms = [
+            term
+            for term, documents in self.postings.items()
+            if document_id in documents
+        ]
+        for term in terms:
+            del self.postings[term][document_id]
+            if not self.postings[term]:
+                del self.postings[term]
+        self._terms = None
+
+    def remove(self, series_name: str) -> None:
+        """Remove all sections of a series"""
+        for key in [key for key in self.document_ids if key[0] == series_name]:
+            self._remove_document(self.document_ids.pop(key))
+
+    def term(self, term: str) -> t.Dict[int, t.List[int]]:
+        return self.postings.get(term, {})
+
+    def prefix(self, prefix: str) -> t.Dict[int, t.List[int]]:
+        """Merge the postings of all terms starting with 'prefix'"""
+        merged: t.Dict[int, t.List[int]] = {}
+        terms = self.terms
+        start = bisect.bisect_left(terms, prefix)
+        end = bisect.bisect_left(terms, prefix + "\U0010ffff", lo=start)
+        for term in terms[start:end]:
+            for document_id, positions in self.postings[term].items():
+                merged.setdefault(document_id, []).extend(positions)
+        return {
+            document_id: sorted(positions) for document_id, positions in merged.items()
+        }
+
+    def _postings(self, token: str) -> t.Dict[int, t.List[int]]:
+        if token.endswith("*"):
+            return self.prefix(token.rstrip("*").lower())
+        return self.term(token)
+
+    def phrase(self, tokens: t.Sequence[str]) -> t.Dict[int, t.List[int]]:
+        """Return the documents with 'tokens' at consecutive positions and the positions they start at"""
+        if not tokens:
+            return {}
+        matches = {
+            document_id: set(positions)
+            for document_id, positions in self._postings(tokens[0]).items()
+        }
+        for offset, token in enumerate(tokens[1:], start=1):
+            postings = self._postings(token)
+            next_matches: t.Dict[int, t.Set[int]] = {}
+            for document_id, starts in matches.items():
+                positions = set(postings.get(document_id, ()))
+                starts = {start for start in starts if start + offset in positions}
+                if starts:
+                    next_matches[document_id] = starts
+            matches = next_matches
+        return {
+            document_id: sorted(starts) for document_id, starts in matches.items()
+        }
+
+    def search(self, query: str) -> t.List[Hit]:
+        """Return the sections matching all parts of 'query', in series and section order"""
+        document_ids: t.Optional[t.Set[int]] = None
+        for phrase, word in QUERY_REGEX.findall(query):
+            # A plain word may still tokenize into several terms, e.g. 'Standard_D2s'
+            tokens: t.List[str] = []
+            for part in (phrase or word).split():
+                part_tokens = tokenize(part)
+                if part.endswith("*") and part_tokens:
+                    part_tokens[-1] += "*"
+                tokens.extend(part_tokens)
+            matches = set(self.phrase(tokens))
+            document_ids = matches if document_ids is None else document_ids & matches
+            if not document_ids:
+                return []
+        return sorted(
+            t.cast(Hit, self.documents[document_id])
+            for document_id in document_ids or ()
+        )
+
+    def search_series(self, query: str) -> t.List[str]:
+        """Like 'search', only the names of the matching series"""
+        return sorted({series_name for series_name, _ in self.search(query)})
+
+    def to_document(self) -> t.Dict[str, t.Any]:
+        # Document ids are compacted, removed documents leave no gaps
+        ids = {
+            document_id: i
+            for i, document_id in enumerate(sorted(self.document_ids.values()))
+        }
+        return {
+            "format_version": FORMAT_VERSION,
+            "documents": [
+                list(t.cast(Hit, self.documents[document_id])) for document_id in ids
+            ],
+            "postings": {
+                term: [
+                    [ids[document_id], positions]
+                    for document_id, positions in documents.items()
+                ]
+                for term, documents in sorted(self.postings.items())
+            },
+        }
+
+    @classmethod
+    def from_document(cls, document: t.Mapping[str, t.Any]) -> "InvertedIndex":
+        if document.get("format_version", None) != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported text index version '{document.get('format_version', None)}'"
+            )
+        index = cls()
+        for series_name, section in document["documents"]:
+            index.document_ids[(series_name, section)] = len(index.documents)
+            index.documents.append((series_name, section))
+        index.postings = {
+            term: {document_id: positions for document_id, positions in documents}
+            for term, documents in document["postings"].items()
+        }
+        return index
+
+    def save(self, path: t.Union[str, Path]) -> None:
+        """Write the index as gzip compressed JSON, replacing 'path' atomically"""
+        path = Path(path)
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        data = json.dumps(self.to_document(), separators=(",", ":")).encode()
+        temporary_path.write_bytes(gzip.compress(data))
+        temporary_path.replace(path)
+        logger.info(
+            f"Wrote text index of {len(self)} sections and {len(self.postings)} terms to '{path}'"
+        )
+
+    @classmethod
+    def load(cls, path: t.Union[str, Path]) -> "InvertedIndex":
+        return cls.from_document(json.loads(gzip.decompress(Path(path).read_bytes())))
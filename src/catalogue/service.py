@@ -0,0 +1,328 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from src import constants
+from src.azure_types.instances import SkuType
+from src.azure_types.series import AzureSkuSeriesType
+from src.azure_types.shared import AzureType
+
+from .query import OPERATORS, CatalogueTable, Query
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+# URL path of every served collection
+ENDPOINTS: t.Dict[str, str] = {
+    "series": AzureSkuSeriesType.mongodb_collection_name,
+    "skus": SkuType.mongodb_collection_name,
+}
+# Query parameters of the list endpoints which are not filters
+RESERVED_PARAMETERS = ("order_by", "limit", "features", "exclude_features", "fields")
+# Responses are only compressed if they are larger than this
+GZIP_MIN_SIZE = 1024
+
+
+class CatalogueSnapshot:
+    """
+    All documents of the served collections, loaded into 'CatalogueTable's and indexed by name.
+    The 'etag' is derived from the content fingerprints, so reloading unchanged data keeps it
+    """
+
+    def __init__(
+        self, tables: t.Mapping[str, CatalogueTable], version: t.Optional[str] = None
+    ) -> None:
+        self.tables = dict(tables)
+        self.version = version
+        self.by_name: t.Dict[str, t.Dict[str, Document]] = {
+            collection_name: {document["name"]: document for document in table.documents}
+            for collection_name, table in self.tables.items()
+        }
+        digest = hashlib.sha256()
+        for collection_name, table in sorted(self.tables.items()):
+            digest.update(collection_name.encode())
+            for document in table.documents:
+                digest.update(AzureType.document_fingerprint(document).encode())
+        self.etag = digest.hexdigest()[:16]
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_backend(cls, backend) -> "CatalogueSnapshot":
+        """Read all served collections from a 'src.storage' backend"""
+        version = backend.version()
+        return cls(
+            {
+                collection_name: CatalogueTable.from_backend(backend, collection_name)
+                for collection_name in ENDPOINTS.values()
+            },
+            version,
+        )
+
+
+class CatalogueSnapshotLoader:
+    """
+    Keeps the current 'CatalogueSnapshot' of a storage backend.
+    'refresh' rebuilds it when the backend reports a new 'version', e.g. after a run published
+    or rewrote its output, backends without versions are reloaded on every refresh.
+    'start' refreshes every 'interval' seconds in a background thread, which is then the only one
+    reading from the backend; requests keep being answered from the previous snapshot meanwhile
+    """
+
+    def __init__(
+        self,
+        backend,
+        interval: float = constants.CATALOGUE_SERVICE_RELOAD_INTERVAL,
+    ) -> None:
+        if not backend.readable:
+            raise ValueError(
+                f"Storage backend '{backend.name}' can not be read back, "
+                "configure one that stores its documents"
+            )
+        self.backend = backend
+        self.interval = interval
+        self.snapshot: t.Optional[CatalogueSnapshot] = None
+        self._stopped = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Rebuild the snapshot if the stored documents changed, return whether it was rebuilt"""
+        version = self.backend.version()
+        if (
+            self.snapshot is not None
+            and version is not None
+            and version == self.snapshot.version
+        ):
+            return False
+        started = time.perf_counter()
+        snapshot = CatalogueSnapshot.from_backend(self.backend)
+        if self.snapshot is not None and snapshot.etag == self.snapshot.etag:
+            # Same content, e.g. an unchanged run was published again
+            self.snapshot.version = snapshot.version
+            return False
+        self.snapshot = snapshot
+        logger.info(
+            f"Loaded catalogue snapshot '{snapshot.etag}' from storage backend '{self.backend.name}' "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+        return True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Reloading the catalogue snapshot failed: {e!r}")
+            self._stopped.wait(self.interval)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class Response(t.NamedTuple):
+    status: HTTPStatus
+    body: bytes
+    etag: t.Optional[str] = None
+    gzipped: t.Optional[bytes] = None
+
+
+def parse_value(value: str) -> t.Any:
+    """Query parameter values are JSON if possible, e.g. '64', 'true', 'null', else plain strings"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class CatalogueService:
+    """
+    Answers read requests from the current snapshot of a 'CatalogueSnapshotLoader':
+        GET /series, GET /skus                  list documents, filtered by the query parameters
+        GET /series/<name>, GET /skus/<name>    fetch a single document by name
+    List parameters follow 'Query.filter', e.g. '/series?memory_gb_min__ge=64&family_id__in=D,E',
+    besides 'order_by' (comma separated, see 'Query.order_by'), 'limit', 'fields' (comma separated),
+    'features' and 'exclude_features' (comma separated, see 'FeatureIndex').
+    Rendered responses are cached per snapshot, so repeated requests skip querying and encoding
+    """
+
+    def __init__(
+        self,
+        loader: CatalogueSnapshotLoader,
+        cache_size: int = constants.CATALOGUE_SERVICE_CACHE_SIZE,
+    ) -> None:
+        self.loader = loader
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[t.Tuple[str, str], Response]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, target: str) -> Response:
+        """Answer 'GET target', with 'target' being the path and query string of the request"""
+        snapshot = self.loader.snapshot
+        if snapshot is None:
+            return self._error(
+                HTTPStatus.SERVICE_UNAVAILABLE, "Catalogue is not loaded yet"
+            )
+        key = (snapshot.etag, target)
+        with self._lock:
+            response = self._cache.get(key, None)
+            if response is not None:
+                self._cache.move_to_end(key)
+                return response
+        response = self._render(snapshot, target)
+        if response.status == HTTPStatus.OK:
+            with self._lock:
+                self._cache[key] = response
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _error(status: HTTPStatus, message: str) -> Response:
+        return Response(status, json.dumps({"error": message}).encode())
+
+    def _render(self, snapshot: CatalogueSnapshot, target: str) -> Response:
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if parts[0] not in ENDPOINTS or len(parts) > 2:
+            return self._error(HTTPStatus.NOT_FOUND, f"Unknown path '{url.path}'")
+        collection_name = ENDPOINTS[parts[0]]
+        try:
+            if len(parts) == 2:
+                payload: t.Any = snapshot.by_name[collection_name].get(parts[1], None)
+                if payload is None:
+                    return self._error(
+                        HTTPStatus.NOT_FOUND, f"Unknown {parts[0]} '{parts[1]}'"
+                    )
+            else:
+                payload = self.list(
+                    snapshot.tables[collection_name], parse_qsl(url.query)
+                )
+        except (KeyError, ValueError, TypeError) as e:
+            return self._error(HTTPStatus.BAD_REQUEST, str(e))
+        body = json.dumps(payload, default=str).encode()
+        etag = f'"{snapshot.etag}-{hashlib.sha256(body).hexdigest()[:16]}"'
+        gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_SIZE else None
+        return Response(HTTPStatus.OK, body, etag, gzipped)
+
+    @staticmethod
+    def list(
+        table: CatalogueTable, parameters: t.List[t.Tuple[str, str]]
+    ) -> t.Dict[str, t.Any]:
+        options = {key: value for key, value in parameters if key in RESERVED_PARAMETERS}
+        query: Query = table.query()
+        for key, value in parameters:
+            if key in RESERVED_PARAMETERS:
+                continue
+            field, _, op = key.rpartition("__")
+            if not field or op not in (*OPERATORS, "contains", "isnull"):
+                field, op = key, "eq"
+            parsed = (
+                [parse_value(v) for v in value.split(",")]
+                if op == "in"
+                else parse_value(value)
+            )
+            query = query.where(field, op, parsed)
+        if "features" in options or "exclude_features" in options:
+            query = query.features(
+                include=[f for f in options.get("features", "").split(",") if f],
+                exclude=[
+                    f for f in options.get("exclude_features", "").split(",") if f
+                ],
+            )
+        if "order_by" in options:
+            query = query.order_by(*options["order_by"].split(","))
+        count = query.count()
+        if "limit" in options:
+            query = query.limit(int(options["limit"]))
+        documents = query.documents()
+        if "fields" in options:
+            fields = options["fields"].split(",")
+            documents = [
+                {field: document.get(field, None) for field in fields}
+                for document in documents
+            ]
+        return {"count": count, "documents": documents}
+
+
+class CatalogueRequestHandler(BaseHTTPRequestHandler):
+    """Serves a 'CatalogueService', with ETag revalidation and gzip content encoding"""
+
+    server: "CatalogueHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        response = self.server.service.get(self.path)
+        if_none_match = self.headers.get("If-None-Match", None)
+        if response.etag is not None and if_none_match is not None:
+            if response.etag in (tag.strip() for tag in if_none_match.split(",")):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", response.etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = response.body
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json")
+        if response.etag is not None:
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if response.gzipped is not None and "gzip" in self.headers.get(
+            "Accept-Encoding", ""
+        ):
+            body = response.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class CatalogueHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address: t.Tuple[str, int], service: CatalogueService
+    ) -> None:
+        super().__init__(address, CatalogueRequestHandler)
+        self.service = service
+
+
+def serve(
+    backend,
+    host: str = constants.CATALOGUE_SERVICE_HOST,
+    port: int = constants.CATALOGUE_SERVICE_PORT,
+) -> None:
+    """Serve the documents of 'backend' until interrupted"""
+    loader = CatalogueSnapshotLoader(backend)
+    loader.start()
+    server = CatalogueHTTPServer((host, port), CatalogueService(loader))
+    logger.warning(f"Serving the catalogue on 'http://{host}:{port}'")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        loader.stop()
+
+
+if __name__ == "__main__":
+    from src.storage.utility import get_storage_backend
+
+    serve(get_storage_backend())
@@ -0,0 +1,174 @@
+import logging
+import typing as t
+import warnings
+from functools import cached_property
+
+import numpy as np
+
+from .features import FEATURES, FeatureIndex, encode_features
+from .query import CatalogueTable
+
+logger = logging.getLogger(__name__)
+
+Document = t.Mapping[str, t.Any]
+
+# Numeric fields of the SKU itself, decoded from its name
+SKU_FIELDS: t.Tuple[str, ...] = ("vcpus",)
+# Numeric fields taken from the specs of the series a SKU belongs to
+SERIES_FIELDS: t.Tuple[str, ...] = (
+    "memory_gb_min",
+    "memory_gb_max",
+    "cap_acus_min",
+    "cap_acus_max",
+    "local_temp_storage_disks_max",
+    "remote_storage_disks_max",
+    "network_nics_max",
+)
+NUMERIC_FIELDS = SKU_FIELDS + SERIES_FIELDS
+
+
+class SimilarityIndex:
+    """
+    Normalized feature vectors of all SKUs for k-nearest-neighbour queries.
+    Every SKU is described by
+        its numeric fields ('NUMERIC_FIELDS'), log scaled and standardized over the catalogue,
+        with missing values set to the mean, so they neither attract nor repel
+        its feature bits ('FEATURES'), together with those of its series, weighted by 'feature_weight'
+    Distances are euclidean and computed for a whole batch of queries against all SKUs at once:
+        index.nearest("Standard_D4s_v5", k=3, include=["cap:live_migration"], vcpus__ge=4)
+    Candidates are restricted with feature 'include'/'exclude' lists (see 'FeatureIndex')
+    and the predicates of 'Query.filter' over the SKU merged with its series
+    """
+
+    def __init__(
+        self,
+        rows: t.Sequence[t.Tuple[Document, t.Optional[Document]]],
+        feature_weight: float = 0.5,
+    ) -> None:
+        self.rows = rows
+        self.names: t.List[str] = [sku["name"] for sku, _ in rows]
+        self.index: t.Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        numeric = np.array(
+            [
+                [self._number(sku.get(field, None)) for field in SKU_FIELDS]
+                + [
+                    self._number((series or {}).get(field, None))
+                    for field in SERIES_FIELDS
+                ]
+                for sku, series in rows
+            ],
+            dtype=np.float64,
+        ).reshape(len(rows), len(NUMERIC_FIELDS))
+        numeric = np.log1p(np.clip(numeric, 0, None))
+        with warnings.catch_warnings():
+            # Fields missing for every SKU have no mean, they end up as zeros
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(numeric, axis=0)
+            std = np.nanstd(numeric, axis=0)
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+        numeric = np.nan_to_num((numeric - mean) / std, nan=0.0)
+        masks = np.fromiter(
+            (
+                encode_features(sku) | encode_features(series or {})
+                for sku, series in rows
+            ),
+            np.uint64,
+            len(rows),
+        )
+        bits = (masks[:, None] >> np.arange(len(FEATURES), dtype=np.uint64)) & 1
+        self.vectors = np.hstack(
+            [numeric, bits.astype(np.float64) * feature_weight]
+        ).astype(np.float32)
+        self.squared_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.features = FeatureIndex(masks)
+
+    @staticmethod
+    def _number(value: t.Any) -> float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return np.nan
+
+    @classmethod
+    def from_azure_types(cls, series_types, sku_types, **kwargs) -> "SimilarityIndex":
+        """Index the Azure Types of a scrape, SKUs are linked to the series they were parsed from"""
+        series = {
+            series_type.name: series_type.serialize() for series_type in series_types
+        }
+        rows = {
+            sku_type.name: (sku_type.serialize(), series.get(sku_type.series_name, None))
+            for sku_type in sku_types
+        }
+        return cls(list(rows.values()), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @cached_property
+    def table(self) -> CatalogueTable:
+        """The SKUs merged with the fields of their series, for filtering candidates"""
+        return CatalogueTable([{**(series or {}), **sku} for sku, series in self.rows])
+
+    def candidates(
+        self,
+        include: t.Iterable[str] = (),
+        exclude: t.Iterable[str] = (),
+        **filters: t.Any,
+    ) -> np.ndarray:
+        """Return the boolean mask of all SKUs that may be returned"""
+        mask = self.features.mask(include, exclude)
+        if filters:
+            mask &= self.table.query().filter(**filters).mask
+        return mask
+
+    def nearest_many(
+        self,
+        names: t.Sequence[str],
+        k: int = 5,
+        include: t.Iterable[str] = (),
+        exclude: t.Iterable[str] = (),
+        **filters: t.Any,
+    ) -> t.List[t.List[t.Tuple[str, float]]]:
+        """
+        Return the 'k' closest candidates to each SKU of 'names', as (name, distance) pairs in order,
+        a SKU is never returned as its own neighbour
+        """
+        if any(name not in self.index for name in names):
+            unknown = [name for name in names if name not in self.index]
+            raise KeyError(f"Unknown SKUs {unknown}")
+        rows = np.array([self.index[name] for name in names], dtype=np.int64)
+        mask = self.candidates(include, exclude, **filters)
+        queries = self.vectors[rows]
+        # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, for all pairs with a single matrix product
+        distances = (
+            self.squared_norms[rows][:, None]
+            + self.squared_norms[None, :]
+            - 2 * queries @ self.vectors.T
+        )
+        distances = np.maximum(distances, 0)
+        distances[:, ~mask] = np.inf
+        distances[np.arange(len(rows)), rows] = np.inf
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return [[] for _ in names]
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for i, indices in enumerate(nearest):
+            indices = indices[np.isfinite(distances[i, indices])]
+            indices = indices[np.lexsort((indices, distances[i, indices]))]
+            results.append(
+                [
+                    (self.names[j], float(np.sqrt(distances[i, j])))
+                    for j in indices
+                ]
+            )
+        return results
+
+    def nearest(
+        self,
+        name: str,
+        k: int = 5,
+        include: t.Iterable[str] = (),
+        exclude: t.Iterable[str] = (),
+        **filters: t.Any,
+    ) -> t.List[t.Tuple[str, float]]:
+        return self.nearest_many([name], k, include, exclude, **filters)[0]
@@ -11,6 +11,71 @@ MONGODB_DATABASE_NAME = (
 )
 MONGODB_USERNAME = os.environ.get("MONGODB_USERNAME", None) or "root"
 MONGODB_PASSWORD = os.environ.get("MONGODB_PASSWORD", None) or "root"
+MONGODB_MAX_POOL_SIZE = int(os.environ.get("MONGODB_MAX_POOL_SIZE", None) or 100)
+MONGODB_BULK_BATCH_SIZE = int(os.environ.get("MONGODB_BULK_BATCH_SIZE", None) or 1000)
+MONGODB_BULK_FLUSH_INTERVAL = float(
+    os.environ.get("MONGODB_BULK_FLUSH_INTERVAL", None) or 10
+)
+MONGODB_PUBLISH = (os.environ.get("MONGODB_PUBLISH", None) or "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+MONGODB_NORMALIZE_DESCRIPTIONS = (
+    os.environ.get("MONGODB_NORMALIZE_DESCRIPTIONS", None) or "false"
+).lower() in ("1", "true", "yes")
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", None) or "mongodb"
+STORAGE_BATCH_SIZE = int(os.environ.get("STORAGE_BATCH_SIZE", None) or 1000)
+STORAGE_SQLITE_PATH = (
+    os.environ.get("STORAGE_SQLITE_PATH", None) or "ms_instance_family_scraper.sqlite3"
+)
+STORAGE_NDJSON_PATH = (
+    os.environ.get("STORAGE_NDJSON_PATH", None) or "ms_instance_family_scraper.ndjson"
+)
+STORAGE_ARROW_PATH = (
+    os.environ.get("STORAGE_ARROW_PATH", None) or "ms_instance_family_scraper_export"
+)
+STORAGE_ARROW_FORMAT = os.environ.get("STORAGE_ARROW_FORMAT", None) or "parquet"
+STORAGE_LOOKUP_PATH = (
+    os.environ.get("STORAGE_LOOKUP_PATH", None) or "ms_instance_family_scraper.skus"
+)
+STORAGE_AGGREGATES_PATH = (
+    os.environ.get("STORAGE_AGGREGATES_PATH", None)
+    or "ms_instance_family_scraper.aggregates.json"
+)
+STORAGE_JOURNAL_PATH = (
+    os.environ.get("STORAGE_JOURNAL_PATH", None)
+    or "ms_instance_family_scraper.journal.ndjson"
+)
+STORAGE_JOURNAL_FSYNC_BATCH_SIZE = int(
+    os.environ.get("STORAGE_JOURNAL_FSYNC_BATCH_SIZE", None) or 100
+)
+
+CATALOGUE_SERVICE_HOST = os.environ.get("CATALOGUE_SERVICE_HOST", None) or "127.0.0.1"
+CATALOGUE_SERVICE_PORT = int(os.environ.get("CATALOGUE_SERVICE_PORT", None) or 8080)
+CATALOGUE_SERVICE_RELOAD_INTERVAL = float(
+    os.environ.get("CATALOGUE_SERVICE_RELOAD_INTERVAL", None) or 30
+)
+CATALOGUE_SERVICE_CACHE_SIZE = int(
+    os.environ.get("CATALOGUE_SERVICE_CACHE_SIZE", None) or 1024
+)
+CATALOGUE_BUNDLE_STORE = os.environ.get("CATALOGUE_BUNDLE_STORE", None) or "file"
+CATALOGUE_BUNDLE_PATH = (
+    os.environ.get("CATALOGUE_BUNDLE_PATH", None) or "ms_instance_family_scraper_bundles"
+)
+CATALOGUE_TEXT_INDEX_PATH = (
+    os.environ.get("CATALOGUE_TEXT_INDEX_PATH", None)
+    or "ms_instance_family_scraper.text_index.json.gz"
+)
+SNAPSHOT_PATH = (
+    os.environ.get("SNAPSHOT_PATH", None) or "ms_instance_family_scraper.snapshot"
+)
+SNAPSHOT_COMPRESSION = os.environ.get("SNAPSHOT_COMPRESSION", None) or "gzip"
+
+INCLUDE_LINK_INDEX_CACHE_SIZE = int(
+    os.environ.get("INCLUDE_LINK_INDEX_CACHE_SIZE", None) or 64
+)
 
 MS_REPOSITORY_URL = "https://github.com/MicrosoftDocs/azure-compute-docs.git"
 MS_REPOSITORY_NAME = t.cast(
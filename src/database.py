@@ -1,10 +1,28 @@
+import logging
+import time
 import typing as t
 
+from pymongo import DeleteOne, IndexModel, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
 from src import constants
-import logging
+from src.azure_types.series import AzureSkuSeriesType
+from src.azure_types.shared import AzureType
 
 from .mixins import MongoDBMixin
 
+DUPLICATE_KEY_ERROR = 11000
+
+
+def is_duplicate_id_error(error: t.Mapping[str, t.Any]) -> bool:
+    """Whether a write error of a bulk write is a duplicate key on the '_id' index"""
+    if error["code"] != DUPLICATE_KEY_ERROR:
+        return False
+    key_pattern = error.get("keyPattern", None)
+    if key_pattern is not None:
+        return list(key_pattern) == ["_id"]
+    return " index: _id_ " in error.get("errmsg", "")
+
 
 class MongoDB(MongoDBMixin):
     mongodb_database_name: t.ClassVar[str] = constants.MONGODB_DATABASE_NAME
@@ -14,3 +32,496 @@ class MongoDB(MongoDBMixin):
 
     def __init__(self) -> None:
         self.logger = logging.getLogger(__name__)
+
+
+class IndexManager(MongoDB):
+    """
+    Ensures the indexes declared in 'AzureType.mongodb_indexes' exist on their collections
+    and reports declared indexes that are missing as well as existing indexes that are never used
+    """
+
+    def __init__(self, azure_types: t.Sequence[t.Type[AzureType]]) -> None:
+        super().__init__()
+        self.azure_types = azure_types
+
+    def _collection(self, azure_type: t.Type[AzureType]):
+        return self.client[self.mongodb_database_name][
+            azure_type.mongodb_collection_name
+        ]
+
+    @staticmethod
+    def index_name(index: IndexModel) -> str:
+        return index.document["name"]
+
+    def missing(self) -> t.Dict[str, t.List[str]]:
+        """Return the names of all declared indexes that do not exist yet, per collection"""
+        missing: t.Dict[str, t.List[str]] = {}
+        for azure_type in self.azure_types:
+            existing = self._collection(azure_type).index_information()
+            missing[azure_type.mongodb_collection_name] = [
+                self.index_name(index)
+                for index in azure_type.mongodb_indexes
+                if self.index_name(index) not in existing
+            ]
+        return missing
+
+    def unused(self) -> t.Dict[str, t.List[str]]:
+        """Return the names of all existing indexes that have not served a single operation, per collection"""
+        unused: t.Dict[str, t.List[str]] = {}
+        for azure_type in self.azure_types:
+            stats = self._collection(azure_type).aggregate([{"$indexStats": {}}])
+            unused[azure_type.mongodb_collection_name] = [
+                stat["name"]
+                for stat in stats
+                if stat["name"] != "_id_" and not stat["accesses"]["ops"]
+            ]
+        return unused
+
+    def migrate_document_ids(
+        self, batch_size: int = constants.MONGODB_BULK_BATCH_SIZE
+    ) -> t.Dict[str, int]:
+        """
+        One-off migration of documents stored before '_id' was derived from the name to 'AzureType.document_id',
+        run with 'python -m src.database' once before the first run of this version.
+        Return the number of migrated documents per collection.
+
+        The unique indexes, which forbid two copies of a name, are dropped first and recreated by 'ensure' at the end.
+        Copies with the deterministic '_id' are inserted before the legacy documents are deleted,
+        so an interrupted migration loses nothing and can simply be run again
+        """
+        migrated: t.Dict[str, int] = {}
+        for azure_type in self.azure_types:
+            collection_name = azure_type.mongodb_collection_name
+            collection = self._collection(azure_type)
+            legacy = {
+                document["_id"]: document_id
+                for document in collection.find({}, {"_id": 1, "name": 1})
+                if document["_id"]
+                != (document_id := azure_type.document_id(document["name"]))
+            }
+            migrated[collection_name] = len(legacy)
+            if not legacy:
+                continue
+            for index_name, index in collection.index_information().items():
+                if index_name != "_id_" and index.get("unique", False):
+                    collection.drop_index(index_name)
+            legacy_ids = list(legacy.keys())
+            for start in range(0, len(legacy_ids), batch_size):
+                batch = legacy_ids[start : start + batch_size]
+                inserts = [
+                    InsertOne({**document, "_id": legacy[document["_id"]]})
+                    for document in collection.find({"_id": {"$in": batch}})
+                ]
+                try:
+                    if inserts:
+                        collection.bulk_write(inserts, ordered=False)
+                except BulkWriteError as e:
+                    # Names stored more than once keep a single copy
+                    if not all(
+                        is_duplicate_id_error(err)
+                        for err in e.details.get("writeErrors", [])
+                    ):
+                        raise
+                collection.bulk_write(
+                    [DeleteOne({"_id": legacy_id}) for legacy_id in batch],
+                    ordered=False,
+                )
+            self.logger.warning(
+                f"Migrated {len(legacy)} documents of collection "
+                f"'{collection_name}' to deterministic IDs"
+            )
+        self.ensure()
+        return migrated
+
+    def ensure(self) -> t.Dict[str, t.List[str]]:
+        """Create all missing declared indexes and return their names, per collection"""
+        missing = self.missing()
+        for azure_type in self.azure_types:
+            collection_name = azure_type.mongodb_collection_name
+            indexes = [
+                index
+                for index in azure_type.mongodb_indexes
+                if self.index_name(index) in missing[collection_name]
+            ]
+            if not indexes:
+                continue
+            self.logger.warning(
+                f"Creating indexes {missing[collection_name]} on collection '{collection_name}'"
+            )
+            self._collection(azure_type).create_indexes(indexes)
+        return missing
+
+    def report(self) -> t.Dict[str, t.Dict[str, t.List[str]]]:
+        """Log and return missing and unused indexes for all collections"""
+        missing = self.missing()
+        unused = self.unused()
+        for collection_name in missing.keys():
+            if missing[collection_name]:
+                self.logger.warning(
+                    f"Collection '{collection_name}' is missing indexes {missing[collection_name]}"
+                )
+            if unused[collection_name]:
+                self.logger.info(
+                    f"Collection '{collection_name}' has unused indexes {unused[collection_name]}"
+                )
+        return {"missing": missing, "unused": unused}
+
+
+class FingerprintCache(MongoDB):
+    """
+    Content fingerprints and per field fingerprints of all stored documents by name,
+    loaded with one projected query per collection
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fingerprints: t.Dict[str, t.Dict[str, str]] = {}
+        self.field_fingerprints: t.Dict[str, t.Dict[str, t.Dict[str, str]]] = {}
+
+    def load(self, collection_name: str) -> t.Dict[str, str]:
+        fingerprints = self.fingerprints.get(collection_name, None)
+        if fingerprints is not None:
+            return fingerprints
+        fingerprint_field = AzureType.fingerprint_field
+        field_fingerprints_field = AzureType.field_fingerprints_field
+        collection = self.client[self.mongodb_database_name][collection_name]
+        cursor = collection.find(
+            {},
+            {"_id": 0, "name": 1, fingerprint_field: 1, field_fingerprints_field: 1},
+        )
+        fingerprints: t.Dict[str, str] = {}
+        field_fingerprints: t.Dict[str, t.Dict[str, str]] = {}
+        for document in cursor:
+            fingerprints[document["name"]] = document.get(fingerprint_field, None)
+            if document.get(field_fingerprints_field, None):
+                field_fingerprints[document["name"]] = document[field_fingerprints_field]
+        self.logger.info(
+            f"Loaded {len(fingerprints)} fingerprints for collection '{collection_name}'"
+        )
+        self.fingerprints[collection_name] = fingerprints
+        self.field_fingerprints[collection_name] = field_fingerprints
+        return fingerprints
+
+    def is_unchanged(self, collection_name: str, name: str, fingerprint: str) -> bool:
+        return self.load(collection_name).get(name, None) == fingerprint
+
+    def get_field_fingerprints(
+        self, collection_name: str, name: str
+    ) -> t.Optional[t.Dict[str, str]]:
+        self.load(collection_name)
+        return self.field_fingerprints[collection_name].get(name, None)
+
+    def update(
+        self,
+        collection_name: str,
+        name: str,
+        fingerprint: str,
+        field_fingerprints: t.Optional[t.Dict[str, str]] = None,
+    ) -> None:
+        self.load(collection_name)[name] = fingerprint
+        if field_fingerprints is not None:
+            self.field_fingerprints[collection_name][name] = field_fingerprints
+
+
+class BulkWriter(MongoDB):
+    """
+    Buffers serialized Azure Types and writes them as unordered bulk upserts, one batch per collection.
+    Buffers are flushed once 'batch_size' documents are pending or 'flush_interval' seconds have passed
+    since the first pending document was added.
+
+    Documents whose fingerprint matches the preloaded 'fingerprints' are skipped without any write.
+    Documents with known per field fingerprints are updated field by field, only setting what changed,
+    all others are replaced as a whole. Both are upserts of the deterministic '_id', filtered on a differing
+    content fingerprint.
+    Documents unchanged in the meantime therefore fail the upsert with a duplicate key error on '_id' instead
+    of being rewritten, which tells the writer per document whether it changed without reading it first.
+    Duplicates on any other unique index are raised. Collections holding documents with random IDs
+    must be migrated first, see 'IndexManager.migrate_document_ids'.
+
+    The indexes of 'index_manager' are only ensured before the first write, so a run without changes
+    costs the single fingerprint read per collection and nothing else.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = constants.MONGODB_BULK_BATCH_SIZE,
+        flush_interval: float = constants.MONGODB_BULK_FLUSH_INTERVAL,
+        fingerprints: t.Optional[FingerprintCache] = None,
+        index_manager: t.Optional[IndexManager] = None,
+    ) -> None:
+        super().__init__()
+        self.fingerprints = fingerprints or FingerprintCache()
+        self.index_manager = index_manager
+        self._indexes_ensured = index_manager is None
+        assert batch_size > 0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffers: t.Dict[str, t.List[t.Dict[str, t.Any]]] = {}
+        self.results: t.Dict[str, t.Dict[str, bool]] = {}
+        self.round_trips = 0
+        self._pending = 0
+        self._first_pending_at: t.Optional[float] = None
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, *args, **kwargs) -> None:
+        self.close()
+
+    @property
+    def changed(self) -> int:
+        return sum(
+            changed for results in self.results.values() for changed in results.values()
+        )
+
+    def add(self, azure_type: AzureType) -> None:
+        """Buffer an Azure Type for writing, flushing all buffers if a threshold is reached"""
+        assert azure_type.name
+        azure_type._id = str(azure_type.document_id(azure_type.name))
+        self.add_document(azure_type.mongodb_collection_name, azure_type.serialize())
+
+    def add_document(
+        self, collection_name: str, document: t.Mapping[str, t.Any]
+    ) -> None:
+        """Buffer a serialized Azure Type for writing to the collection 'collection_name'"""
+        stored_document = AzureType.to_stored_document(document)
+        name = stored_document["name"]
+        if self.fingerprints.is_unchanged(
+            collection_name, name, stored_document[AzureType.fingerprint_field]
+        ):
+            self.results.setdefault(collection_name, {})[name] = False
+            return
+        self.buffers.setdefault(collection_name, []).append(stored_document)
+        self._pending += 1
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+        if self._pending >= self.batch_size or (
+            time.monotonic() - self._first_pending_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> t.Dict[str, t.Dict[str, bool]]:
+        """
+        Write all buffered documents and return, per collection, a mapping of document names
+        to whether the document was inserted or replaced (True) or already up to date (False)
+        """
+        results: t.Dict[str, t.Dict[str, bool]] = {}
+        for collection_name, buffer in self.buffers.items():
+            if not buffer:
+                continue
+            if not self._indexes_ensured:
+                t.cast(IndexManager, self.index_manager).ensure()
+                self._indexes_ensured = True
+            results[collection_name] = self._flush_collection(collection_name, buffer)
+            self.results.setdefault(collection_name, {}).update(
+                results[collection_name]
+            )
+        self.buffers = {}
+        self._pending = 0
+        self._first_pending_at = None
+        return results
+
+    def close(self) -> None:
+        self.flush()
+        self.logger.info(
+            f"Bulk writer done, {self.changed} documents changed in {self.round_trips} round trips"
+        )
+
+    def _flush_collection(
+        self,
+        collection_name: str,
+        buffer: t.List[t.Dict[str, t.Any]],
+    ) -> t.Dict[str, bool]:
+        fingerprint_field = AzureType.fingerprint_field
+        field_fingerprints_field = AzureType.field_fingerprints_field
+        requests: t.List[t.Union[ReplaceOne, UpdateOne]] = []
+        for document in buffer:
+            filter = {
+                "_id": document["_id"],
+                fingerprint_field: {"$ne": document[fingerprint_field]},
+            }
+            field_fingerprints = self.fingerprints.get_field_fingerprints(
+                collection_name, document["name"]
+            )
+            if field_fingerprints:
+                update = AzureType.to_field_update(document, field_fingerprints)
+                requests.append(UpdateOne(filter, update, upsert=True))
+            else:
+                requests.append(ReplaceOne(filter, document, upsert=True))
+        collection = self.client[self.mongodb_database_name][collection_name]
+        self.logger.debug(
+            f"Writing {len(requests)} documents to collection '{collection_name}'"
+        )
+        unchanged: t.Set[int] = set()
+        try:
+            collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            # Only a duplicate '_id' means the stored document had the same fingerprint,
+            # a duplicate on any other unique index is a conflict that must not be hidden
+            if not all(is_duplicate_id_error(err) for err in errors):
+                self.logger.error(
+                    f"Conflicting documents in collection '{collection_name}', "
+                    "documents with legacy IDs are migrated with 'python -m src.database'"
+                )
+                raise
+            unchanged = {err["index"] for err in errors}
+        finally:
+            self.round_trips += 1
+        results: t.Dict[str, bool] = {}
+        for i, document in enumerate(buffer):
+            name = document["name"]
+            results[name] = i not in unchanged
+            self.fingerprints.update(
+                collection_name,
+                name,
+                document[fingerprint_field],
+                document[field_fingerprints_field],
+            )
+        return results
+
+
+class StagingPublisher(MongoDB):
+    """
+    Writes a full run into empty staging collections with bulk inserts and swaps them into place on 'publish'.
+    Readers keep seeing the previous catalogue until the swap, and a run that fails before publishing
+    leaves the live collections untouched.
+
+    All staging collections get their declared indexes before the first of them replaces its live collection
+    through 'renameCollection' with 'dropTarget'. The swap is atomic per collection only:
+    while it is in progress readers may see the new series next to the previous SKUs.
+    Series are swapped first, so published SKUs always find their series.
+    A marker document records a swap in progress, an interrupted swap is finished by the next 'open'
+    instead of being discarded with the leftover staging collections.
+    """
+
+    staging_suffix: t.ClassVar[str] = "__staging"
+    publish_marker_collection_name: t.ClassVar[str] = "staging_publish"
+
+    def __init__(
+        self,
+        azure_types: t.Sequence[t.Type[AzureType]],
+        batch_size: int = constants.MONGODB_BULK_BATCH_SIZE,
+        fingerprints: t.Optional[FingerprintCache] = None,
+    ) -> None:
+        super().__init__()
+        assert batch_size > 0
+        self.azure_types = azure_types
+        self.batch_size = batch_size
+        self.fingerprints = fingerprints or FingerprintCache()
+        self.buffers: t.Dict[str, t.List[t.Dict[str, t.Any]]] = {}
+        self.results: t.Dict[str, t.Dict[str, bool]] = {}
+        self.round_trips = 0
+
+    @property
+    def database(self):
+        return self.client[self.mongodb_database_name]
+
+    @classmethod
+    def staging_name(cls, collection_name: str) -> str:
+        return f"{collection_name}{cls.staging_suffix}"
+
+    @property
+    def publish_marker(self):
+        return self.database[self.publish_marker_collection_name]
+
+    def open(self) -> None:
+        """Replace leftovers of previous runs with new empty staging collections"""
+        if self.publish_marker.find_one({"_id": "publish"}) is not None:
+            self.logger.warning("Finishing the interrupted publish of a previous run")
+            self._swap()
+        for azure_type in self.azure_types:
+            staging_name = self.staging_name(azure_type.mongodb_collection_name)
+            self.database.drop_collection(staging_name)
+            self.database.create_collection(staging_name)
+
+    def add(self, azure_type: AzureType) -> None:
+        assert azure_type.name
+        azure_type._id = str(azure_type.document_id(azure_type.name))
+        self.add_document(azure_type.mongodb_collection_name, azure_type.serialize())
+
+    def add_document(
+        self, collection_name: str, document: t.Mapping[str, t.Any]
+    ) -> None:
+        """Buffer a serialized Azure Type for inserting into the staging collection of 'collection_name'"""
+        stored_document = AzureType.to_stored_document(document)
+        name = stored_document["name"]
+        # Changes are reported relative to the live collection that is about to be replaced
+        self.results.setdefault(collection_name, {})[
+            name
+        ] = not self.fingerprints.is_unchanged(
+            collection_name, name, stored_document[AzureType.fingerprint_field]
+        )
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(stored_document)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for collection_name, buffer in self.buffers.items():
+            if not buffer:
+                continue
+            self.logger.debug(
+                f"Inserting {len(buffer)} documents into staging collection of '{collection_name}'"
+            )
+            staging = self.database[self.staging_name(collection_name)]
+            try:
+                staging.insert_many(buffer, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if not all(is_duplicate_id_error(err) for err in errors):
+                    raise
+                # Azure Types written more than once in a run keep their last version, like upserts do
+                for err in errors:
+                    document = buffer[err["index"]]
+                    staging.replace_one({"_id": document["_id"]}, document)
+            finally:
+                self.round_trips += 1
+        self.buffers = {}
+
+    def publish(self) -> None:
+        """Index all staging collections and swap them into place of their live collections"""
+        self.flush()
+        for azure_type in self.azure_types:
+            staging = self.database[
+                self.staging_name(azure_type.mongodb_collection_name)
+            ]
+            if azure_type.mongodb_indexes:
+                staging.create_indexes(list(azure_type.mongodb_indexes))
+        self.publish_marker.replace_one({"_id": "publish"}, {}, upsert=True)
+        self._swap()
+
+    def _swap(self) -> None:
+        """
+        Rename every remaining staging collection to its live collection, series before SKUs,
+        skipping those already swapped, and remove the marker once all are in place
+        """
+        existing = set(self.database.list_collection_names())
+        azure_types = sorted(
+            self.azure_types, key=lambda azure_type: azure_type is not AzureSkuSeriesType
+        )
+        for azure_type in azure_types:
+            collection_name = azure_type.mongodb_collection_name
+            staging_name = self.staging_name(collection_name)
+            if staging_name not in existing:
+                continue
+            staging = self.database[staging_name]
+            self.logger.warning(
+                f"Publishing {staging.estimated_document_count()} documents to collection '{collection_name}'"
+            )
+            staging.rename(collection_name, dropTarget=True)
+        self.publish_marker.delete_one({"_id": "publish"})
+
+    def abort(self) -> None:
+        """Discard everything written to the staging collections, the live collections stay untouched"""
+        self.buffers = {}
+        for azure_type in self.azure_types:
+            self.database.drop_collection(
+                self.staging_name(azure_type.mongodb_collection_name)
+            )
+
+
+if __name__ == "__main__":
+    from src.storage.base import AZURE_TYPES
+
+    IndexManager(list(AZURE_TYPES.values())).migrate_document_ids()
@@ -16,30 +16,46 @@ class DocumentDescriptor:
         r"^([a-z\d]+)-(?!v\d)([a-z\d]+)(?:-[a-z]*?)?-series(?:\.md)?$"
     )
     family_regex = re.compile(r"^([a-z]+)-family\.[a-z]{1,3}$")
+    # Union of the three patterns above, so every name is classified with a single match
+    document_regex = re.compile(
+        r"^(?:"
+        r"(?P<series>[a-z\d]+)-?(?P<series_version>v\d)?-series(?:\.md)?"
+        r"|(?P<family>[a-z]+)-family\.[a-z]{1,3}"
+        r"|(?P<multi_first>[a-z\d]+)-(?!v\d)(?P<multi_second>[a-z\d]+)(?:-[a-z]*?)?-series(?:\.md)?"
+        r")$"
+    )
+    __slots__ = (
+        "path",
+        "is_series",
+        "series_name",
+        "is_family",
+        "family_name",
+        "is_multi_series",
+        "series_names",
+    )
 
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, match: t.Optional[re.Match] = None) -> None:
         self.path = path
-        name = self.path.name
-        self.is_series = bool(self.series_regex.match(name))
-        series_name_match = t.cast(re.Match, self.series_regex.search(name))
-        self.series_name = series_name_match.group(1) if self.is_series else None
-        if self.is_series and (name_suffix := series_name_match.group(2)):
-            self.series_name = self.series_name + name_suffix
-        self.is_family = bool(self.family_regex.match(name))
-        self.family_name = None
-        if self.is_family:
-            assert not self.is_series
-            family_name = self.family_regex.search(name)
-            family_name = t.cast(re.Match, family_name)
-            self.family_name = family_name.group(1)
-        self.is_multi_series = bool(self.multi_series_regex.match(name))
-        self.series_names = None
-        if self.is_multi_series:
-            assert not self.is_series
-            assert not self.is_family
-            series_names = self.multi_series_regex.search(name)
-            series_names = t.cast(re.Match, series_names)
-            self.series_names = [series_names.group(1), series_names.group(2)]
+        if match is None:
+            match = self.document_regex.match(self.path.name)
+        self.is_series = False
+        self.series_name: t.Optional[str] = None
+        self.is_family = False
+        self.family_name: t.Optional[str] = None
+        self.is_multi_series = False
+        self.series_names: t.Optional[t.List[str]] = None
+        if match is None:
+            return
+        groups = match.groupdict()
+        if groups["series"]:
+            self.is_series = True
+            self.series_name = groups["series"] + (groups["series_version"] or "")
+        elif groups["family"]:
+            self.is_family = True
+            self.family_name = groups["family"]
+        else:
+            self.is_multi_series = True
+            self.series_names = [groups["multi_first"], groups["multi_second"]]
 
     def __repr__(self) -> str:
         return self.path.name
@@ -87,6 +103,48 @@ class DocumentDescriptor:
         return [self.to_document_file([id_]) for id_ in identifier]
 
 
+class DocumentClassifier:
+    """
+    Classifies all candidate documents below a root directory in a single pass.
+    Entries are prefiltered by directory and suffix, so only markdown files are matched against
+    'DocumentDescriptor.document_regex' and only recognized documents get a descriptor
+    """
+
+    SUFFIX: t.ClassVar[str] = ".md"
+    EXCLUDED_DIRECTORIES: t.ClassVar[t.Set[str]] = {"media"}
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def iter_directories(self) -> t.Generator[Path, None, None]:
+        """Yield the root and all of its subdirectories in a deterministic order"""
+        for dirpath, dirnames, _ in os.walk(self.root):
+            dirnames[:] = sorted(
+                d for d in dirnames if d not in self.EXCLUDED_DIRECTORIES
+            )
+            yield Path(dirpath)
+
+    @classmethod
+    def iter_directory(
+        cls, directory: Path
+    ) -> t.Generator[DocumentDescriptor, None, None]:
+        """Yield a descriptor for every recognized document directly inside of 'directory', sorted by name"""
+        with os.scandir(directory) as entries:
+            names = sorted(
+                entry.name
+                for entry in entries
+                if entry.name.endswith(cls.SUFFIX) and entry.is_file()
+            )
+        regex = DocumentDescriptor.document_regex
+        for name in names:
+            if match := regex.match(name):
+                yield DocumentDescriptor(directory / name, match)
+
+    def iter_documents(self) -> t.Generator[DocumentDescriptor, None, None]:
+        for directory in self.iter_directories():
+            yield from self.iter_directory(directory)
+
+
 class DocumentFile(FileHashingMixin):
     def __init__(
         self,
@@ -122,36 +180,82 @@ class DocumentFile(FileHashingMixin):
 
     @t.overload
     def get_associated_family(
-        self, family_paths: t.Sequence["DocumentFile"]
+        self,
+        family_paths: t.Union[t.Sequence["DocumentFile"], "FamilyResolver"],
     ) -> "DocumentFile": ...
 
     @t.overload
     def get_associated_family(self, family_paths: t.Sequence[Path]) -> Path: ...
 
     def get_associated_family(
-        self, family_paths: t.Sequence[t.Union["DocumentFile", Path]]
+        self,
+        family_paths: t.Union[
+            t.Sequence[t.Union["DocumentFile", Path]], "FamilyResolver"
+        ],
     ) -> t.Union["DocumentFile", Path]:
         """Get the document of the family associated with this SKU series document"""
-        cls = self.__class__
-        assert len(family_paths)
-        if not (input_was_native := isinstance(family_paths[0], cls)):
-            family_paths = t.cast(t.Sequence[Path], family_paths)
-            family_paths = [
-                DocumentDescriptor(f).to_document_file() for f in family_paths
-            ]
-        family_paths = t.cast(t.Sequence[DocumentFile], family_paths)
-        if not self.is_series:
-            return self if input_was_native else self.path
-        assert all([f.is_family for f in family_paths])
-        sorted_family_paths = sorted(
-            family_paths, key=lambda entry: len(entry.path.name), reverse=True
-        )
-        for family in sorted_family_paths:
-            family_name = t.cast(str, family.family_name)
-            series_name = t.cast(str, self.series_name)
-            if series_name.startswith(family_name):
-                if input_was_native:
-                    return family
-                else:
-                    return family.path
-        raise Exception("No matching family present")
+        if isinstance(family_paths, FamilyResolver):
+            resolver = family_paths
+        else:
+            assert len(family_paths)
+            resolver = FamilyResolver(family_paths)
+        return resolver.resolve(self)
+
+
+class FamilyResolver:
+    """
+    Resolves SKU series documents to their family documents by longest family-name prefix,
+    using a prefix trie over all family names that is built once per run
+    """
+
+    _END: t.ClassVar[str] = ""
+
+    def __init__(
+        self, families: t.Iterable[t.Union[DocumentFile, Path]] = ()
+    ) -> None:
+        self.trie: t.Dict[str, t.Any] = {}
+        self.families: t.List[t.Union[DocumentFile, Path]] = []
+        for family in families:
+            self.add(family)
+
+    def __len__(self) -> int:
+        return len(self.families)
+
+    def add(self, family: t.Union[DocumentFile, Path]) -> None:
+        """Add a family document (or the path to one) to the resolver"""
+        if isinstance(family, DocumentFile):
+            assert family.is_family
+            family_name = family.family_name
+        else:
+            family_name = DocumentDescriptor(family).family_name
+        assert family_name, f"'{family}' is not a family document"
+        node = self.trie
+        for char in family_name:
+            node = node.setdefault(char, {})
+        # The first family registered for a name wins, same as the previous stable sort
+        node.setdefault(self._END, family)
+        self.families.append(family)
+
+    def lookup(self, series_name: str) -> t.Optional[t.Union[DocumentFile, Path]]:
+        """Return the family with the longest name that is a prefix of 'series_name'"""
+        match = None
+        node = self.trie
+        for char in series_name:
+            node = node.get(char, None)
+            if node is None:
+                break
+            match = node.get(self._END, match)
+        return match
+
+    def resolve(self, document: DocumentFile) -> t.Union[DocumentFile, Path]:
+        """
+        Get the family associated with a SKU series document.
+        Families are returned as they were registered, either as documents or as paths
+        """
+        native = not self.families or isinstance(self.families[0], DocumentFile)
+        if not document.is_series:
+            return document if native else document.path
+        family = self.lookup(t.cast(str, document.series_name))
+        if family is None:
+            raise Exception("No matching family present")
+        return family
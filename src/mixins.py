@@ -2,6 +2,7 @@ import hashlib
 import json
 import logging
 import re
+import threading
 import typing as t
 from pathlib import Path
 from urllib.parse import quote_plus
@@ -10,8 +11,11 @@ import panflute
 import pymongo
 from pymongo.collection import Collection
 
+from src import constants
+
 
 class FileHashingMixin:
+    __slots__ = ()
     BUF_SIZE: t.ClassVar[int] = 65536
     _document_hash: "hashlib._Hash"
 
@@ -29,13 +33,18 @@ class FileHashingMixin:
         self, data: t.Union[str, bytes, t.MutableMapping]
     ) -> "hashlib._Hash":
         if isinstance(data, dict):
-            data = json.dumps(data)
+            data = self.canonical_json(data)
         if isinstance(data, str):
             data = data.encode()
         data = t.cast(bytes, data)
         sha256 = hashlib.sha256(data)
         return sha256
 
+    @staticmethod
+    def canonical_json(data: t.Mapping) -> str:
+        """Dump 'data' to JSON independently of key order and whitespace, for stable content hashes"""
+        return json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+
     def file_is_different(self, new_file_path: Path) -> bool:
         return (
             self.document_hash == self.generate_document_hash(new_file_path).hexdigest()
@@ -79,7 +88,47 @@ class ParserUtilityMixin:
         return [item for sublist in lst for item in sublist]
 
 
+class MongoClientRegistry:
+    """
+    Process-wide registry of pooled MongoDB clients.
+    Every URI gets exactly one client (and thus one connection pool) which is reused until 'close' is called
+    """
+
+    logger: t.ClassVar[logging.Logger] = logging.getLogger(__name__)
+    __clients: t.ClassVar[t.Dict[str, pymongo.MongoClient]] = {}
+    __lock: t.ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def get_client(
+        cls, uri: str, max_pool_size: int = constants.MONGODB_MAX_POOL_SIZE
+    ) -> pymongo.MongoClient:
+        client = cls.__clients.get(uri, None)
+        if client is not None:
+            return client
+        with cls.__lock:
+            client = cls.__clients.get(uri, None)
+            if client is None:
+                cls.logger.warning(
+                    f"Creating MongoDB client with a pool size of {max_pool_size}"
+                )
+                client = pymongo.MongoClient(uri, maxPoolSize=max_pool_size)
+                cls.__clients[uri] = client
+        return client
+
+    @classmethod
+    def close(cls, uri: t.Optional[str] = None) -> None:
+        """Close the client for 'uri', or all clients if no URI is given"""
+        with cls.__lock:
+            uris = [uri] if uri else list(cls.__clients.keys())
+            for _uri in uris:
+                client = cls.__clients.pop(_uri, None)
+                if client is not None:
+                    cls.logger.info("Closing MongoDB client")
+                    client.close()
+
+
 class MongoDBMixin:
+    __slots__ = ()
     logger: t.ClassVar[logging.Logger]
     mongodb_collection_name: t.ClassVar[str]
 
@@ -87,6 +136,7 @@ class MongoDBMixin:
     mongodb_hostname: t.ClassVar[str]
     mongodb_username: t.ClassVar[str]
     mongodb_password: t.ClassVar[str]
+    mongodb_max_pool_size: t.ClassVar[int] = constants.MONGODB_MAX_POOL_SIZE
 
     @property
     def database_uri(self) -> str:
@@ -99,11 +149,9 @@ class MongoDBMixin:
 
     @property
     def client(self) -> pymongo.MongoClient:
-        self.logger.warning(
-            f"Connecting to MongoDB Database '{self.mongodb_database_name}'"
+        return MongoClientRegistry.get_client(
+            self.database_uri, self.mongodb_max_pool_size
         )
-        self.logger.debug(f"MongoDB URI is '{self.database_uri}'")
-        return pymongo.MongoClient(self.database_uri)
 
     def drop(self) -> None:
         self.logger.warning(f"Dropping MongoDB Database '{self.mongodb_database_name}'")
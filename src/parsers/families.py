@@ -1,16 +1,111 @@
 import hashlib
 import typing as t
+from collections import OrderedDict
 from functools import lru_cache
 from pathlib import Path
 import re
 
 import panflute
 
+from src import constants
 from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
 
 from .shared import BaseParser
 
 
+class IncludeLinkIndex(ParserUtilityMixin):
+    """
+    Index over the include-links of a document,
+    mapping a (normalized series name, include kind) pair to the path of the included file.
+    Indexes are shared through a bounded LRU cache holding one version per document
+    """
+
+    KINDS: t.ClassVar[t.Tuple[str, ...]] = ("specs", "summary")
+    cache_size: t.ClassVar[int] = constants.INCLUDE_LINK_INDEX_CACHE_SIZE
+    __interned: t.ClassVar["OrderedDict[Path, t.Tuple[str, IncludeLinkIndex]]"] = (
+        OrderedDict()
+    )
+
+    def __init__(self, base_path: Path, links: t.Sequence[panflute.Link]) -> None:
+        self.base_path = base_path
+        self.entries: t.Dict[t.Tuple[str, str], Path] = {}
+        self.children: t.Optional[t.List[DocumentFile]] = None
+        # All include-links per kind as (link text length, url, path), in document order
+        self._candidates: t.Dict[str, t.List[t.Tuple[int, str, Path]]] = {
+            kind: [] for kind in self.KINDS
+        }
+        self._exists: t.Dict[Path, bool] = {}
+        ranks: t.Dict[t.Tuple[str, str], int] = {}
+        for link in links:
+            url = link.url
+            if "includes" not in url or "series" not in url:
+                continue
+            kinds = [kind for kind in self.KINDS if kind in url]
+            if not kinds:
+                continue
+            path = self.base_path / url
+            # If more than one link matches a series, the one with the shortest link text is the most precise
+            rank = len(self.stringify(link))
+            names = self.names_from_url(url)
+            for kind in kinds:
+                self._candidates[kind].append((rank, url, path))
+                for name in names:
+                    key = (name, kind)
+                    if key not in ranks or rank < ranks[key]:
+                        ranks[key] = rank
+                        self.entries[key] = path
+
+    @classmethod
+    def for_document(
+        cls, path: Path, document_hash: str, base_path: Path, links: t.Sequence[panflute.Link]
+    ) -> "IncludeLinkIndex":
+        """Return the index for a document, building it only once per document version"""
+        entry = cls.__interned.get(path, None)
+        if entry is not None and entry[0] == document_hash:
+            cls.__interned.move_to_end(path)
+            return entry[1]
+        index = cls(base_path, links)
+        # A changed document replaces the index of its previous version
+        cls.__interned[path] = (document_hash, index)
+        cls.__interned.move_to_end(path)
+        while len(cls.__interned) > cls.cache_size:
+            cls.__interned.popitem(last=False)
+        return index
+
+    @staticmethod
+    def normalize(series_name: str) -> str:
+        return series_name.lower().replace("_", "")
+
+    @classmethod
+    def names_from_url(cls, url: str) -> t.Set[str]:
+        """Return all series names an include filename (e.g. 'dasv5-dadsv5-series-specs.md') refers to"""
+        stem = Path(url).stem.lower()
+        series_part = stem.split("-series")[0]
+        tokens = [token for token in series_part.split("-") if token]
+        return {cls.normalize(token) for token in tokens + ["".join(tokens)]}
+
+    def get(self, series_name: str, kind: str) -> Path:
+        """Return the path of the include file of kind 'kind' for the series 'series_name'"""
+        name = self.normalize(series_name)
+        key = (name, kind)
+        path = self.entries.get(key, None)
+        if path is None:
+            # Fall back to a substring match for names that are not part of any include filename verbatim
+            matching_links = [c for c in self._candidates[kind] if name in c[1]]
+            assert matching_links, f"No '{kind}' include found for series '{series_name}'"
+            path = min(matching_links, key=lambda c: c[0])[2]
+            self.entries[key] = path
+        return path
+
+    def exists(self, path: Path) -> bool:
+        exists = self._exists.get(path, None)
+        if exists is None:
+            exists = path.resolve().exists()
+            self._exists[path] = exists
+        return exists
+
+
 class FamilyMarkdownDocumentParser(BaseParser):
     def __init__(
         self, document_file: DocumentFile, family_document_file: DocumentFile
@@ -27,6 +122,12 @@ class FamilyMarkdownDocumentParser(BaseParser):
     def do_document_hashing(self) -> "hashlib._Hash":
         return self.generate_document_hash(self.path)
 
+    @property
+    def include_index(self) -> IncludeLinkIndex:
+        return IncludeLinkIndex.for_document(
+            self._path, self.document_hash, self._path.parent, self.document.links
+        )
+
     def get_sections(self) -> t.Generator[panflute.Header, None, None]:
         start_header = [
             h for h in self.document.headers if h.identifier == "series-in-family"
@@ -44,19 +145,23 @@ class FamilyMarkdownDocumentParser(BaseParser):
 
     @lru_cache(maxsize=1)
     def get_children(self) -> t.List[DocumentFile]:
+        index = self.include_index
+        if index.children is not None:
+            return index.children
         children = []
         for section in self.sections:
             link = section.next.next.content.list[0]  # type: ignore
             assert isinstance(link, panflute.Link)
             path = self._path.parent / link.url
-            if not path.resolve().exists():
+            if not index.exists(path):
                 path = Path(*[p for p in path.parts if p != ".."])
-            if not path.resolve().exists():
+            if not index.exists(path):
                 _file_identifier = re.search(r"^(?P<main>[a-zA-Z-\d]+)\s?(?P<version>v\d)-series$", self.stringify(section))
                 file_identifier = f"{_file_identifier.group('main')}{_file_identifier.group('version') or ''}"
                 file_identifier = re.sub(r"\s|-|_", "", file_identifier).lower()
                 path = path.parent / f"{file_identifier}-series.md"
-            assert path.resolve().exists()
+            assert index.exists(path)
             children.append(DocumentDescriptor(path).to_document_files())
         _children = self.flatten_list_of_lists(children)
+        index.children = _children
         return _children
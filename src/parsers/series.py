@@ -12,7 +12,7 @@ from src.azure_types.capabilities import (
     CapabilitiesElement
 )
 from src.documents import DocumentDescriptor, DocumentFile
-from src.parsers.families import FamilyMarkdownDocumentParser
+from src.parsers.families import FamilyMarkdownDocumentParser, IncludeLinkIndex
 
 from .shared import BaseParser
 
@@ -108,9 +108,8 @@ class SeriesMarkdownDocumentParser(BaseParser):
         )
         if not self.is_previous_generation:
             self.logger.debug("host_specs_table -> is_previous_generation is True")
-            all_links = self.family_document_parser.document.links
             parser = self._get_linked_doc_parser_from_family_page(
-                all_links, link_identifier="specs"
+                self.family_document_parser.include_index, link_identifier="specs"
             )
             with parser:
                 host_specs_table = parser.document.tables[0]
@@ -120,9 +119,8 @@ class SeriesMarkdownDocumentParser(BaseParser):
             and self.document_file.is_series
         ):
             self.logger.debug("host_specs_table -> is_series is True")
-            all_links = self.document.links
             parser = self._get_linked_doc_parser_from_family_page(
-                all_links, link_identifier="specs"
+                self.include_index, link_identifier="specs"
             )
             with parser:
                 host_specs_table = parser.document.tables[0]
@@ -157,12 +155,11 @@ class SeriesMarkdownDocumentParser(BaseParser):
                 next_elem = next_elem.next
         return "\n".join([self.stringify(para) for para in paragraphs])
 
-    @property
+    @cached_property
     def host_summary(self) -> str:
         if not self.is_previous_generation:
-            all_links = self.family_document_parser.document.links
             parser = self._get_linked_doc_parser_from_family_page(
-                all_links, link_identifier="summary"
+                self.family_document_parser.include_index, link_identifier="summary"
             )
             with parser:
                 return self._get_host_summary(parser)
@@ -181,7 +178,7 @@ class SeriesMarkdownDocumentParser(BaseParser):
         cap = AzureSkuCapabilities(capabilities.to_dto())
         return cap.to_dto()
 
-    @property
+    @cached_property
     def capabilities(self):
         capabilities_header = self.retrieve_elem(
             self.get_header_by_identifier("feature-support")
@@ -207,26 +204,18 @@ class SeriesMarkdownDocumentParser(BaseParser):
                 cap = AzureSkuCapabilities(capabilities_dto)
                 return cap.to_dto()
 
+    @cached_property
+    def include_index(self) -> IncludeLinkIndex:
+        """Index over the include-links of this series document itself"""
+        return IncludeLinkIndex(
+            self.family_document_file.path.parent, self.document.links
+        )
+
     def _get_linked_doc_parser_from_family_page(
-        self, all_links: t.List[panflute.Link], link_identifier: str
+        self, include_index: IncludeLinkIndex, link_identifier: str
     ):
-        matching_links = [
-            link
-            for link in all_links
-            if link_identifier in (url := link.url)
-            and "includes" in url
-            and "series" in url
-            and self.name.lower().replace("_", "") in url
-        ]
-        assert matching_links
-        # If more than one matching link is found, this indicates that the name of the series is short
-        # so we sort by the shortest link-value to ensure the most precise match
-        matching_links = list(
-            sorted(matching_links, key=lambda link: len(self.stringify(link)))
-        )
-        link = matching_links[0]
         host_summary_document = DocumentDescriptor(
-            self.family_document_file.path.parent / link.url
+            include_index.get(self.name, link_identifier)
         )
         cls = self.base_parser_factory(SafeDocumentHash)
         parser = cls(
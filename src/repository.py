@@ -11,7 +11,7 @@ from pathlib import Path
 
 from git import Git, Repo
 
-from .documents import DocumentDescriptor, DocumentFile
+from .documents import DocumentClassifier, DocumentFile, FamilyResolver
 from .mixins import ParserUtilityMixin
 
 logger = logging.getLogger(__name__)
@@ -78,28 +78,50 @@ class DocsSourceRepository(ParserUtilityMixin):
         self.setup_repository(Path(repo_path))
         return self.repo_workdir_abs_path
 
+    def get_document_classifier(self) -> DocumentClassifier:
+        """
+        Return the classifier both discovery paths use, so they see the same documents.
+        Only the working directory is searched, media directories are skipped
+        """
+        return DocumentClassifier(self.repo_workdir_abs_path)
+
     def get_documents(
         self,
     ) -> t.List["DocumentFile"]:
         """Discover all SKU series documents while splitting all multi-series documents into distinct series"""
         series_names = [
             fd.to_document_files()
-            for f in glob.iglob(
-                f"{self.repo_workdir_abs_path.parent}/**/*", recursive=True
-            )
-            if (fd := DocumentDescriptor(Path(f))).is_series or fd.is_multi_series
+            for fd in self.get_document_classifier().iter_documents()
+            if fd.is_series or fd.is_multi_series
         ]
         series_documents_list = self.flatten_list_of_lists(series_names)
-        series_documents_list = list(set(series_documents_list))
         series_documents_list = list(
             sorted(
                 series_documents_list,
-                key=lambda doc: f"{doc.path.parts[-2]}/{doc.path.parts[-1]}",
+                key=lambda doc: (doc.path.parts[-2], doc.path.parts[-1]),
             )
         )
         series_documents_list = t.cast(t.List["DocumentFile"], series_documents_list)
         return series_documents_list
 
+    def iter_documents(
+        self, family_resolver: t.Optional[FamilyResolver] = None
+    ) -> t.Generator[t.Tuple["DocumentFile", "DocumentFile"], None, None]:
+        """
+        Stream pairs of (SKU series document, family document) while the repository is being discovered.
+        Directories are processed one after another and their documents are yielded in name order,
+        so consumers can start working as soon as the first directory has been classified.
+        Every series is resolved with one resolver over all families, by default 'get_family_resolver'
+        """
+        if family_resolver is None:
+            family_resolver = self.get_family_resolver()
+        for descriptor in self.get_document_classifier().iter_documents():
+            if not (descriptor.is_series or descriptor.is_multi_series):
+                continue
+            for document in descriptor.to_document_files():
+                family = family_resolver.resolve(document)
+                yield document, t.cast(DocumentFile, family)
+
     def get_all_files(self) -> t.List[Path]:
         files = [
             p
@@ -127,14 +149,14 @@ class DocsSourceRepository(ParserUtilityMixin):
             results_list.extend(families)
         return results, results_list
 
+    def get_family_resolver(self) -> FamilyResolver:
+        """Return a resolver from SKU series documents to their family documents, across all directories"""
+        _, families = self.get_families()
+        return FamilyResolver(families)
+
     def get_families_for_directory(self, directory: Path) -> t.List["DocumentFile"]:
         """Return all family documents inside of a specific folder"""
-        _files = [
-            entry
-            for entry in directory.iterdir()
-            if entry.is_file() and entry.suffix == ".md"
-        ]
-        files = [DocumentDescriptor(entry) for entry in _files]
+        files = DocumentClassifier.iter_directory(directory)
         families = [
             entry.to_document_file()
             for entry in files
@@ -158,12 +180,7 @@ class DocsSourceRepository(ParserUtilityMixin):
     def _list_sku_series_documents_for_directory(
         self, directory: Path
     ) -> t.Dict["DocumentFile", t.List["DocumentFile"]]:
-        _files = [
-            entry
-            for entry in directory.iterdir()
-            if entry.is_file() and entry.name.endswith(".md")
-        ]
-        files = [DocumentDescriptor(entry) for entry in _files]
+        files = list(DocumentClassifier.iter_directory(directory))
         results: t.Dict[DocumentFile, t.List[DocumentFile]] = {}
         families = [
             entry.to_document_file()
@@ -172,6 +189,7 @@ class DocsSourceRepository(ParserUtilityMixin):
         ]
         for family in families:
             results.setdefault(family, [])
+        resolver = FamilyResolver(families)
         series = self.flatten_list_of_lists(
             [
                 entry_docs
@@ -181,10 +199,29 @@ class DocsSourceRepository(ParserUtilityMixin):
             ]
         )
         for s in series:
-            family = s.get_associated_family(families)
-            results[family].append(s)
+            family = resolver.resolve(s)
+            results[t.cast(DocumentFile, family)].append(s)
         return results
 
+    def remote_head_commit(self) -> t.Optional[str]:
+        """The sha of the latest commit on the remote branch, without cloning, None if unreachable"""
+        try:
+            output = self.git.ls_remote(
+                self.repo_url, f"refs/heads/{self.repo_branch}"
+            )
+        except Exception as e:
+            logger.warning(
+                f"Could not query the remote head of '{self.repo_url}': {e!r}"
+            )
+            return None
+        return output.split()[0] if output else None
+
+    @property
+    def head_commit(self) -> str:
+        """The sha of the commit checked out in the working directory"""
+        assert self.repo
+        return self.repo.head.commit.hexsha
+
     # @functools.lru_cache(maxsize=150)
     def last_commit_for_document(
         self, document_file: DocumentFile
@@ -229,3 +266,26 @@ class DocsSourceRepository(ParserUtilityMixin):
                 path = Path(self.repo.working_dir) / filepath
                 commit_index[path] = commit_time
         self.commit_index = commit_index
+
+    def update_last_commit_index(
+        self,
+        previous_commit: str,
+        previous_index: t.Mapping[Path, datetime.datetime],
+    ) -> None:
+        """
+        Derive the commit index from the one generated at 'previous_commit',
+        only the commits made since then are walked instead of the whole history
+        """
+        assert self.repo
+        commit_index = t.OrderedDict(previous_index)
+        updated: t.Set[Path] = set()
+        revisions = f"{previous_commit}..{self.repo_branch}"
+        for commit in self.repo.iter_commits(revisions):
+            commit_time = datetime.datetime.fromtimestamp(commit.committed_date)
+            for filepath in commit.stats.files.keys():
+                path = Path(self.repo.working_dir) / filepath
+                if path not in updated:
+                    commit_index[path] = commit_time
+                    updated.add(path)
+        logger.debug(f"Updated the commit times of {len(updated)} files")
+        self.commit_index = commit_index
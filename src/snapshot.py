@@ -0,0 +1,280 @@
+import bz2
+import datetime
+import gzip
+import hashlib
+import logging
+import lzma
+import os
+import typing as t
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+import msgpack
+
+from . import constants
+from .documents import DocumentFile
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 3
+# Compression of the snapshot state, by name: (compress, decompress)
+COMPRESSIONS: t.Dict[
+    str, t.Tuple[t.Callable[[bytes], bytes], t.Callable[[bytes], bytes]]
+] = {
+    "none": (lambda data: data, lambda data: data),
+    "gzip": (lambda data: gzip.compress(data, compresslevel=6), gzip.decompress),
+    "bz2": (bz2.compress, bz2.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+
+# Files outside of 'src' that decide what a run writes: the entry point wiring the storage backends
+# and the pinned dependency versions
+CODE_VERSION_FILES: t.Tuple[str, ...] = ("main.py", "pyproject.toml", "poetry.lock")
+# Modules that decide which documents are discovered and the family every series resolves to
+DISCOVERY_VERSION_FILES: t.Tuple[str, ...] = (
+    "src/documents.py",
+    "src/mixins.py",
+    "src/repository.py",
+)
+
+
+def _fingerprint(paths: t.Iterable[Path]) -> str:
+    digest = hashlib.sha256()
+    project_path = Path(__file__).parent.parent
+    for path in paths:
+        if not path.is_file():
+            continue
+        digest.update(str(path.relative_to(project_path)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """
+    Fingerprint of the scraper's code, any change to parsing, serialization, the wiring of the
+    storage backends or the dependency versions changes it
+    """
+    project_path = Path(__file__).parent.parent
+    return _fingerprint(
+        sorted(Path(__file__).parent.rglob("*.py"))
+        + [project_path / name for name in CODE_VERSION_FILES]
+    )
+
+
+@lru_cache(maxsize=1)
+def discovery_version() -> str:
+    """Fingerprint of the discovery code, see 'DISCOVERY_VERSION_FILES'"""
+    project_path = Path(__file__).parent.parent
+    return _fingerprint(project_path / name for name in DISCOVERY_VERSION_FILES)
+
+
+class WarmStartSnapshot:
+    """
+    The state of a complete run, so a restart against the same source commit and code can skip
+    cloning, discovery, the commit index and parsing, and publish the stored documents directly.
+    Holds
+        'head'              the sha of the source commit the run scraped
+        'code_version'      see 'code_version'
+        'discovery_version' see 'discovery_version'
+        'documents'         the discovered (series document, family document) pairs, in discovery order
+        'families'          the family documents found by 'get_families'
+        'commit_index'      the last commit time of every document, see 'generate_last_commit_index',
+                            a run over a newer commit only walks the commits since 'head'
+        'azure_types'       every serialized Azure Type as '(collection, document)', in write order
+    When only the code changed, the source tree is the one that was discovered and a run parses
+    the stored documents again without rediscovering them, see 'discovery_matches'.
+    Paths are stored relative to the repository working directory.
+    The file is msgpack, the header is readable without decompressing the 'compression'-compressed state
+    """
+
+    def __init__(self, head: str, version: t.Optional[str] = None) -> None:
+        self.head = head
+        self.code_version = version or code_version()
+        self.discovery_version = discovery_version()
+        self.documents: t.List[t.Tuple[t.List[t.Any], t.List[t.Any]]] = []
+        self.families: t.List[t.List[t.Any]] = []
+        self.commit_index: t.Dict[str, float] = {}
+        self.azure_types: t.List[t.Tuple[str, t.Dict[str, t.Any]]] = []
+
+    def matches(self, head: t.Optional[str]) -> bool:
+        """Whether this snapshot is the result of a run over 'head' with the current code"""
+        return head == self.head and self.code_version == code_version()
+
+    def discovery_matches(self, head: t.Optional[str]) -> bool:
+        """Whether the stored discovery is the one of 'head' with the current discovery code"""
+        return (
+            head == self.head
+            and bool(self.families)
+            and self.discovery_version == discovery_version()
+        )
+
+    @staticmethod
+    def _document_file(document: DocumentFile, root: Path) -> t.List[t.Any]:
+        return [
+            str(document.path.relative_to(root)),
+            document.is_series,
+            document.is_family,
+            document.is_multi_series_document,
+            document.identifier,
+        ]
+
+    @staticmethod
+    def _restore_document_file(entry: t.Sequence[t.Any], root: Path) -> DocumentFile:
+        path, is_series, is_family, is_multi_series_document, identifier = entry
+        return DocumentFile(
+            root / path, is_series, is_family, is_multi_series_document, identifier
+        )
+
+    def set_discovery(
+        self,
+        root: t.Union[str, Path],
+        documents: t.Iterable[t.Tuple[DocumentFile, DocumentFile]],
+        families: t.Iterable[DocumentFile],
+    ) -> None:
+        """Store the discovered documents and families with the paths relative to the working directory 'root'"""
+        root = Path(root)
+        self.documents = [
+            (self._document_file(document, root), self._document_file(family, root))
+            for document, family in documents
+        ]
+        self.families = [self._document_file(family, root) for family in families]
+
+    def restore_discovery(
+        self, root: t.Union[str, Path]
+    ) -> t.Tuple[t.List[t.Tuple[DocumentFile, DocumentFile]], t.List[DocumentFile]]:
+        """Return the stored (series document, family document) pairs and families below the working directory 'root'"""
+        root = Path(root)
+        families = {
+            entry[0]: self._restore_document_file(entry, root) for entry in self.families
+        }
+        documents = [
+            (
+                self._restore_document_file(document, root),
+                families.get(family[0], None)
+                or self._restore_document_file(family, root),
+            )
+            for document, family in self.documents
+        ]
+        return documents, list(families.values())
+
+    def set_commit_index(
+        self,
+        root: t.Union[str, Path],
+        commit_index: t.Optional[t.Mapping[Path, datetime.datetime]],
+    ) -> None:
+        """Store the commit index of the run with the paths relative to the working directory 'root'"""
+        root = Path(root)
+        self.commit_index = {
+            str(path.relative_to(root)): commit_time.timestamp()
+            for path, commit_time in (commit_index or {}).items()
+        }
+
+    def restore_commit_index(
+        self, root: t.Union[str, Path]
+    ) -> t.OrderedDict[Path, datetime.datetime]:
+        """Return the stored commit index with the paths below the working directory 'root'"""
+        return t.OrderedDict(
+            (Path(root) / path, datetime.datetime.fromtimestamp(timestamp))
+            for path, timestamp in self.commit_index.items()
+        )
+
+    def add(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        self.azure_types.append((collection_name, dict(document)))
+
+    def publish(self, backend) -> int:
+        """Write all stored Azure Types to a 'src.storage' backend, return their number"""
+        for collection_name, document in self.azure_types:
+            backend.write(collection_name, document)
+        return len(self.azure_types)
+
+    def dumps(self, compression: str = constants.SNAPSHOT_COMPRESSION) -> bytes:
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown compression '{compression}', choose one of {list(COMPRESSIONS)}"
+            )
+        compress, _ = COMPRESSIONS[compression]
+        state = msgpack.packb(
+            {
+                "discovery_version": self.discovery_version,
+                "documents": self.documents,
+                "families": self.families,
+                "commit_index": self.commit_index,
+                "azure_types": self.azure_types,
+            },
+            default=str,
+        )
+        return msgpack.packb(
+            {
+                "format_version": FORMAT_VERSION,
+                "head": self.head,
+                "code_version": self.code_version,
+                "compression": compression,
+                "state": compress(state),
+            }
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> "WarmStartSnapshot":
+        header = msgpack.unpackb(data)
+        if not isinstance(header, dict):
+            raise ValueError(f"Snapshot header is a '{type(header).__name__}', not a map")
+        if header.get("format_version", None) != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version '{header.get('format_version', None)}'"
+            )
+        _, decompress = COMPRESSIONS[header["compression"]]
+        state = msgpack.unpackb(decompress(header["state"]))
+        if not isinstance(state, dict):
+            raise ValueError(f"Snapshot state is a '{type(state).__name__}', not a map")
+        snapshot = cls(header["head"], header["code_version"])
+        snapshot.discovery_version = state["discovery_version"]
+        snapshot.documents = [tuple(pair) for pair in state["documents"]]
+        snapshot.families = state["families"]
+        snapshot.commit_index = state["commit_index"]
+        snapshot.azure_types = [tuple(entry) for entry in state["azure_types"]]
+        return snapshot
+
+    def save(
+        self,
+        path: t.Union[str, Path] = constants.SNAPSHOT_PATH,
+        compression: str = constants.SNAPSHOT_COMPRESSION,
+    ) -> None:
+        """Write the snapshot, replacing 'path' atomically"""
+        data = self.dumps(compression)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as fout:
+            fout.write(data)
+        os.replace(temporary_path, path)
+        logger.info(
+            f"Wrote warm start snapshot of commit '{self.head}' with {len(self.azure_types)} "
+            f"Azure Types to '{path}' ({len(data)} bytes)"
+        )
+
+    @classmethod
+    def load(
+        cls, path: t.Union[str, Path] = constants.SNAPSHOT_PATH
+    ) -> t.Optional["WarmStartSnapshot"]:
+        """
+        Read the snapshot at 'path', or return None if there is no usable one.
+        A truncated or corrupt file is logged and treated as a cold start, it never fails the run
+        """
+        try:
+            with open(path, "rb") as fin:
+                return cls.loads(fin.read())
+        except FileNotFoundError:
+            return None
+        except (
+            ValueError,
+            KeyError,
+            TypeError,
+            OSError,
+            EOFError,
+            zlib.error,
+            lzma.LZMAError,
+            msgpack.exceptions.UnpackException,
+        ) as e:
+            logger.warning(f"Ignoring unreadable warm start snapshot '{path}': {e!r}")
+            return None
@@ -0,0 +1,110 @@
+import json
+import typing as t
+from pathlib import Path
+
+from src import constants
+from src.azure_types.shared import AzureType
+from src.catalogue.aggregates import CatalogueAggregates
+
+from .base import StorageBackend
+
+
+class AggregatesStorageBackend(StorageBackend):
+    """
+    Passes all writes on to the 'target' backend and maintains 'CatalogueAggregates' of them on the way.
+    On close the summary is written to 'path' as one small JSON document, next to the per-document
+    state ('<path>.state'), which lets the next run continue incrementally instead of rescanning.
+    Targets that are rebuilt on every run only hold what the run wrote, documents of the previous
+    runs that a successful run did not write again are gone from them and are pruned on close,
+    see 'prune'. Targets that are updated in place keep those documents, and so do the aggregates
+    """
+
+    name = "aggregates"
+
+    def __init__(
+        self,
+        target: StorageBackend,
+        path: str = constants.STORAGE_AGGREGATES_PATH,
+    ) -> None:
+        super().__init__()
+        self.target = target
+        self.path = Path(path)
+        self.state_path = Path(f"{path}.state")
+        self.aggregates = CatalogueAggregates.load(self.state_path)
+        self.durable_flush = target.durable_flush
+        self.readable = target.readable
+        self.rebuilt = target.rebuilt
+        self.results = self.target.results
+        self._changed = False
+        # Per collection, the names of all documents written during this run
+        self.written: t.Dict[str, t.Set[str]] = {}
+
+    def open(self) -> None:
+        self.target.open()
+
+    def add(self, azure_type: AzureType) -> None:
+        self.target.add(azure_type)
+        self._aggregate(azure_type.mongodb_collection_name, azure_type.serialize())
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        self.target.write(collection_name, document)
+        self._aggregate(collection_name, document)
+
+    def _aggregate(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        self.written.setdefault(collection_name, set()).add(document["name"])
+        self._changed |= self.aggregates.add(collection_name, document)
+
+    def remove(self, collection_name: str, name: str) -> None:
+        """Drop a document that was removed from the target from the aggregates"""
+        self._changed |= self.aggregates.remove(collection_name, name)
+
+    def prune(self) -> t.Dict[str, t.List[str]]:
+        """
+        Remove all aggregated documents this run did not write from the collections it wrote to,
+        return their names per collection. Collections the run did not write to at all are kept
+        """
+        pruned: t.Dict[str, t.List[str]] = {}
+        for collection_name, written in self.written.items():
+            names = self.aggregates.contributions.get(collection_name, {}).keys()
+            pruned[collection_name] = sorted(set(names) - written)
+            for name in pruned[collection_name]:
+                self.remove(collection_name, name)
+            if pruned[collection_name]:
+                self.logger.info(
+                    f"Pruned {len(pruned[collection_name])} documents that are gone "
+                    f"from the aggregates of collection '{collection_name}'"
+                )
+        return pruned
+
+    def flush(self) -> None:
+        self.target.flush()
+
+    def close(self) -> None:
+        self.target.close()
+        if self.target.rebuilt:
+            self.prune()
+        if self._changed or not self.path.exists():
+            self.save()
+
+    def abort(self) -> None:
+        self.target.abort()
+        # Only what the target kept may be aggregated
+        if self.target.durable_flush and self._changed:
+            self.save()
+
+    def save(self) -> None:
+        temporary_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(temporary_path, "w") as fout:
+            json.dump(self.aggregates.to_document(), fout, default=str)
+        temporary_path.replace(self.path)
+        self.aggregates.save(self.state_path)
+        self._changed = False
+        self.logger.info(f"Wrote catalogue aggregates to '{self.path}'")
+
+    def version(self) -> t.Optional[str]:
+        return self.target.version()
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        return self.target.iter_documents(collection_name)
@@ -0,0 +1,222 @@
+import typing as t
+from collections import OrderedDict
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from src import constants
+from src.azure_types.dictionary import DescriptionDictionary
+from src.azure_types.series import AzureSkuSeriesType
+from src.azure_types.shared import AzureType
+
+from .base import AZURE_TYPES, StorageBackend
+
+DICTIONARY_STRING = pa.dictionary(pa.int32(), pa.string())
+# Description mappings are exported as a list of their entries, in order
+DESCRIPTIONS = pa.list_(
+    pa.struct(
+        [
+            ("code", DICTIONARY_STRING),
+            ("description", DICTIONARY_STRING),
+            ("verbose_description", DICTIONARY_STRING),
+        ]
+    )
+)
+# Fields with few distinct values, besides the field explanations ('<field>__str')
+DICTIONARY_FIELDS: t.Set[str] = {
+    "series_name",
+    "_tier",
+    "family_id",
+    "family_description",
+    "_subfamilies",
+    "_addons",
+    "_accelerator",
+    "version",
+    "iversion",
+    "cap_scsi_interface_capable_vm_generations",
+    "cap_nvme_interface_capable_vm_generations",
+}
+LIST_FIELDS: t.Set[str] = {"cpu_processor_models"}
+# Fields whose type differs between Azure Types, they take precedence over the name based types
+AZURE_TYPE_FIELDS: t.Dict[t.Type[AzureType], t.Dict[str, pa.DataType]] = {
+    AzureSkuSeriesType: {"version": pa.int64()},
+}
+
+
+def field_type(
+    field: str, azure_type: t.Optional[t.Type[AzureType]] = None
+) -> pa.DataType:
+    """Return the Arrow type of a serialized field of 'azure_type', derived from its name unless declared otherwise"""
+    if field in AZURE_TYPE_FIELDS.get(azure_type, {}):
+        return AZURE_TYPE_FIELDS[azure_type][field]
+    if field in DescriptionDictionary.description_fields:
+        return DESCRIPTIONS
+    if field in DICTIONARY_FIELDS or field.endswith(
+        DescriptionDictionary.explanation_suffix
+    ):
+        return DICTIONARY_STRING
+    if field in LIST_FIELDS or field.endswith("_specs"):
+        return pa.list_(pa.string())
+    if field.startswith("cap_") and field.endswith("_capable"):
+        return pa.bool_()
+    if field in ("vcpus", "constrained_vcpus") or field.endswith(("_min", "_max")):
+        return pa.int64()
+    return pa.string()
+
+
+def arrow_schema(azure_type: t.Type[AzureType]) -> pa.Schema:
+    """Return the stable Arrow schema of the serialized data of 'azure_type'"""
+    return pa.schema(
+        [
+            (field, field_type(field, azure_type))
+            for field in azure_type.serialized_fields
+        ]
+    )
+
+
+def to_arrow_value(value: t.Any, type: pa.DataType) -> t.Any:
+    if value is None:
+        return None
+    if type == DESCRIPTIONS:
+        if isinstance(value, t.Mapping):
+            return [{"code": code, **entry} for code, entry in value.items()]
+        return [{"code": code} for code in value]
+    if pa.types.is_list(type) and isinstance(value, str):
+        return [value]
+    if type in (pa.string(), DICTIONARY_STRING):
+        return str(value)
+    return value
+
+
+def from_arrow_value(value: t.Any, type: pa.DataType) -> t.Any:
+    if value is None or type != DESCRIPTIONS:
+        return value
+    return OrderedDict(
+        (
+            entry["code"],
+            {k: v for k, v in entry.items() if k != "code" and v is not None},
+        )
+        for entry in value
+    )
+
+
+class ArrowStorageBackend(StorageBackend):
+    """
+    Exports Azure Types as columnar Parquet ('parquet') or Arrow IPC stream ('arrow') files, one per collection,
+    written as row groups of 'batch_size' documents while they are produced.
+    Every collection has a stable typed schema ('arrow_schema'), repetitive strings are dictionary encoded
+    and description mappings become lists of '{code, description, verbose_description}' structs.
+    Arrow IPC streams can be memory mapped by readers and loaded without copying, see 'read_table'.
+    The stream format is used as only it allows the dictionaries to change between row groups
+    """
+
+    name = "arrow"
+    # The files are rewritten on every run
+    durable_flush = False
+    rebuilt = True
+    suffixes: t.ClassVar[t.Dict[str, str]] = {"parquet": ".parquet", "arrow": ".arrows"}
+
+    def __init__(
+        self,
+        path: str = constants.STORAGE_ARROW_PATH,
+        batch_size: int = constants.STORAGE_BATCH_SIZE,
+        format: str = constants.STORAGE_ARROW_FORMAT,
+    ) -> None:
+        super().__init__()
+        assert batch_size > 0
+        if format not in self.suffixes:
+            raise ValueError(
+                f"Unknown format '{format}', choose one of {list(self.suffixes)}"
+            )
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.format = format
+        self.buffers: t.Dict[str, t.List[t.Mapping[str, t.Any]]] = {}
+        self.writers: t.Dict[
+            str, t.Union[pq.ParquetWriter, ipc.RecordBatchStreamWriter]
+        ] = {}
+
+    def collection_path(self, collection_name: str) -> Path:
+        return self.path / f"{collection_name}{self.suffixes[self.format]}"
+
+    def schema(self, collection_name: str) -> pa.Schema:
+        return arrow_schema(AZURE_TYPES[collection_name])
+
+    def _writer(self, collection_name: str):
+        if collection_name not in self.writers:
+            self.path.mkdir(parents=True, exist_ok=True)
+            path = self.collection_path(collection_name)
+            schema = self.schema(collection_name)
+            self.logger.info(f"Exporting collection '{collection_name}' to '{path}'")
+            if self.format == "parquet":
+                self.writers[collection_name] = pq.ParquetWriter(path, schema)
+            else:
+                self.writers[collection_name] = ipc.new_stream(path, schema)
+        return self.writers[collection_name]
+
+    def open(self) -> None:
+        # Every collection is exported, even if no documents are written to it
+        for collection_name in AZURE_TYPES.keys():
+            self._writer(collection_name)
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(document)
+        self.results.setdefault(collection_name, {})[document["name"]] = True
+        if len(buffer) >= self.batch_size:
+            self._write_batch(collection_name, buffer)
+            self.buffers[collection_name] = []
+
+    def _write_batch(
+        self, collection_name: str, documents: t.List[t.Mapping[str, t.Any]]
+    ) -> None:
+        schema = self.schema(collection_name)
+        arrays = [
+            pa.array(
+                [
+                    to_arrow_value(document.get(field.name, None), field.type)
+                    for document in documents
+                ],
+                type=field.type,
+            )
+            for field in schema
+        ]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        self._writer(collection_name).write_batch(batch)
+
+    def flush(self) -> None:
+        for collection_name, buffer in self.buffers.items():
+            if buffer:
+                self._write_batch(collection_name, buffer)
+        self.buffers = {}
+
+    def close(self) -> None:
+        super().close()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def read_table(self, collection_name: str) -> pa.Table:
+        """Read an exported collection, Arrow IPC streams are memory mapped instead of copied"""
+        path = self.collection_path(collection_name)
+        if self.format == "parquet":
+            return pq.read_table(path)
+        return ipc.open_stream(pa.memory_map(str(path), "r")).read_all()
+
+    def version(self) -> t.Optional[str]:
+        return self.file_version(
+            *(self.collection_path(name) for name in AZURE_TYPES.keys())
+        )
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        table = self.read_table(collection_name)
+        for batch in table.to_batches():
+            for row in batch.to_pylist():
+                yield {
+                    field.name: from_arrow_value(row[field.name], field.type)
+                    for field in batch.schema
+                }
@@ -0,0 +1,105 @@
+import abc
+import logging
+import os
+import typing as t
+
+from src.azure_types.instances import SkuType
+from src.azure_types.series import AzureSkuSeriesType
+from src.azure_types.shared import AzureType
+
+# All Azure Types that are persisted, by the name of their collection
+AZURE_TYPES: t.Dict[str, t.Type[AzureType]] = {
+    azure_type.mongodb_collection_name: azure_type
+    for azure_type in (AzureSkuSeriesType, SkuType)
+}
+
+
+class StorageBackend(abc.ABC):
+    """
+    Destination for serialized Azure Types, grouped into collections and identified by their 'name'.
+    Writes may be buffered by the implementation until 'flush' or 'close' is called
+    """
+
+    name: t.ClassVar[str]
+    # Whether flushed writes persist even if the backend is aborted afterwards
+    durable_flush: bool = True
+    # Whether written documents can be read back with 'iter_documents'
+    readable: bool = True
+    # Whether every run replaces all stored documents, so documents it does not write are gone
+    rebuilt: bool = False
+    logger: t.ClassVar[logging.Logger] = logging.getLogger(__name__)
+
+    def __init__(self) -> None:
+        # Per collection, whether each written document was new or changed (True) or already up to date (False)
+        self.results: t.Dict[str, t.Dict[str, bool]] = {}
+
+    def __enter__(self) -> "StorageBackend":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, *args, **kwargs) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    @property
+    def changed(self) -> int:
+        return sum(
+            changed for results in self.results.values() for changed in results.values()
+        )
+
+    def open(self) -> None:
+        """Prepare the backend for writing"""
+        pass
+
+    def add(self, azure_type: AzureType) -> None:
+        """Write an Azure Type to the collection of its type"""
+        self.write(azure_type.mongodb_collection_name, azure_type.serialize())
+
+    @abc.abstractmethod
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        """Write a serialized Azure Type to the collection 'collection_name'"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def flush(self) -> None:
+        """Persist all buffered writes"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        self.flush()
+        self.logger.info(
+            f"Storage backend '{self.name}' closed, {self.changed} documents changed"
+        )
+
+    def abort(self) -> None:
+        """Stop writing after an error, by default everything written so far is kept"""
+        self.close()
+
+    def version(self) -> t.Optional[str]:
+        """
+        Return a token which changes whenever the stored documents change,
+        or None if the backend can not tell, readers then have to reload periodically
+        """
+        return None
+
+    @staticmethod
+    def file_version(*paths: t.Union[str, os.PathLike]) -> str:
+        """Version token derived from the modification times and sizes of 'paths'"""
+        versions = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                versions.append("-")
+            else:
+                versions.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        return ",".join(versions)
+
+    @abc.abstractmethod
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Iterate over all serialized Azure Types stored in the collection 'collection_name'"""
+        raise NotImplementedError
@@ -0,0 +1,233 @@
+import json
+import logging
+import os
+import typing as t
+from pathlib import Path
+
+from src import constants
+
+from .base import StorageBackend
+
+
+class Journal:
+    """
+    Append-only NDJSON journal of serialized Azure Types, one '{"collection": ..., "document": ...}' object per line.
+    Appended entries are fsynced in batches of 'fsync_batch_size', a torn last line after a crash is ignored on replay.
+    The byte offset up to which the journal has been applied is kept in a checkpoint file next to it
+    """
+
+    logger: t.ClassVar[logging.Logger] = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        path: t.Union[str, Path] = constants.STORAGE_JOURNAL_PATH,
+        fsync_batch_size: int = constants.STORAGE_JOURNAL_FSYNC_BATCH_SIZE,
+    ) -> None:
+        assert fsync_batch_size > 0
+        self.path = Path(path)
+        self.checkpoint_path = self.path.with_name(self.path.name + ".checkpoint")
+        self.fsync_batch_size = fsync_batch_size
+        self._file: t.Optional[t.TextIO] = None
+        self._unsynced = 0
+
+    def _repair(self) -> None:
+        """Cut off an incomplete last entry, so that new entries start on a line of their own"""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as fin:
+            size = fin.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(end - 4096, 0)
+                fin.seek(start)
+                newline = fin.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                self.logger.warning(
+                    f"Discarding incomplete entry at the end of journal '{self.path}'"
+                )
+                fin.truncate(end)
+
+    def append(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        if self._file is None:
+            self._repair()
+            self._file = open(self.path, "a")
+        line = json.dumps(
+            {"collection": collection_name, "document": document}, default=str
+        )
+        self._file.write(line + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_batch_size:
+            self.sync()
+
+    def sync(self) -> None:
+        """Make all appended entries durable"""
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def checkpoint(self) -> int:
+        """Byte offset of the first entry that has not been applied yet"""
+        if not self.checkpoint_path.exists():
+            return 0
+        return int(self.checkpoint_path.read_text() or 0)
+
+    @checkpoint.setter
+    def checkpoint(self, offset: int) -> None:
+        # Written to a temporary file and renamed, so a crash never leaves a partial checkpoint behind
+        temporary_path = self.checkpoint_path.with_name(
+            self.checkpoint_path.name + ".tmp"
+        )
+        with open(temporary_path, "w") as fout:
+            fout.write(str(offset))
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    @property
+    def pending(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > self.checkpoint
+
+    def iter_entries(
+        self, offset: int = 0
+    ) -> t.Iterator[t.Tuple[int, str, t.Dict[str, t.Any]]]:
+        """Iterate over all complete entries from 'offset' on, together with the byte offset following each entry"""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as fin:
+            fin.seek(offset)
+            for line in fin:
+                if not line.endswith(b"\n"):
+                    self.logger.warning(
+                        f"Ignoring incomplete entry at the end of journal '{self.path}'"
+                    )
+                    return
+                offset += len(line)
+                entry = json.loads(line)
+                yield offset, entry["collection"], entry["document"]
+
+    def truncate(self) -> None:
+        """Discard all entries once they have been applied"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.checkpoint_path.unlink(missing_ok=True)
+
+
+class JournalReplayer:
+    """
+    Applies the entries of a journal to a storage backend in batches, starting at the journal's checkpoint.
+    For backends with durable flushes the checkpoint is advanced after every flushed batch,
+    so an interrupted replay resumes where it stopped.
+    Entries replayed twice are idempotent, as storage backends upsert documents by name
+    """
+
+    logger: t.ClassVar[logging.Logger] = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        journal: Journal,
+        backend: StorageBackend,
+        batch_size: int = constants.STORAGE_BATCH_SIZE,
+    ) -> None:
+        assert batch_size > 0
+        self.journal = journal
+        self.backend = backend
+        self.batch_size = batch_size
+
+    def replay(self) -> int:
+        """Apply all pending entries and return how many were applied"""
+        self.journal.sync()
+        applied = 0
+        offset = self.journal.checkpoint
+        for offset, collection_name, document in self.journal.iter_entries(offset):
+            self.backend.write(collection_name, document)
+            applied += 1
+            if applied % self.batch_size == 0:
+                self.backend.flush()
+                if self.backend.durable_flush:
+                    self.journal.checkpoint = offset
+        self.backend.flush()
+        if self.backend.durable_flush:
+            self.journal.checkpoint = offset
+        self.logger.info(f"Replayed {applied} entries of journal '{self.journal.path}'")
+        return applied
+
+
+class JournalStorageBackend(StorageBackend):
+    """
+    Writes Azure Types to a local journal first and replays them to the 'target' backend in bulk on close.
+    Parsing therefore never waits for the target, and if the target is unavailable the journal is kept
+    and its remaining entries are replayed together with the next run, instead of failing the whole run
+    """
+
+    name = "journal"
+
+    def __init__(
+        self,
+        target: StorageBackend,
+        journal: t.Optional[Journal] = None,
+    ) -> None:
+        super().__init__()
+        self.target = target
+        self.journal = journal or Journal()
+        self.replayer = JournalReplayer(self.journal, self.target)
+        self.results = self.target.results
+        self.readable = target.readable
+        self.rebuilt = target.rebuilt
+
+    def open(self) -> None:
+        if self.journal.pending:
+            self.logger.warning(
+                f"Journal '{self.journal.path}' has entries left over from a previous run"
+            )
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        self.journal.append(collection_name, document)
+
+    def flush(self) -> None:
+        self.journal.sync()
+
+    def close(self) -> None:
+        self.journal.close()
+        if self.replay():
+            self.journal.truncate()
+        self.logger.info(
+            f"Storage backend '{self.name}' closed, {self.changed} documents changed"
+        )
+
+    def abort(self) -> None:
+        # Parsing failed, the journal is kept so it can be replayed on the next run
+        self.journal.close()
+
+    def replay(self) -> bool:
+        """Apply the journal to the target backend, return False if the target failed"""
+        try:
+            with self.target:
+                self.replayer.replay()
+        except Exception as e:
+            self.logger.error(
+                f"Replaying journal '{self.journal.path}' to storage backend '{self.target.name}' failed, "
+                f"the journal is kept for the next run: {e!r}"
+            )
+            return False
+        return True
+
+    def version(self) -> t.Optional[str]:
+        return self.target.version()
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        return self.target.iter_documents(collection_name)
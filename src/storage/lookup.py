@@ -0,0 +1,58 @@
+import os
+import typing as t
+
+from src import constants
+from src.azure_types.instances import SkuType
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.lookup import SkuLookupFile, SkuLookupFileWriter
+
+from .base import StorageBackend
+
+
+class SkuLookupStorageBackend(StorageBackend):
+    """
+    Builds the memory mapped SKU lookup file of 'src.catalogue.lookup' from a run.
+    SKUs are linked to the series they were parsed from through their 'series_name'.
+    The file is replaced atomically on close, processes that mapped the previous file keep reading it
+    """
+
+    name = "lookup"
+    # The file is rebuilt on every run
+    durable_flush = False
+    rebuilt = True
+
+    def __init__(self, path: str = constants.STORAGE_LOOKUP_PATH) -> None:
+        super().__init__()
+        self.path = path
+        self.writer = SkuLookupFileWriter()
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        if collection_name == SkuType.mongodb_collection_name:
+            self.writer.add_sku(document, document.get("series_name", None))
+        elif collection_name == AzureSkuSeriesType.mongodb_collection_name:
+            self.writer.add_series(document)
+        else:
+            return
+        self.results.setdefault(collection_name, {})[document["name"]] = True
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        self.writer.write(temporary_path)
+        os.replace(temporary_path, self.path)
+        super().close()
+
+    def version(self) -> t.Optional[str]:
+        return self.file_version(self.path)
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Iterate over the decoded SKUs of the lookup file, series are only available through their SKUs"""
+        if collection_name != SkuType.mongodb_collection_name:
+            return
+        with SkuLookupFile(self.path) as lookup:
+            for name in lookup.names():
+                yield t.cast(t.Dict[str, t.Any], lookup.get(name))
@@ -0,0 +1,142 @@
+import typing as t
+
+from pymongo import ReplaceOne
+
+from src import constants
+from src.azure_types.dictionary import DescriptionDictionary
+from src.azure_types.shared import AzureType
+from src.database import BulkWriter, IndexManager, MongoDB, StagingPublisher
+
+from .base import AZURE_TYPES, StorageBackend
+
+
+class MongoDBStorageBackend(StorageBackend):
+    """
+    Stores Azure Types in MongoDB through bulk upserts, ensuring the declared indexes before the first write.
+    In 'publish' mode the whole run is inserted into staging collections instead,
+    which replace the live collections on close only if the run succeeded.
+    With 'normalize_descriptions' the description texts shared between documents are written once
+    to the dictionary collection and documents only reference them by code, see 'DescriptionDictionary'
+    """
+
+    name = "mongodb"
+    dictionary_collection_name: t.ClassVar[str] = "descriptions"
+
+    def __init__(
+        self,
+        batch_size: int = constants.MONGODB_BULK_BATCH_SIZE,
+        flush_interval: float = constants.MONGODB_BULK_FLUSH_INTERVAL,
+        publish: bool = constants.MONGODB_PUBLISH,
+        normalize_descriptions: bool = constants.MONGODB_NORMALIZE_DESCRIPTIONS,
+    ) -> None:
+        super().__init__()
+        self.writer: t.Union[BulkWriter, StagingPublisher]
+        if publish:
+            self.writer = StagingPublisher(list(AZURE_TYPES.values()), batch_size)
+        else:
+            self.writer = BulkWriter(
+                batch_size,
+                flush_interval,
+                index_manager=IndexManager(list(AZURE_TYPES.values())),
+            )
+        self.publish = publish
+        # Staging collections are discarded unless the run is published
+        self.durable_flush = not publish
+        # Only a published run replaces the collections, upserts keep unwritten documents
+        self.rebuilt = publish
+        self.results = self.writer.results
+        self.database = MongoDB()
+        self.normalize_descriptions = normalize_descriptions
+        self._dictionary: t.Optional[DescriptionDictionary] = None
+
+    @property
+    def dictionary_collection(self):
+        client = self.database.client
+        database = client[self.database.mongodb_database_name]
+        return database[self.dictionary_collection_name]
+
+    @property
+    def dictionary(self) -> DescriptionDictionary:
+        if self._dictionary is None:
+            self._dictionary = self.load_dictionary()
+        return self._dictionary
+
+    def load_dictionary(self) -> DescriptionDictionary:
+        """Read all description texts stored in the dictionary collection"""
+        return DescriptionDictionary(
+            {entry["_id"]: entry["value"] for entry in self.dictionary_collection.find()}
+        )
+
+    def open(self) -> None:
+        # The bulk writer ensures the indexes itself, once it actually writes
+        if isinstance(self.writer, StagingPublisher):
+            self.writer.open()
+
+    def add(self, azure_type: AzureType) -> None:
+        assert azure_type.name
+        azure_type._id = str(azure_type.document_id(azure_type.name))
+        self.write(azure_type.mongodb_collection_name, azure_type.serialize())
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        if self.normalize_descriptions:
+            document = self.dictionary.normalize(collection_name, document)
+        self.writer.add_document(collection_name, document)
+
+    def flush(self) -> None:
+        # Dictionary entries are written first, so every stored code can be resolved
+        if self._dictionary is not None:
+            new_entries = self._dictionary.pop_new_entries()
+            if new_entries:
+                self.dictionary_collection.bulk_write(
+                    [
+                        ReplaceOne({"_id": code}, {"value": value}, upsert=True)
+                        for code, value in new_entries.items()
+                    ],
+                    ordered=False,
+                )
+        self.writer.flush()
+
+    def close(self) -> None:
+        super().close()
+        if isinstance(self.writer, StagingPublisher):
+            self.writer.publish()
+
+    def abort(self) -> None:
+        if isinstance(self.writer, StagingPublisher):
+            self.logger.warning("Run failed, discarding staging collections")
+            self.writer.abort()
+        else:
+            super().abort()
+
+    def version(self) -> t.Optional[str]:
+        """
+        Published collections replace the live ones, which changes their UUIDs,
+        upserts in place are not detected and return None
+        """
+        if not self.publish:
+            return None
+        database = self.database.client[self.database.mongodb_database_name]
+        uuids = {
+            collection["name"]: collection.get("info", {}).get("uuid", None)
+            for collection in database.list_collections(
+                filter={"name": {"$in": list(AZURE_TYPES.keys())}}
+            )
+        }
+        return ",".join(str(uuids.get(name, "-")) for name in AZURE_TYPES.keys())
+
+    def iter_documents(
+        self, collection_name: str, hydrate: bool = True
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Iterate over all stored documents, with 'hydrate' resolving normalized descriptions"""
+        dictionary = self.load_dictionary() if hydrate else None
+        client = self.database.client
+        collection = client[self.database.mongodb_database_name][collection_name]
+        projection = {
+            "_id": 0,
+            AzureType.fingerprint_field: 0,
+            AzureType.field_fingerprints_field: 0,
+        }
+        for document in collection.find({}, projection, sort=[("name", 1)]):
+            if dictionary is not None and dictionary.entries:
+                document = dictionary.hydrate(collection_name, document)
+            yield document
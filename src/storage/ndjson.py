@@ -0,0 +1,86 @@
+import json
+import sys
+import typing as t
+
+from src import constants
+
+from .base import StorageBackend
+
+
+class NDJSONStorageBackend(StorageBackend):
+    """
+    Streams Azure Types as newline delimited JSON, one '{"collection": ..., "document": ...}' object per line.
+    A 'path' of '-' writes to stdout, so results can be piped into other tools directly.
+    The file is truncated when the backend is opened, every document written counts as changed
+    """
+
+    name = "ndjson"
+    # The file is rewritten on every run
+    durable_flush = False
+    rebuilt = True
+
+    def __init__(
+        self,
+        path: str = constants.STORAGE_NDJSON_PATH,
+        batch_size: int = constants.STORAGE_BATCH_SIZE,
+    ) -> None:
+        super().__init__()
+        assert batch_size > 0
+        self.path = path
+        # Documents streamed to stdout can not be read back
+        self.readable = path != "-"
+        self.batch_size = batch_size
+        self._file: t.Optional[t.TextIO] = None
+        self._lines: t.List[str] = []
+
+    @property
+    def file(self) -> t.TextIO:
+        if self._file is None:
+            if self.path == "-":
+                self._file = sys.stdout
+            else:
+                self.logger.info(f"Opening NDJSON file '{self.path}'")
+                self._file = open(self.path, "w")
+        return self._file
+
+    def open(self) -> None:
+        self.file
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        line = json.dumps(
+            {"collection": collection_name, "document": document}, default=str
+        )
+        self._lines.append(line + "\n")
+        self.results.setdefault(collection_name, {})[document["name"]] = True
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._lines:
+            return
+        self.file.writelines(self._lines)
+        self.file.flush()
+        self._lines = []
+
+    def close(self) -> None:
+        super().close()
+        if self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+        self._file = None
+
+    def version(self) -> t.Optional[str]:
+        if self.path == "-":
+            return None
+        return self.file_version(self.path)
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        if not self.readable:
+            raise ValueError("Documents written to stdout can not be read back")
+        self.flush()
+        with open(self.path, "r") as fin:
+            for line in fin:
+                entry = json.loads(line)
+                if entry["collection"] == collection_name:
+                    yield entry["document"]
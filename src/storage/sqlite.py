@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import typing as t
+
+from src import constants
+from src.azure_types.shared import AzureType
+
+from .base import AZURE_TYPES, StorageBackend
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """
+    Stores Azure Types in a SQLite database in WAL mode, one table per collection.
+    Documents are stored as JSON next to their content fingerprint, writes are committed in batches
+    and the fields declared in 'AzureType.mongodb_indexes' are indexed through JSON expressions
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str = constants.STORAGE_SQLITE_PATH,
+        batch_size: int = constants.STORAGE_BATCH_SIZE,
+    ) -> None:
+        super().__init__()
+        assert batch_size > 0
+        self.path = path
+        self.batch_size = batch_size
+        self._connection: t.Optional[sqlite3.Connection] = None
+        self._tables: t.Set[str] = set()
+        self._pending = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.logger.info(f"Opening SQLite database '{self.path}'")
+            self._connection = sqlite3.connect(self.path)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        return self._connection
+
+    def open(self) -> None:
+        for collection_name in AZURE_TYPES.keys():
+            self._ensure_table(collection_name)
+
+    def _ensure_table(self, collection_name: str) -> None:
+        if collection_name in self._tables:
+            return
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{collection_name}" ('
+            "name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, document TEXT NOT NULL)"
+        )
+        azure_type = AZURE_TYPES.get(collection_name, None)
+        for index in azure_type.mongodb_indexes if azure_type else ():
+            fields = [field for field in index.document["key"] if field != "name"]
+            if not fields:
+                continue
+            expressions = ", ".join(
+                f"json_extract(document, '$.{field}')" for field in fields
+            )
+            self.connection.execute(
+                f'CREATE INDEX IF NOT EXISTS "{collection_name}_{index.document["name"]}" '
+                f'ON "{collection_name}" ({expressions})'
+            )
+        self.connection.commit()
+        self._tables.add(collection_name)
+
+    def write(self, collection_name: str, document: t.Mapping[str, t.Any]) -> None:
+        self._ensure_table(collection_name)
+        name = document["name"]
+        cursor = self.connection.execute(
+            f'INSERT INTO "{collection_name}" (name, fingerprint, document) VALUES (?, ?, ?) '
+            "ON CONFLICT(name) DO UPDATE SET "
+            "fingerprint = excluded.fingerprint, document = excluded.document "
+            "WHERE fingerprint != excluded.fingerprint",
+            (
+                name,
+                AzureType.document_fingerprint(document),
+                json.dumps(document, default=str),
+            ),
+        )
+        self.results.setdefault(collection_name, {})[name] = bool(cursor.rowcount)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._connection is None:
+            return
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        super().close()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._tables = set()
+
+    def version(self) -> t.Optional[str]:
+        # Committed transactions may only be in the write-ahead log until it is checkpointed
+        return self.file_version(self.path, f"{self.path}-wal")
+
+    def iter_documents(
+        self, collection_name: str
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        self._ensure_table(collection_name)
+        cursor = self.connection.execute(
+            f'SELECT document FROM "{collection_name}" ORDER BY name'
+        )
+        for (document,) in cursor:
+            yield json.loads(document)
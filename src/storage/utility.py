@@ -0,0 +1,37 @@
+import logging
+import typing as t
+
+from src import constants
+
+from .base import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+def get_storage_backend(
+    name: t.Optional[str] = None, **kwargs
+) -> StorageBackend:
+    """Create the storage backend called 'name', defaulting to the one configured in 'STORAGE_BACKEND'"""
+    from .arrow import ArrowStorageBackend
+    from .lookup import SkuLookupStorageBackend
+    from .mongodb import MongoDBStorageBackend
+    from .ndjson import NDJSONStorageBackend
+    from .sqlite import SQLiteStorageBackend
+
+    backends: t.Dict[str, t.Type[StorageBackend]] = {
+        backend.name: backend
+        for backend in (
+            MongoDBStorageBackend,
+            SQLiteStorageBackend,
+            NDJSONStorageBackend,
+            ArrowStorageBackend,
+            SkuLookupStorageBackend,
+        )
+    }
+    name = name or constants.STORAGE_BACKEND
+    if name not in backends:
+        raise ValueError(
+            f"Unknown storage backend '{name}', choose one of {list(backends.keys())}"
+        )
+    logger.info(f"Using storage backend '{name}'")
+    return backends[name](**kwargs)
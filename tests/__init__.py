@@ -1,9 +1,16 @@
 import os
 
 os.environ["LOG_LEVEL"] = "debug"
+from .test_aggregates import *
 from .test_azure_types import *
+from .test_bundle import *
 from .test_discovery import *
 from .test_e2e import *
+from .test_lookup import *
 from .test_multi_series_parser import *
+from .test_query import *
 from .test_repository import *
+from .test_search import *
 from .test_series_parsers import *
+from .test_service import *
+from .test_snapshot import *
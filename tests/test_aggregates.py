@@ -0,0 +1,104 @@
+import json
+import tempfile
+import typing as t
+from pathlib import Path
+
+from src.azure_types.instances import SkuTypes
+from src.catalogue.aggregates import CatalogueAggregates
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+from src.storage.aggregates import AggregatesStorageBackend
+from src.storage.utility import get_storage_backend
+
+from .shared import BaseTestCase, tag
+
+
+@tag("aggregates")
+class TestCatalogueAggregates(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+        family_resolver = self.repository.get_family_resolver()
+        # Aggregates are maintained over serialized SKUs only
+        self.skus: t.Dict[str, t.Dict[str, t.Any]] = {}
+        for document in documents:
+            document = t.cast(DocumentFile, document)
+            parser = document_to_parser(document, family_resolver.resolve(document))
+            for sku_type in SkuTypes(parser):
+                self.skus[t.cast(str, sku_type.name)] = sku_type.serialize()
+
+    def test010_aggregates(self):
+        skus = self.skus
+        aggregates = CatalogueAggregates()
+        for document in skus.values():
+            self.assertTrue(aggregates.add("sku_types", document))
+        self.assertFalse(aggregates.add("sku_types", next(iter(skus.values()))))
+        summary = aggregates.to_document()["sku_types"]
+        self.assertEqual(summary["all"]["count"], len(skus))
+        for family_id in {s["family_id"] for s in skus.values()}:
+            family = [s for s in skus.values() if s["family_id"] == family_id]
+            self.assertEqual(summary[f"family:{family_id}"]["count"], len(family))
+            self.assertEqual(
+                summary[f"family:{family_id}"]["ranges"]["vcpus"],
+                {
+                    "min": min(s["vcpus"] for s in family),
+                    "max": max(s["vcpus"] for s in family),
+                },
+            )
+        self.assertEqual(
+            summary["all"]["distinct"]["accelerator"],
+            sorted({a for s in skus.values() for a in s["accelerator"] or ()}),
+        )
+        removed = sorted(skus)[::2]
+        for name in removed:
+            self.assertTrue(aggregates.remove("sku_types", name))
+        self.assertFalse(aggregates.remove("sku_types", removed[0]))
+        rebuilt = CatalogueAggregates()
+        for name, document in skus.items():
+            if name not in removed:
+                rebuilt.add("sku_types", document)
+        self.assertEqual(aggregates.to_document(), rebuilt.to_document())
+        self.assertEqual(
+            CatalogueAggregates.from_state(
+                json.loads(json.dumps(aggregates.to_state()))
+            ).to_document(),
+            rebuilt.to_document(),
+        )
+
+    def test020_aggregates_backend_prunes_removed(self):
+        skus = self.skus
+        removed = sorted(skus)[0]
+        runs = (skus, {k: v for k, v in skus.items() if k != removed})
+        with tempfile.TemporaryDirectory() as directory:
+            summaries = {}
+            for name, target_path in (
+                ("ndjson", Path(directory) / "catalogue.ndjson"),
+                ("sqlite", Path(directory) / "catalogue.sqlite3"),
+            ):
+                path = str(Path(directory) / f"aggregates.{name}.json")
+                for run in runs:
+                    target = get_storage_backend(name, path=str(target_path))
+                    with AggregatesStorageBackend(target, path) as backend:
+                        for document in run.values():
+                            backend.write("sku_types", document)
+                with open(path, "r") as fin:
+                    summaries[name] = json.load(fin)
+                # The aggregates always describe the documents the target stores
+                stored = CatalogueAggregates()
+                for document in target.iter_documents("sku_types"):
+                    stored.add("sku_types", document)
+                self.assertEqual(
+                    summaries[name], json.loads(json.dumps(stored.to_document()))
+                )
+        # The rebuilt NDJSON file lost the SKU, SQLite updated in place still has it
+        counts = {
+            name: summary["sku_types"]["all"]["count"]
+            for name, summary in summaries.items()
+        }
+        self.assertEqual(counts, {"ndjson": len(skus) - 1, "sqlite": len(skus)})
@@ -1,12 +1,21 @@
 import copy
+import json
+import tempfile
 import typing as t
+from pathlib import Path
 
-from src.azure_types.instances import SkuTypes
+from pymongo.errors import BulkWriteError
+
+from src.azure_types.decoder import ADDON_BITS, SkuNameDecoder, decode_mask
+from src.azure_types.instances import SkuType, SkuTypes
 from src.azure_types.series import AzureSkuSeriesType
-from src.database import MongoDB
+from src.azure_types.shared import AzureType
+from src.database import BulkWriter, IndexManager, MongoDB, StagingPublisher
 from src.documents import DocumentDescriptor, DocumentFile
-from src.mixins import ParserUtilityMixin
+from src.mixins import MongoClientRegistry, ParserUtilityMixin
 from src.parsers.utility import document_to_parser
+from src.storage.journal import Journal, JournalReplayer, JournalStorageBackend
+from src.storage.utility import get_storage_backend
 
 from .shared import BaseTestCase, tag
 
@@ -35,10 +44,10 @@ class TestSeriesTypes(BaseTestCase):
         self.mongodb.drop()
 
     def test010_azure_sku_series_database_write(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents[:10]:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             family_parser = document_to_parser(family_document, family_document)
             series_type = AzureSkuSeriesType(parser, family_parser)
@@ -54,10 +63,10 @@ class TestSeriesTypes(BaseTestCase):
             self.assertEquals(_id, new_id)
 
     def test020_azure_sku_series(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             family_parser = document_to_parser(family_document, family_document)
             series_type = AzureSkuSeriesType(parser, family_parser)
@@ -69,10 +78,10 @@ class TestSeriesTypes(BaseTestCase):
             self.assertTrue(changed)
 
     def test030_azure_sku_types(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             # family_parser = document_to_parser(family_document, family_document)
             sku_types = SkuTypes(parser)
@@ -83,3 +92,377 @@ class TestSeriesTypes(BaseTestCase):
                 __import__("pprint").pprint(dto)
                 changed = sku_type.write_to_database()
                 self.assertTrue(changed)
+
+    def test040_azure_sku_types_flyweights(self):
+        family_resolver = self.repository.get_family_resolver()
+        descriptions = {}
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            for sku_type in SkuTypes(parser):
+                self.assertFalse(hasattr(sku_type, "__dict__"))
+                for addon_id, description in sku_type.addons.items():
+                    # Descriptions of the same code are one shared object
+                    self.assertIs(
+                        descriptions.setdefault(addon_id, description), description
+                    )
+                dto = sku_type.serialize()
+                self.assertEqual(dto["vcpus__str"], SkuType.vcpus__str)
+                self.assertIsInstance(dto["addons"], dict)
+
+    def test050_sku_name_decoder(self):
+        family_resolver = self.repository.get_family_resolver()
+        decoder = SkuNameDecoder()
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            sku_types = SkuTypes(parser)
+            # Decode every name twice to exercise the memoized path
+            names = [sku_type.name for sku_type in sku_types] * 2
+            decoded = decoder.decode(names)
+            self.assertEqual(len(decoded), len(names))
+            for sku_type, row in zip(sku_types * 2, decoded):
+                self.assertTrue(row["valid"])
+                self.assertEqual(row["vcpus"], sku_type.vcpus)
+                self.assertEqual(row["version"], int(sku_type.version))
+                self.assertEqual(
+                    "".join(decode_mask(int(row["addons"]), ADDON_BITS)),
+                    "".join(sorted(sku_type._addons or "", key=list(ADDON_BITS).index)),
+                )
+        self.assertFalse(decoder.decode(["not-a-sku"])["valid"][0])
+
+    def test060_shared_mongodb_client(self):
+        client = self.mongodb.client
+        self.assertIs(client, self.mongodb.client)
+        self.assertIs(client, MongoClientRegistry.get_client(self.mongodb.database_uri))
+        MongoClientRegistry.close(self.mongodb.database_uri)
+        self.assertIsNot(client, self.mongodb.client)
+
+    def test070_bulk_writer(self):
+        family_resolver = self.repository.get_family_resolver()
+        sku_types = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            sku_types.extend(SkuTypes(parser))
+        with BulkWriter(batch_size=50) as writer:
+            for sku_type in sku_types:
+                writer.add(sku_type)
+        self.assertTrue(all(writer.results["sku_types"].values()))
+        self.assertEqual(writer.round_trips, -(-len(sku_types) // 50))
+        with BulkWriter() as writer:
+            for sku_type in sku_types:
+                writer.add(sku_type)
+        self.assertFalse(any(writer.results["sku_types"].values()))
+        # Unchanged documents are skipped based on the preloaded fingerprints
+        self.assertEqual(writer.round_trips, 0)
+        sku_types[0].vcpus = 1024
+        self.assertEqual(BulkWriter().flush(), {})
+        writer = BulkWriter()
+        writer.add(sku_types[0])
+        self.assertEqual(writer.flush(), {"sku_types": {sku_types[0].name: True}})
+
+    def test080_index_manager(self):
+        index_manager = IndexManager([AzureSkuSeriesType, SkuType])
+        created = index_manager.ensure()
+        self.assertIn("name_1", created["sku_types"])
+        # Ensuring again is a no-op
+        self.assertEqual(index_manager.ensure(), {"sku_series": [], "sku_types": []})
+        report = index_manager.report()
+        self.assertFalse(any(report["missing"].values()))
+        self.assertIn("family_id_1", report["unused"]["sku_types"])
+
+    def test090_storage_backends(self):
+        family_resolver = self.repository.get_family_resolver()
+        sku_types = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            sku_types.extend(SkuTypes(parser))
+        names = sorted(t.cast(str, sku_type.name) for sku_type in sku_types)
+        with tempfile.TemporaryDirectory() as directory:
+            for name, path in (
+                ("sqlite", Path(directory) / "storage.sqlite3"),
+                ("ndjson", Path(directory) / "storage.ndjson"),
+            ):
+                with get_storage_backend(name, path=str(path), batch_size=7) as backend:
+                    for sku_type in sku_types:
+                        backend.add(sku_type)
+                self.assertEqual(backend.changed, len(sku_types))
+                stored = list(backend.iter_documents("sku_types"))
+                self.assertEqual(sorted(d["name"] for d in stored), names)
+                self.assertEqual(
+                    json.loads(json.dumps(sku_types[0].serialize(), default=str)),
+                    next(d for d in stored if d["name"] == sku_types[0].name),
+                )
+            # Unchanged documents are not rewritten
+            with get_storage_backend(
+                "sqlite", path=str(Path(directory) / "storage.sqlite3")
+            ) as backend:
+                for sku_type in sku_types:
+                    backend.add(sku_type)
+            self.assertEqual(backend.changed, 0)
+        with self.assertRaises(ValueError):
+            get_storage_backend("unknown")
+
+    def test100_field_level_updates(self):
+        family_resolver = self.repository.get_family_resolver()
+        document = t.cast(DocumentFile, self.documents[0])
+        parser = document_to_parser(document, family_resolver.resolve(document))
+        sku_type = next(iter(SkuTypes(parser)))
+        with BulkWriter() as writer:
+            writer.add(sku_type)
+        sku_type.vcpus = 1024
+        stored_document = sku_type.to_document()
+        writer = BulkWriter()
+        field_fingerprints = writer.fingerprints.get_field_fingerprints(
+            "sku_types", t.cast(str, sku_type.name)
+        )
+        update = AzureType.to_field_update(
+            stored_document, t.cast(t.Dict[str, str], field_fingerprints)
+        )
+        self.assertEqual(
+            set(update["$set"].keys()),
+            {"_fingerprint", "vcpus", "_fingerprints.vcpus"},
+        )
+        self.assertNotIn("$unset", update)
+        writer.add(sku_type)
+        self.assertEqual(writer.flush(), {"sku_types": {sku_type.name: True}})
+        collection = self.mongodb.client[self.mongodb.mongodb_database_name]["sku_types"]
+        self.assertEqual(
+            collection.find_one({"name": sku_type.name}), sku_type.to_document()
+        )
+        sku_type.vcpus = 2048
+        self.assertTrue(sku_type.write_to_database())
+        self.assertEqual(
+            collection.find_one({"name": sku_type.name}), sku_type.to_document()
+        )
+
+    def test110_staging_publish(self):
+        family_resolver = self.repository.get_family_resolver()
+        sku_types = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            sku_types.extend(SkuTypes(parser))
+        database = self.mongodb.client[self.mongodb.mongodb_database_name]
+        with BulkWriter() as writer:
+            writer.add(sku_types[0])
+        with self.assertRaises(RuntimeError):
+            with get_storage_backend("mongodb", publish=True) as backend:
+                for sku_type in sku_types:
+                    backend.add(sku_type)
+                raise RuntimeError("Run failed")
+        # A failed run leaves the live collection untouched and discards staging
+        self.assertEqual(database["sku_types"].count_documents({}), 1)
+        self.assertNotIn("sku_types__staging", database.list_collection_names())
+        with get_storage_backend("mongodb", publish=True, batch_size=7) as backend:
+            for sku_type in sku_types:
+                backend.add(sku_type)
+        self.assertFalse(backend.results["sku_types"][sku_types[0].name])
+        self.assertEqual(
+            database["sku_types"].count_documents({}),
+            len({sku_type.name for sku_type in sku_types}),
+        )
+        self.assertIn("vcpus_1", database["sku_types"].index_information())
+        self.assertNotIn("sku_types__staging", database.list_collection_names())
+        # A swap interrupted before the SKUs were renamed is finished by the next run
+        database.drop_collection("sku_types")
+        publisher = StagingPublisher([AzureSkuSeriesType, SkuType])
+        publisher.open()
+        for sku_type in sku_types:
+            publisher.add(sku_type)
+        publisher.flush()
+        publisher.publish_marker.replace_one({"_id": "publish"}, {}, upsert=True)
+        StagingPublisher([AzureSkuSeriesType, SkuType]).open()
+        self.assertEqual(
+            database["sku_types"].count_documents({}),
+            len({sku_type.name for sku_type in sku_types}),
+        )
+        self.assertIsNone(publisher.publish_marker.find_one({"_id": "publish"}))
+
+    def test120_journal_replay(self):
+        family_resolver = self.repository.get_family_resolver()
+        document = t.cast(DocumentFile, self.documents[0])
+        parser = document_to_parser(document, family_resolver.resolve(document))
+        sku_types = list(SkuTypes(parser))
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(Path(directory) / "journal.ndjson", fsync_batch_size=2)
+            # The target is unavailable, so the journal is kept instead of failing the run
+            unavailable = get_storage_backend(
+                "sqlite", path=str(Path(directory) / "missing" / "storage.sqlite3")
+            )
+            with JournalStorageBackend(unavailable, journal) as backend:
+                for sku_type in sku_types:
+                    backend.add(sku_type)
+            self.assertTrue(journal.pending)
+            # A crash while appending leaves a torn last entry behind
+            with open(journal.path, "a") as fout:
+                fout.write('{"collection": "sku_ty')
+            path = str(Path(directory) / "storage.sqlite3")
+            replayer = JournalReplayer(
+                journal, get_storage_backend("sqlite", path=path), batch_size=1
+            )
+            self.assertEqual(replayer.replay(), len(sku_types))
+            self.assertEqual(replayer.replay(), 0)
+            with JournalStorageBackend(
+                get_storage_backend("sqlite", path=path), journal
+            ) as backend:
+                backend.add(sku_types[0])
+            self.assertFalse(journal.path.exists())
+            self.assertEqual(
+                sorted(d["name"] for d in backend.iter_documents("sku_types")),
+                sorted(t.cast(str, sku_type.name) for sku_type in sku_types),
+            )
+
+    def test130_normalized_descriptions(self):
+        family_resolver = self.repository.get_family_resolver()
+        document = t.cast(DocumentFile, self.documents[0])
+        family_document = family_resolver.resolve(document)
+        parser = document_to_parser(document, family_document)
+        family_parser = document_to_parser(family_document, family_document)
+        azure_types = [AzureSkuSeriesType(parser, family_parser), *SkuTypes(parser)]
+        with get_storage_backend("mongodb", normalize_descriptions=True) as backend:
+            for azure_type in azure_types:
+                backend.add(azure_type)
+        database = self.mongodb.client[self.mongodb.mongodb_database_name]
+        stored = database["sku_types"].find_one({"name": azure_types[1].name})
+        self.assertIsInstance(stored["tier"], list)
+        self.assertNotIn("tier__str", stored)
+        self.assertIn("sku_types:tier__str", backend.load_dictionary().entries)
+        for azure_type in azure_types:
+            hydrated = next(
+                d
+                for d in backend.iter_documents(azure_type.mongodb_collection_name)
+                if d["name"] == azure_type.name
+            )
+            self.assertEqual(
+                json.loads(json.dumps(hydrated)),
+                json.loads(json.dumps(azure_type.serialize(), default=str)),
+            )
+
+    def test140_arrow_export(self):
+        family_resolver = self.repository.get_family_resolver()
+        azure_types: t.List[AzureType] = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            azure_types.append(AzureSkuSeriesType(parser, family_parser))
+            azure_types.extend(SkuTypes(parser))
+        with tempfile.TemporaryDirectory() as directory:
+            for format in ("parquet", "arrow"):
+                with get_storage_backend(
+                    "arrow", path=directory, format=format, batch_size=7
+                ) as backend:
+                    for azure_type in azure_types:
+                        backend.add(azure_type)
+                for collection_name in ("sku_series", "sku_types"):
+                    table = backend.read_table(collection_name)
+                    self.assertEqual(
+                        table.schema, backend.schema(collection_name), format
+                    )
+                    expected = [
+                        a.serialize()
+                        for a in azure_types
+                        if a.mongodb_collection_name == collection_name
+                    ]
+                    self.assertEqual(table.num_rows, len(expected))
+                    for exported, serialized in zip(
+                        backend.iter_documents(collection_name), expected
+                    ):
+                        # Single '*_specs' strings are exported as one element lists
+                        serialized = {
+                            k: [v] if k.endswith("_specs") and isinstance(v, str) else v
+                            for k, v in serialized.items()
+                        }
+                        self.assertEqual(
+                            json.loads(json.dumps(exported)),
+                            json.loads(json.dumps(serialized, default=str)),
+                        )
+                # Fields shared between collections keep the type of their own collection
+                self.assertIsInstance(
+                    next(backend.iter_documents("sku_series"))["version"], int
+                )
+                self.assertIsInstance(
+                    next(backend.iter_documents("sku_types"))["version"], str
+                )
+
+    def test150_legacy_document_ids(self):
+        family_resolver = self.repository.get_family_resolver()
+        document = t.cast(DocumentFile, self.documents[0])
+        parser = document_to_parser(document, family_resolver.resolve(document))
+        sku_type = next(iter(SkuTypes(parser)))
+        name = t.cast(str, sku_type.name)
+        collection = self.mongodb.client[self.mongodb.mongodb_database_name]["sku_types"]
+        # Documents stored before IDs were derived from the name have random ObjectIds
+        legacy_document = {
+            k: v for k, v in sku_type.to_document().items() if k != "_id"
+        }
+        collection.insert_many([dict(legacy_document), dict(legacy_document)])
+        # A migration interrupted after inserting the new copy left it next to the legacy ones
+        collection.insert_one({**legacy_document, "_id": AzureType.document_id(name)})
+        index_manager = IndexManager([AzureSkuSeriesType, SkuType])
+        self.assertEqual(
+            index_manager.migrate_document_ids(batch_size=1)["sku_types"], 2
+        )
+        self.assertEqual(
+            list(collection.find({"name": name}, {"_id": 1})),
+            [{"_id": AzureType.document_id(name)}],
+        )
+        self.assertFalse(index_manager.missing()["sku_types"])
+        self.assertEqual(index_manager.migrate_document_ids()["sku_types"], 0)
+        sku_type.vcpus = 1024
+        writer = BulkWriter()
+        writer.add(sku_type)
+        self.assertEqual(writer.flush(), {"sku_types": {name: True}})
+        self.assertEqual(collection.find_one({"name": name})["vcpus"], 1024)
+        # A duplicate on another unique index is a conflict, not an unchanged document
+        collection.delete_many({})
+        collection.insert_one(dict(legacy_document))
+        writer = BulkWriter()
+        writer.add(sku_type)
+        with self.assertRaises(BulkWriteError):
+            writer.flush()
+
+    def test160_unchanged_run_operations(self):
+        family_resolver = self.repository.get_family_resolver()
+        sku_types = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            sku_types.extend(SkuTypes(parser))
+        with get_storage_backend("mongodb") as backend:
+            for sku_type in sku_types:
+                backend.add(sku_type)
+        database_name = self.mongodb.mongodb_database_name
+        database = self.mongodb.client[database_name]
+        self.assertIn("name_1", database["sku_types"].index_information())
+        # The profiler records every operation the second, unchanged run sends
+        database.command("profile", 2)
+        try:
+            with get_storage_backend("mongodb") as backend:
+                for sku_type in sku_types:
+                    backend.add(sku_type)
+        finally:
+            database.command("profile", 0)
+        self.assertEqual(backend.changed, 0)
+        namespaces = [
+            f"{database_name}.{azure_type.mongodb_collection_name}"
+            for azure_type in (AzureSkuSeriesType, SkuType)
+        ]
+        operations = [
+            (entry["ns"], entry["op"])
+            for entry in database["system.profile"].find(
+                {"ns": {"$in": namespaces}, "op": {"$ne": "getmore"}}
+            )
+        ]
+        # Zero writes and no index management, only the fingerprint read
+        self.assertEqual(operations, [(f"{database_name}.sku_types", "query")])
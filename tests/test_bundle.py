@@ -0,0 +1,111 @@
+import json
+import tempfile
+import typing as t
+from pathlib import Path
+
+from src.azure_types.instances import SkuTypes
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.bundle import CatalogueBundle, FileCatalogueBundleStore
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+
+from .shared import BaseTestCase, tag
+
+
+@tag("bundle")
+class TestCatalogueBundle(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+
+    def test010_catalogue_bundle(self):
+        family_resolver = self.repository.get_family_resolver()
+        series_types: t.List[AzureSkuSeriesType] = []
+        family_documents: t.List[DocumentFile] = []
+        sku_types = []
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = t.cast(DocumentFile, family_resolver.resolve(document))
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            series_types.append(AzureSkuSeriesType(parser, family_parser))
+            family_documents.append(family_document)
+            sku_types.extend(SkuTypes(parser))
+        _, families = self.repository.get_families()
+        bundle = CatalogueBundle("0" * 40, families)
+        for family, series_type in zip(family_documents, series_types):
+            bundle.add_series(family, series_type.serialize())
+        for sku_type in sku_types:
+            family = family_documents[
+                [s.name for s in series_types].index(sku_type.parser.name)
+            ]
+            bundle.add_sku(family, sku_type.parser.name, sku_type.serialize())
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileCatalogueBundleStore(directory)
+            self.assertIsNone(store.load())
+            store.save(bundle)
+            document = store.load()
+            self.assertEqual(document, store.load("0" * 40))
+        self.assertEqual(
+            [
+                (family["directory"], family["document"])
+                for family in document["families"]
+            ][: len(families)],
+            [(family.path.parent.name, family.name) for family in families],
+        )
+        hydrated = CatalogueBundle.hydrate(document)
+        series = {
+            s["name"]: s for f in hydrated["families"] for s in f["series"]
+        }
+        for series_type in series_types:
+            expected = json.loads(json.dumps(series_type.serialize(), default=str))
+            for field in ("family_id", "subfamilies", "addons", "memory_gb_max"):
+                self.assertEqual(series[series_type.name][field], expected[field])
+        self.assertEqual(
+            sum(len(s["skus"]) for s in series.values()), len(sku_types)
+        )
+
+    def test020_catalogue_bundle_families_by_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            families = []
+            for category in ("general-purpose", "memory-optimized"):
+                path = Path(directory) / category / "d-family.md"
+                path.parent.mkdir()
+                path.write_text(category)
+                families.append(DocumentFile(path, False, True, False, "d"))
+            bundle = CatalogueBundle("0" * 40)
+            for family, series_name in zip(families, ("Dv5", "Dv6")):
+                bundle.add_series(family, {"name": series_name})
+            document = bundle.to_document()
+        self.assertEqual(
+            [
+                (family["directory"], [s["name"] for s in family["series"]])
+                for family in document["families"]
+            ],
+            [("general-purpose", ["Dv5"]), ("memory-optimized", ["Dv6"])],
+        )
+
+    def test030_catalogue_bundle_families_without_series(self):
+        with tempfile.TemporaryDirectory() as directory:
+            families = []
+            for name in ("d", "e"):
+                path = Path(directory) / "general-purpose" / f"{name}-family.md"
+                path.parent.mkdir(exist_ok=True)
+                path.write_text(name)
+                families.append(DocumentFile(path, False, True, False, name))
+            bundle = CatalogueBundle("0" * 40, families)
+            bundle.add_series(families[1], {"name": "Ev5"})
+            document = bundle.to_document()
+        self.assertEqual(
+            [
+                (family["document"], [s["name"] for s in family["series"]])
+                for family in document["families"]
+            ],
+            [("d-family.md", []), ("e-family.md", ["Ev5"])],
+        )
@@ -1,7 +1,7 @@
 import glob
 from pathlib import Path
 
-from src.documents import DocumentDescriptor
+from src.documents import DocumentDescriptor, FamilyResolver
 from src.mixins import ParserUtilityMixin
 from src.parsers.families import FamilyMarkdownDocumentParser
 from src.parsers.utility import document_to_parser
@@ -47,10 +47,9 @@ class TestDocumentDiscovery(BaseTestCase):
     def test030_series_family_recognition(self):
         series_documents_list = self.repository.get_documents()
         _, family_documents_list = self.repository.get_families()
+        family_resolver = FamilyResolver(family_documents_list)
         series_to_family_mapping = {
-            series_document: series_document.get_associated_family(
-                family_documents_list
-            )
+            series_document: family_resolver.resolve(series_document)
             for series_document in series_documents_list
         }
         family_to_series_mapping = {
@@ -78,3 +77,17 @@ class TestDocumentDiscovery(BaseTestCase):
         self.assertEqual(
             series_documents_without_direct_parent, len(previous_gen_series)
         )
+
+    def test040_streaming_discovery(self):
+        family_resolver = self.repository.get_family_resolver()
+        streamed = list(self.repository.iter_documents())
+        documents = self.repository.get_documents()
+        self.assertEqual(
+            sorted((doc.path, doc.identifier) for doc, _ in streamed),
+            sorted((doc.path, doc.identifier) for doc in documents),
+        )
+        for document, family_document in streamed:
+            self.assertTrue(family_document.is_family)
+            self.assertEqual(
+                family_resolver.resolve(document).path, family_document.path
+            )
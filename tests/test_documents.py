@@ -1,5 +1,7 @@
 import logging
 
+from src.documents import DocumentClassifier, FamilyResolver
+
 from .shared import BaseTestCase, tag
 
 logger = logging.getLogger(__name__)
@@ -87,3 +89,37 @@ class TestDocumentDescriptor(BaseTestCase):
             else:
                 documents = doc.to_document_files()
                 self.assertEqual(len(documents), 0)
+
+    def test040_family_resolver(self):
+        _, families = self.repository.get_families()
+        family_resolver = FamilyResolver(families)
+        family_path_resolver = FamilyResolver([f.path for f in families])
+        for document in self.repository.get_documents():
+            family = family_resolver.resolve(document)
+            self.assertTrue(family.is_family)
+            self.assertTrue(document.identifier.startswith(family.identifier))
+            # Families of the same name length can never both be prefixes of a series
+            longer_families = [
+                f
+                for f in families
+                if len(f.identifier) > len(family.identifier)
+                and document.identifier.startswith(f.identifier)
+            ]
+            self.assertFalse(longer_families)
+            self.assertEqual(family_path_resolver.resolve(document), family.path)
+
+    def test050_document_classifier(self):
+        classifier = DocumentClassifier(self.repository_workdir)
+        descriptors = list(classifier.iter_documents())
+        self.assertTrue(descriptors)
+        for descriptor in descriptors:
+            self.assertEqual(descriptor.path.suffix, ".md")
+            self.assertTrue(
+                descriptor.is_series
+                or descriptor.is_multi_series
+                or descriptor.is_family
+            )
+            self.assertNotIn("media", descriptor.path.parts)
+            # Descriptors created from a path directly must classify the same way
+            descriptor_from_path = self.cls(descriptor.path)
+            self.assertEqual(descriptor.identifier, descriptor_from_path.identifier)
@@ -12,12 +12,12 @@ class TestEndToEnd(BaseTestCase):
     def setUp(self) -> None:
         super().setUp()
         self.documents = self.repository.get_documents()
-        _, self.families = self.repository.get_families()
+        self.family_resolver = self.repository.get_family_resolver()
 
     def test010_end_to_end(self):
         self.repository.generate_last_commit_index()
         for document in self.documents:
-            family_document = document.get_associated_family(self.families)
+            family_document = self.family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             parser = t.cast(SeriesMarkdownDocumentParser, parser)
             dto = parser.to_type
@@ -0,0 +1,73 @@
+import tempfile
+import typing as t
+from pathlib import Path
+
+from src.azure_types.instances import SkuTypes
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.lookup import SkuLookupFile, SkuLookupFileWriter
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+from src.storage.journal import Journal, JournalStorageBackend
+from src.storage.lookup import SkuLookupStorageBackend
+
+from .shared import BaseTestCase, tag
+
+
+@tag("lookup")
+class TestSkuLookup(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+        family_resolver = self.repository.get_family_resolver()
+        self.series_types: t.List[AzureSkuSeriesType] = []
+        self.sku_types = []
+        for document in documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            self.series_types.append(AzureSkuSeriesType(parser, family_parser))
+            self.sku_types.extend(SkuTypes(parser))
+
+    def test010_sku_lookup_file(self):
+        writer = SkuLookupFileWriter.from_azure_types(self.series_types, self.sku_types)
+        skus = {
+            sku_type.serialize()["name"]: (sku_type.serialize(), sku_type.series_name)
+            for sku_type in self.sku_types
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "skus"
+            writer.write(path)
+            with SkuLookupFile(path) as lookup:
+                self.assertEqual(len(lookup), len(skus))
+                self.assertEqual(sorted(lookup.names()), sorted(skus))
+                for name, (document, series_name) in skus.items():
+                    sku = lookup.get(f" {name.upper()} ")
+                    self.assertIsNotNone(sku)
+                    self.assertEqual(sku["name"], name)
+                    self.assertEqual(sku["vcpus"], document["vcpus"])
+                    self.assertEqual(sku["series"]["name"], series_name)
+                self.assertNotIn("Standard_Unknown_v1", lookup)
+                self.assertIsNone(lookup.get("Standard_Unknown_v1"))
+
+    def test020_sku_lookup_storage_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "skus")
+            journal = Journal(Path(directory) / "journal.ndjson")
+            # Journal replay only passes serialized documents on to the lookup backend
+            target = SkuLookupStorageBackend(path)
+            with JournalStorageBackend(target, journal) as backend:
+                for azure_type in [*self.series_types, *self.sku_types]:
+                    backend.add(azure_type)
+            with SkuLookupFile(path) as lookup:
+                for sku_type in self.sku_types:
+                    sku = lookup.get(t.cast(str, sku_type.name))
+                    assert sku is not None
+                    self.assertIsNotNone(sku["series"])
+                    self.assertEqual(sku["series"]["name"], sku_type.parser.name)
@@ -18,11 +18,11 @@ class TestSkuFamilyDocument(BaseTestCase):
         self.files = (current_path / "data" / "documents").iterdir()
 
     def test010_reduce_document(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.files:
             docs = DocumentDescriptor(document).to_document_files()
             for doc in docs:
-                family_document = doc.get_associated_family(families)
+                family_document = family_resolver.resolve(doc)
                 if not doc.is_multi_series_document:
                     continue
                 multi_series_parser = MultiSeriesMarkdownDocumentParser(
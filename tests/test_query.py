@@ -0,0 +1,145 @@
+import typing as t
+
+import numpy as np
+
+from src.azure_types.instances import SkuTypes
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.features import (
+    CAPABILITY_FIELDS,
+    FeatureIndex,
+    decode_features,
+    encode_features,
+)
+from src.catalogue.query import CatalogueTable
+from src.catalogue.similarity import SimilarityIndex
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+
+from .shared import BaseTestCase, tag
+
+
+@tag("query")
+class TestCatalogueQuery(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+        family_resolver = self.repository.get_family_resolver()
+        self.series_types: t.List[AzureSkuSeriesType] = []
+        self.sku_types = []
+        for document in documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            self.series_types.append(AzureSkuSeriesType(parser, family_parser))
+            self.sku_types.extend(SkuTypes(parser))
+        self.series = [series_type.serialize() for series_type in self.series_types]
+
+    def test010_query(self):
+        table = CatalogueTable.from_azure_types(self.series_types)
+        self.assertEqual(len(table), len(self.series))
+        query = table.query().filter(
+            memory_gb_min__ge=64,
+            vcpus_max__le=16,
+            cap_premium_storage_capable=True,
+            cap_accelerated_networking_capable=True,
+        )
+        expected = [
+            s
+            for s in self.series
+            if s["memory_gb_min"] is not None
+            and s["memory_gb_min"] >= 64
+            and s["vcpus_max"] is not None
+            and s["vcpus_max"] <= 16
+            and s["cap_premium_storage_capable"]
+            and s["cap_accelerated_networking_capable"]
+        ]
+        self.assertEqual(
+            query.order_by("-memory_gb_max", "name").names(),
+            [
+                s["name"]
+                for s in sorted(expected, key=lambda s: (-s["memory_gb_max"], s["name"]))
+            ],
+        )
+        self.assertEqual(
+            table.query().where("family_id", "in", ["D", "E"]).count(),
+            len([s for s in self.series if s["family_id"] in ("D", "E")]),
+        )
+        self.assertEqual(
+            table.query().filter(vcpus_min__isnull=True).count(),
+            len([s for s in self.series if s["vcpus_min"] is None]),
+        )
+        self.assertEqual(table.query().order_by("name").limit(3).count(), 3)
+        with self.assertRaises(KeyError):
+            table.query().filter(unknown_field=1)
+
+    def test020_feature_index(self):
+        table = CatalogueTable.from_documents(self.series)
+        include = ["cap:premium_storage", "cap:accelerated_networking"]
+        exclude = ["cap:live_migration", "subfamily:C"]
+        expected = [
+            i
+            for i, s in enumerate(self.series)
+            if s["cap_premium_storage_capable"]
+            and s["cap_accelerated_networking_capable"]
+            and not s["cap_live_migration_capable"]
+            and "C" not in s["subfamilies"]
+        ]
+        self.assertEqual(table.features.rows(include, exclude).tolist(), expected)
+        self.assertEqual(table.features.count(include, exclude), len(expected))
+        self.assertEqual(
+            table.query().features(include, exclude).count(), len(expected)
+        )
+        for series in self.series:
+            self.assertEqual(
+                set(decode_features(encode_features(series))),
+                {f"subfamily:{code}" for code in series["subfamilies"]}
+                | {f"addon:{code}" for code in series["addons"]}
+                | {
+                    f"cap:{field[len('cap_'):-len('_capable')]}"
+                    for field in CAPABILITY_FIELDS
+                    if series.get(field, None) is True
+                },
+            )
+        sku_features = FeatureIndex.from_documents(
+            sku_type.serialize() for sku_type in self.sku_types
+        )
+        self.assertEqual(
+            sku_features.count(include=["addon:s"]),
+            len([s for s in self.sku_types if "s" in (s._addons or "")]),
+        )
+        with self.assertRaises(KeyError):
+            table.features.rows(include=["cap:unknown"])
+
+    def test030_similarity(self):
+        index = SimilarityIndex.from_azure_types(self.series_types, self.sku_types)
+        name = index.names[len(index) // 2]
+        row = index.index[name]
+        distances = np.linalg.norm(
+            index.vectors.astype(np.float64) - index.vectors[row], axis=1
+        )
+        distances[row] = np.inf
+        expected = np.argsort(distances, kind="stable")[:5]
+        nearest = index.nearest(name, k=5)
+        self.assertEqual(len(nearest), 5)
+        self.assertNotIn(name, [n for n, _ in nearest])
+        np.testing.assert_allclose(
+            [d for _, d in nearest], distances[expected], rtol=1e-3, atol=1e-3
+        )
+        nearest = index.nearest(name, k=5, include=["addon:s"], vcpus__ge=8)
+        candidates = index.features.mask(include=["addon:s"])
+        for neighbour, _ in nearest:
+            self.assertTrue(candidates[index.index[neighbour]])
+            self.assertGreaterEqual(index.rows[index.index[neighbour]][0]["vcpus"], 8)
+        self.assertEqual(index.nearest(name, family_id="unknown"), [])
+        self.assertEqual(
+            index.nearest_many([name, name], k=3), [index.nearest(name, k=3)] * 2
+        )
+        with self.assertRaises(KeyError):
+            index.nearest("Standard_Unknown_v1")
@@ -1,4 +1,8 @@
+import glob
 import typing as t
+from pathlib import Path
+
+from src.documents import DocumentDescriptor
 
 from .shared import BaseTestCase, tag
 
@@ -63,3 +67,22 @@ class TestDocsSourceRepository(BaseTestCase):
 
     def test060_get_file_changed_index(self):
         self.repository.generate_last_commit_index()
+
+    def test070_get_documents(self):
+        # Discovery is limited to the working directory and skips media directories
+        root = self.repository.repo_workdir_abs_path
+        expected = {
+            (document.path, document.identifier)
+            for f in glob.iglob(f"{root}/**/*.md", recursive=True)
+            if "media" not in Path(f).relative_to(root).parts
+            and (
+                (descriptor := DocumentDescriptor(Path(f))).is_series
+                or descriptor.is_multi_series
+            )
+            for document in descriptor.to_document_files()
+        }
+        documents = self.repository.get_documents()
+        self.assertEqual(
+            {(document.path, document.identifier) for document in documents}, expected
+        )
+        self.assertEqual(len(documents), len(expected))
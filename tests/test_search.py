@@ -0,0 +1,57 @@
+import tempfile
+import typing as t
+from pathlib import Path
+
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.search import InvertedIndex, series_sections
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+
+from .shared import BaseTestCase, tag
+
+
+@tag("search")
+class TestTextIndex(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+
+    def test010_text_index(self):
+        family_resolver = self.repository.get_family_resolver()
+        series_types: t.List[AzureSkuSeriesType] = []
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            series_types.append(AzureSkuSeriesType(parser, family_parser))
+        index = InvertedIndex()
+        for series_type in series_types:
+            index.add_series(series_type.name, series_sections(series_type.parser))
+        names = {series_type.name for series_type in series_types}
+        self.assertEqual(len(index), 4 * len(names))
+        for series_type in series_types:
+            for model in series_type.cpu_processor_models or ():
+                self.assertIn(series_type.name, index.search_series(f'"{model}"'))
+        self.assertEqual(
+            index.search_series("xeon"), index.search_series("xeo*")
+        )
+        self.assertEqual(index.search('"storage premium premium"'), [])
+        for hit in index.search('"premium storage" xeon'):
+            self.assertIn(hit, index.search('"premium storage"'))
+            self.assertIn(hit, index.search("xeon"))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "index.json.gz"
+            index.save(path)
+            loaded = InvertedIndex.load(path)
+        self.assertEqual(loaded.to_document(), index.to_document())
+        name = series_types[0].name
+        index.remove(name)
+        self.assertNotIn(name, {series_name for series_name, _ in index.document_ids})
+        self.assertEqual(len(index), 4 * (len(names) - 1))
@@ -2,6 +2,7 @@ import typing as t
 
 from src.documents import DocumentDescriptor, DocumentFile
 from src.mixins import ParserUtilityMixin
+from src.parsers.families import IncludeLinkIndex
 from src.parsers.utility import document_to_parser
 
 from .shared import BaseTestCase, tag
@@ -19,34 +20,81 @@ class TestSeriesDocumentParsers(BaseTestCase):
         )
 
     def test010_host_summary(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             self.assertTrue(parser.host_summary)
 
     def test020_host_specs(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             print(parser.host_specs_table)
             self.assertTrue(parser.host_specs_table)
 
     def test030_host_specs(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             print(parser.get_associated_instance_names())
 
     def test040_host_specs(self):
-        _, families = self.repository.get_families()
+        family_resolver = self.repository.get_family_resolver()
         for document in self.documents:
             document = t.cast(DocumentFile, document)
-            family_document = document.get_associated_family(families)
+            family_document = family_resolver.resolve(document)
             parser = document_to_parser(document, family_document)
             print(parser.capabilities)
+
+    def test050_include_index(self):
+        family_resolver = self.repository.get_family_resolver()
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            # The index is built once per family page and shared between parsers
+            self.assertIs(
+                parser.family_document_parser.include_index,
+                family_parser.include_index,
+            )
+            if not parser.is_previous_generation:
+                path = family_parser.include_index.get(parser.name, "summary")
+                self.assertTrue(path.exists())
+
+    def test060_include_index_cache_is_bounded(self):
+        cache_size = IncludeLinkIndex.cache_size
+        IncludeLinkIndex.cache_size = 2
+        try:
+            first = IncludeLinkIndex.for_document(
+                self.documents_path / "a.md", "1", self.documents_path, []
+            )
+            self.assertIs(
+                IncludeLinkIndex.for_document(
+                    self.documents_path / "a.md", "1", self.documents_path, []
+                ),
+                first,
+            )
+            # A new version of a document replaces the index of the previous one
+            second = IncludeLinkIndex.for_document(
+                self.documents_path / "a.md", "2", self.documents_path, []
+            )
+            self.assertIsNot(second, first)
+            for name in ("b.md", "c.md"):
+                IncludeLinkIndex.for_document(
+                    self.documents_path / name, "1", self.documents_path, []
+                )
+            self.assertIsNot(
+                IncludeLinkIndex.for_document(
+                    self.documents_path / "a.md", "2", self.documents_path, []
+                ),
+                second,
+            )
+        finally:
+            IncludeLinkIndex.cache_size = cache_size
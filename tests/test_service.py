@@ -0,0 +1,91 @@
+import json
+import tempfile
+import typing as t
+from pathlib import Path
+
+from src.azure_types.series import AzureSkuSeriesType
+from src.catalogue.service import CatalogueService, CatalogueSnapshotLoader
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+from src.storage.ndjson import NDJSONStorageBackend
+
+from .shared import BaseTestCase, tag
+
+
+@tag("service")
+class TestCatalogueService(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+
+    def test010_read_service(self):
+        family_resolver = self.repository.get_family_resolver()
+        series_types = []
+        for document in self.documents:
+            document = t.cast(DocumentFile, document)
+            family_document = family_resolver.resolve(document)
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            series_types.append(AzureSkuSeriesType(parser, family_parser))
+        series = [series_type.serialize() for series_type in series_types]
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "catalogue.ndjson")
+            with NDJSONStorageBackend(path) as backend:
+                for azure_type in series_types:
+                    backend.add(azure_type)
+            loader = CatalogueSnapshotLoader(NDJSONStorageBackend(path))
+            self.assertTrue(loader.refresh())
+            self.assertFalse(loader.refresh())
+            service = CatalogueService(loader)
+            name = series[0]["name"]
+            response = service.get(f"/series/{name}")
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.loads(response.body)["name"], name)
+            self.assertIs(service.get(f"/series/{name}"), response)
+            self.assertEqual(service.get("/series/unknown").status, 404)
+            self.assertEqual(service.get("/series?unknown_field=1").status, 400)
+            response = service.get(
+                "/series?family_id__in=D,E&order_by=name&limit=2&fields=name"
+            )
+            expected = sorted(
+                s["name"] for s in series if s["family_id"] in ("D", "E")
+            )
+            self.assertEqual(
+                json.loads(response.body),
+                {
+                    "count": len(expected),
+                    "documents": [{"name": name} for name in expected[:2]],
+                },
+            )
+            etag = loader.snapshot.etag
+            with NDJSONStorageBackend(path) as backend:
+                for azure_type in series_types[1:]:
+                    backend.add(azure_type)
+            self.assertTrue(loader.refresh())
+            self.assertNotEqual(loader.snapshot.etag, etag)
+            self.assertEqual(service.get(f"/series/{name}").status, 404)
+
+    def test020_service_errors(self):
+        # Documents streamed to stdout can not be served
+        with self.assertRaises(ValueError):
+            CatalogueSnapshotLoader(NDJSONStorageBackend("-"))
+
+        class FailingService(CatalogueService):
+            @staticmethod
+            def list(table, parameters):
+                raise KeyError()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "catalogue.ndjson")
+            with NDJSONStorageBackend(path):
+                pass
+            loader = CatalogueSnapshotLoader(NDJSONStorageBackend(path))
+            self.assertTrue(loader.refresh())
+            # Errors raised without a message are still answered as bad requests
+            self.assertEqual(FailingService(loader).get("/series").status, 400)
@@ -0,0 +1,123 @@
+import datetime
+import tempfile
+import typing as t
+from pathlib import Path
+
+import msgpack
+
+from src.azure_types.instances import SkuTypes
+from src.azure_types.series import AzureSkuSeriesType
+from src.azure_types.shared import AzureType
+from src.documents import DocumentDescriptor, DocumentFile
+from src.mixins import ParserUtilityMixin
+from src.parsers.utility import document_to_parser
+from src.snapshot import COMPRESSIONS, WarmStartSnapshot
+from src.storage.ndjson import NDJSONStorageBackend
+
+from .shared import BaseTestCase, tag
+
+
+@tag("snapshot")
+class TestWarmStartSnapshot(BaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.documents = ParserUtilityMixin.flatten_list_of_lists(
+            [
+                DocumentDescriptor(f).to_document_files()
+                for f in sorted(self.documents_path.iterdir())
+            ]
+        )
+
+    def test010_warm_start_snapshot(self):
+        family_resolver = self.repository.get_family_resolver()
+        azure_types: t.List[AzureType] = []
+        discovered: t.List[t.Tuple[DocumentFile, DocumentFile]] = []
+        for document in self.documents[:5]:
+            document = t.cast(DocumentFile, document)
+            family_document = t.cast(DocumentFile, family_resolver.resolve(document))
+            discovered.append((document, family_document))
+            parser = document_to_parser(document, family_document)
+            family_parser = document_to_parser(family_document, family_document)
+            azure_types.append(AzureSkuSeriesType(parser, family_parser))
+            azure_types.extend(SkuTypes(parser))
+        snapshot = WarmStartSnapshot("0" * 40)
+        for azure_type in azure_types:
+            snapshot.add(azure_type.mongodb_collection_name, azure_type.serialize())
+        # Series documents and family documents are below the clone directory
+        root = self.documents_path.parent
+        families = list({family.path: family for _, family in discovered}.values())
+        snapshot.set_discovery(root, discovered, families)
+        snapshot.set_commit_index(
+            self.documents_path,
+            {self.documents_path / "a.md": datetime.datetime(2024, 1, 1, 12)},
+        )
+        self.assertTrue(snapshot.matches("0" * 40))
+        self.assertFalse(snapshot.matches("1" * 40))
+        with tempfile.TemporaryDirectory() as directory:
+            for compression in COMPRESSIONS:
+                path = Path(directory) / f"snapshot.{compression}"
+                snapshot.save(path, compression)
+                loaded = WarmStartSnapshot.load(path)
+                assert loaded is not None
+                self.assertEqual(loaded.azure_types, snapshot.azure_types)
+                self.assertEqual(loaded.commit_index, snapshot.commit_index)
+                self.assertTrue(loaded.discovery_matches("0" * 40))
+                self.assertTrue(loaded.matches("0" * 40))
+            self.assertFalse(
+                WarmStartSnapshot(snapshot.head, "outdated").matches(snapshot.head)
+            )
+            self.assertFalse(loaded.discovery_matches("1" * 40))
+            documents, restored_families = loaded.restore_discovery(root)
+            self.assertEqual(
+                [
+                    (document.path, document.identifier, family.path)
+                    for document, family in documents
+                ],
+                [
+                    (document.path, document.identifier, family.path)
+                    for document, family in discovered
+                ],
+            )
+            self.assertEqual(
+                [family.path for family in restored_families],
+                [family.path for family in families],
+            )
+            self.assertEqual(
+                loaded.restore_commit_index(self.documents_path),
+                {self.documents_path / "a.md": datetime.datetime(2024, 1, 1, 12)},
+            )
+            self.assertIsNone(WarmStartSnapshot.load(Path(directory) / "missing"))
+            data = (Path(directory) / "snapshot.gzip").read_bytes()
+            header = msgpack.unpackb(data)
+            corrupt = {
+                "bytes": b"\x00corrupt",
+                "not_a_map": msgpack.packb(5),
+                "extra_data": data + b"\x00",
+                "truncated": data[: len(data) // 2],
+                "truncated_state": msgpack.packb(
+                    {**header, "state": header["state"][:-16]}
+                ),
+                "corrupt_state": msgpack.packb(
+                    {**header, "state": header["state"][:10] + b"\x00" * 32}
+                ),
+                "not_a_map_state": msgpack.packb(
+                    {**header, "compression": "none", "state": msgpack.packb([])}
+                ),
+            }
+            for name, content in corrupt.items():
+                (Path(directory) / name).write_bytes(content)
+                self.assertIsNone(WarmStartSnapshot.load(Path(directory) / name), name)
+            ndjson_path = str(Path(directory) / "catalogue.ndjson")
+            with NDJSONStorageBackend(ndjson_path) as backend:
+                self.assertEqual(loaded.publish(backend), len(snapshot.azure_types))
+            published = list(
+                NDJSONStorageBackend(ndjson_path).iter_documents("sku_series")
+            )
+        self.assertEqual(
+            [document["name"] for document in published],
+            [
+                azure_type.name
+                for azure_type in azure_types
+                if isinstance(azure_type, AzureSkuSeriesType)
+            ],
+        )